@@ -0,0 +1,285 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import events
+
+# 렌더링 수락 제어 (인코딩/디코딩 동시 실행 수 제한)
+#
+# moviepy + libx264 인코딩은 CPU를 거의 전부, 장면 클립마다 여는 ffmpeg 리더는 메모리를 씁니다.
+# 여러 작업이 한꺼번에 렌더링하면 서로 CPU/메모리를 빼앗아 모두 느려지므로,
+# 이 머신의 CPU 수와 메모리로 동시 인코딩 수와 동시 디코딩 리더 수를 정하고
+# 한도를 넘는 작업은 슬롯이 빌 때까지 기다리게 합니다. (예상 시작 시간은 진행 상태로 표시)
+# 슬롯은 SQLite에 기록되어 여러 작업자 프로세스가 함께 지키며, 인코딩 하나가 쓸 ffmpeg 스레드 수도 함께 정합니다.
+
+# 1080p 인코딩 하나(합성 프레임 + libx264)와 ffmpeg 디코딩 리더 하나가 쓰는 메모리 추정치(MB)
+ENCODE_MEMORY_MB = 1500
+DECODER_MEMORY_MB = 150
+# OS, Streamlit, 작업자 프로세스 자체를 위해 남겨 둘 메모리(MB)
+RESERVED_MEMORY_MB = 1024
+# 인코딩 하나에 최소한으로 줄 CPU 수
+MIN_ENCODE_THREADS = 2
+
+# 작업자가 비정상 종료해도 슬롯이 영구히 잡혀 있지 않도록 (같은 호스트에서는 프로세스 생존도 확인)
+LEASE_TTL = 2 * 60 * 60
+# 기록이 없을 때 인코딩 한 건의 예상 소요 시간(초)
+DEFAULT_ENCODE_SECONDS = 180
+
+
+def _cgroup_value(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_count() -> int:
+    """사용 가능한 CPU 수 (affinity, cgroup v2 cpu.max 반영)"""
+    count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = _cgroup_value("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        limit, _, period = quota.partition(" ")
+        count = min(count, max(1, int(int(limit) / int(period or 100000))))
+    return max(1, count)
+
+
+def memory_mb() -> int:
+    """사용 가능한 전체 메모리(MB) (cgroup v2 memory.max 반영)"""
+    total = 0
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    total = int(line.split()[1]) // 1024
+                    break
+    except OSError:
+        pass
+    if not total and hasattr(os, "sysconf"):
+        try:
+            total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+        except (ValueError, OSError):
+            total = 4096
+    limit = _cgroup_value("/sys/fs/cgroup/memory.max")
+    if limit and limit.isdigit():
+        total = min(total, int(limit) // (1024 * 1024))
+    return total or 4096
+
+
+class Capacity:
+    """이 머신에서 동시에 돌릴 수 있는 인코딩/디코딩 수"""
+
+    def __init__(self, cpus: int, memory: int, encode_slots: int, decoder_slots: int, encoder_threads: int):
+        self.cpus = cpus
+        self.memory = memory
+        self.encode_slots = encode_slots
+        self.decoder_slots = decoder_slots
+        self.encoder_threads = encoder_threads
+
+    @property
+    def worker_processes(self) -> int:
+        # 작업 시간 대부분은 공급자 대기이므로 인코딩 슬롯보다 작업자를 넉넉히 둠
+        return self.encode_slots * 2
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def detect_capacity() -> Capacity:
+    """CPU/메모리로 한도 계산 (ADMISSION_MAX_ENCODES, ADMISSION_MAX_DECODERS, ADMISSION_ENCODER_THREADS로 재정의)"""
+    cpus = cpu_count()
+    memory = memory_mb()
+    usable = max(0, memory - RESERVED_MEMORY_MB)
+
+    encode_slots = max(1, min(cpus // MIN_ENCODE_THREADS, usable // ENCODE_MEMORY_MB))
+    encode_slots = int(os.getenv("ADMISSION_MAX_ENCODES", encode_slots))
+    decoder_memory = max(0, usable - encode_slots * ENCODE_MEMORY_MB)
+    decoder_slots = max(2, min(cpus * 4, decoder_memory // DECODER_MEMORY_MB))
+    decoder_slots = int(os.getenv("ADMISSION_MAX_DECODERS", decoder_slots))
+    encoder_threads = int(os.getenv("ADMISSION_ENCODER_THREADS", max(1, cpus // encode_slots)))
+    return Capacity(cpus, memory, encode_slots, decoder_slots, encoder_threads)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AdmissionController:
+    """인코딩 슬롯과 디코딩 리더 수를 프로세스 간에 공유하는 수락 제어기"""
+
+    def __init__(self, db_path: str = "temp/admission.sqlite3", capacity: Optional[Capacity] = None):
+        self.db_path = db_path
+        self.capacity = capacity or detect_capacity()
+        self._host = socket.gethostname()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                id TEXT PRIMARY KEY,
+                kind TEXT,
+                decoders INTEGER,
+                host TEXT,
+                pid INTEGER,
+                started REAL,
+                expires REAL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS history (kind TEXT, finished REAL, seconds REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _prune(self, conn: sqlite3.Connection):
+        """만료되었거나 프로세스가 종료된 슬롯 회수"""
+        now = time.time()
+        conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+        for row in conn.execute("SELECT id, pid FROM leases WHERE host = ?", (self._host,)).fetchall():
+            if not _process_alive(row["pid"]):
+                conn.execute("DELETE FROM leases WHERE id = ?", (row["id"],))
+
+    @staticmethod
+    def _kind(decoders: int) -> str:
+        # 장면 영상을 읽으며 합성하는 최종 렌더링과 정지 이미지 인코딩은 소요 시간이 크게 달라 따로 기록
+        return "render" if decoders else "encode"
+
+    def _try_acquire(self, decoders: int) -> Optional[str]:
+        def take(conn):
+            self._prune(conn)
+            used_encodes, used_decoders = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(decoders), 0) FROM leases"
+            ).fetchone()
+            if used_encodes + 1 > self.capacity.encode_slots:
+                return None
+            if used_decoders + decoders > self.capacity.decoder_slots:
+                return None
+            lease_id = uuid.uuid4().hex
+            now = time.time()
+            conn.execute("INSERT INTO leases VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (lease_id, self._kind(decoders), decoders, self._host, os.getpid(), now, now + LEASE_TTL))
+            return lease_id
+
+        return self._transaction(take)
+
+    def _release(self, lease_id: str, kind: str, seconds: float, record: bool):
+        def release(conn):
+            conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,))
+            if record:
+                conn.execute("INSERT INTO history VALUES (?, ?, ?)", (kind, time.time(), seconds))
+                conn.execute("DELETE FROM history WHERE rowid NOT IN (SELECT rowid FROM history "
+                             "ORDER BY finished DESC LIMIT 50)")
+
+        self._transaction(release)
+
+    def average_seconds(self, kind: str = "render") -> float:
+        row = self._connect().execute("SELECT AVG(seconds) FROM history WHERE kind = ?", (kind,)).fetchone()
+        return row[0] or DEFAULT_ENCODE_SECONDS
+
+    def estimate_wait(self) -> float:
+        """지금 인코딩을 요청하면 시작까지 걸릴 예상 시간(초)"""
+        averages = {kind: self.average_seconds(kind) for kind in ("render", "encode")}
+        now = time.time()
+        rows = self._connect().execute("SELECT kind, started FROM leases").fetchall()
+        remaining = sorted(max(0.0, averages.get(row["kind"], DEFAULT_ENCODE_SECONDS) - (now - row["started"]))
+                           for row in rows)
+        if len(remaining) < self.capacity.encode_slots:
+            return 0.0
+        return remaining[len(remaining) - self.capacity.encode_slots]
+
+    @contextmanager
+    def render(self, decoders: int = 0, poll_interval: float = 2.0):
+        """
+        인코딩 슬롯 하나와 디코딩 리더 decoders개를 함께 확보하는 구간
+
+        한도를 넘으면 슬롯이 빌 때까지 기다리며 예상 시작 시간을 진행 상태로 남깁니다.
+        구간 안에서는 write_videofile(threads=...)에 넘길 인코더 스레드 수를 돌려줍니다.
+        """
+        # 한 작업이 머신 전체 한도보다 많은 리더를 요청하면 영원히 기다리지 않도록 한도로 맞춤
+        decoders = min(decoders, self.capacity.decoder_slots)
+        waited_since = time.time()
+        while (lease_id := self._try_acquire(decoders)) is None:
+            events.status(f"렌더링 대기 중: 다른 작업의 인코딩이 끝나길 기다리고 있습니다 "
+                          f"(예상 시작 약 {self.estimate_wait():.0f}초 후)")
+            time.sleep(poll_interval)
+        if time.time() - waited_since > poll_interval:
+            events.info(f"렌더링 슬롯 확보 (대기 {time.time() - waited_since:.0f}초)")
+
+        start_time = time.time()
+        completed = False
+        try:
+            yield self.capacity.encoder_threads
+            completed = True
+        finally:
+            self._release(lease_id, self._kind(decoders), time.time() - start_time, record=completed)
+
+    def encode(self, poll_interval: float = 2.0):
+        """디코딩 리더 없이 인코딩만 하는 구간 (정지 이미지 영상 등)"""
+        return self.render(0, poll_interval)
+
+    def snapshot(self) -> dict:
+        conn = self._connect()
+        used_encodes, used_decoders = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(decoders), 0) FROM leases WHERE expires >= ?", (time.time(),)
+        ).fetchone()
+        return {**self.capacity.to_dict(), "active_encodes": used_encodes, "active_decoders": used_decoders,
+                "average_render_seconds": round(self.average_seconds("render"), 1)}
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission() -> Optional[AdmissionController]:
+    """프로세스 공용 수락 제어기 (ADMISSION_ENABLED=0이면 None)"""
+    global _controller
+    if os.getenv("ADMISSION_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(os.getenv("ADMISSION_DB", "temp/admission.sqlite3"))
+        return _controller
+
+
+@contextmanager
+def render(decoders: int = 0):
+    """렌더링(디코딩 리더 decoders개 + 인코딩) 구간, 인코더 스레드 수 반환 (제한 없으면 None)"""
+    controller = get_admission()
+    if not controller:
+        yield None
+        return
+    with controller.render(decoders) as threads:
+        yield threads
+
+
+def encode():
+    """인코딩만 하는 구간 (정지 이미지 영상 등)"""
+    return render(0)
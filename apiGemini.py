@@ -1,32 +1,211 @@
-import time
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import requests
 from dotenv import load_dotenv
-import google.genai as genai
-from google.genai import types
-
-# Load .env and get GOOGLE_API_KEY
-load_dotenv()
-_google_api_key = os.getenv("GOOGLE_API_KEY")
-if _google_api_key:
-    client = genai.Client(api_key=_google_api_key)
-else:
-    raise RuntimeError(
-        "Missing GOOGLE_API_KEY. Set it in your environment or .env file (GOOGLE_API_KEY=...)."
-    )
 
-operation = client.models.generate_videos(
-    model="veo-3.0-generate-preview",
-    prompt="a close-up shot of a golden retriever playing in a field of sunflowers",
-    config=types.GenerateVideosConfig(
-        negative_prompt="barking, woofing",
-    ),
-)
+import rate_limiter
+from retry_policy import DOWNLOAD_POLICY, POLL_POLICY, REQUEST_TIMEOUT, SUBMIT_POLICY
+
+# Google Veo API: video generation (google-genai long-running operation)
+#
+# submit()은 generate_videos 작업을 제출만 하고 Future를 바로 반환합니다.
+# 프로세스 공용 폴러 스레드 하나가 모든 진행 중인 작업의 상태를 주기적으로 조회하고,
+# 끝난 작업의 비디오를 작업 디렉토리로 스트리밍 저장한 뒤 Future에 파일 경로를 넣습니다.
+# 따라서 작업 수만큼 스레드를 붙잡고 기다리지 않으며, google-genai는 처음 사용할 때 로드합니다.
+
+DEFAULT_MODEL = "veo-3.0-generate-preview"
+
+
+class VeoOperation:
+    """폴러가 추적하는 진행 중인 작업 하나"""
+
+    def __init__(self, api, operation, future: Future, output_path: str, deadline: float):
+        self.api = api
+        self.operation = operation
+        self.future = future
+        self.output_path = output_path
+        self.deadline = deadline
+
+
+class VeoOperationPoller:
+    """여러 Veo 작업을 스레드 하나로 폴링하고, 완료된 작업의 다운로드는 작은 풀에서 처리"""
+
+    def __init__(self, interval: float = 10.0, download_workers: int = 2):
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._downloads = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="veo-download")
+
+    def track(self, tracked: VeoOperation):
+        with self._lock:
+            self._pending.append(tracked)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="veo-poller", daemon=True)
+                self._thread.start()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                # 진행 중인 작업이 없으면 스레드 종료 (다음 track()에서 다시 시작)
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                continue
+            for tracked in pending:
+                if self._poll(tracked):
+                    with self._lock:
+                        self._pending.remove(tracked)
+
+    def _poll(self, tracked: VeoOperation) -> bool:
+        """작업 하나의 상태를 갱신하고, 더 추적할 필요가 없으면 True 반환"""
+        if tracked.future.cancelled():
+            return True
+        if time.time() > tracked.deadline:
+            self._fail(tracked, TimeoutError(f"Veo 작업 최대 대기 시간 초과: {tracked.operation.name}"))
+            return True
+        try:
+            tracked.operation = tracked.api.refresh(tracked.operation)
+        except Exception as e:
+            self._fail(tracked, e)
+            return True
+        if not tracked.operation.done:
+            return False
+        # 여기서부터는 취소 불가: 다운로드 풀에서 저장 후 결과 설정
+        if tracked.future.set_running_or_notify_cancel():
+            self._downloads.submit(self._finish, tracked)
+        return True
+
+    @staticmethod
+    def _fail(tracked: VeoOperation, error: Exception):
+        if tracked.future.set_running_or_notify_cancel():
+            tracked.future.set_exception(error)
+
+    @staticmethod
+    def _finish(tracked: VeoOperation):
+        try:
+            tracked.future.set_result(tracked.api.save_result(tracked.operation, tracked.output_path))
+        except Exception as e:
+            tracked.future.set_exception(e)
+
 
-# Waiting for the video(s) to be generated
-while not operation.done:
-    time.sleep(20)
-    operation = client.operations.get(operation)
+_poller = None
+_poller_lock = threading.Lock()
 
-generated_video = operation.result.generated_videos[0]
-client.files.download(file=generated_video.video)
-generated_video.video.save("veo3_video.mp4")
\ No newline at end of file
+
+def get_poller() -> VeoOperationPoller:
+    """프로세스 공용 폴러"""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = VeoOperationPoller(interval=float(os.getenv("VEO_POLL_INTERVAL", "10")))
+        return _poller
+
+
+class VeoAPI:
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, poller: Optional[VeoOperationPoller] = None):
+        self.api_key = api_key
+        self.model = model
+        self.poller = poller or get_poller()
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """google-genai 클라이언트 (처음 사용할 때 생성)"""
+        with self._client_lock:
+            if self._client is None:
+                if not self.api_key:
+                    raise RuntimeError("Missing GOOGLE_API_KEY. Set it in your environment or .env file (GOOGLE_API_KEY=...).")
+                import google.genai as genai
+                self._client = genai.Client(api_key=self.api_key)
+            return self._client
+
+    def start_operation(self, prompt: str, image_bytes: bytes = None, image_mime_type: str = "image/jpeg",
+                        negative_prompt: str = None):
+        """generate_videos 작업 제출 후 operation 반환 (완료를 기다리지 않음)"""
+        from google.genai import types
+
+        image = types.Image(image_bytes=image_bytes, mime_type=image_mime_type) if image_bytes else None
+        config = types.GenerateVideosConfig(negative_prompt=negative_prompt) if negative_prompt else None
+
+        def submit():
+            rate_limiter.wait("google", "generate_videos")
+            return self.client.models.generate_videos(model=self.model, prompt=prompt, image=image, config=config)
+
+        return SUBMIT_POLICY.call(submit, description="Veo 작업 제출")
+
+    def refresh(self, operation):
+        """작업 상태 재조회"""
+        def poll():
+            rate_limiter.wait("google", "operations")
+            return self.client.operations.get(operation)
+
+        return POLL_POLICY.call(poll, description="Veo 상태 조회")
+
+    def save_result(self, operation, output_path: str) -> str:
+        """완료된 작업의 첫 번째 비디오를 output_path에 저장하고 경로 반환"""
+        if operation.error or not operation.result or not operation.result.generated_videos:
+            raise RuntimeError(f"Veo 생성 실패: {operation.error}")
+        video = operation.result.generated_videos[0].video
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        temp_path = f"{output_path}.part"
+
+        if getattr(video, "uri", None):
+            # 다운로드 URI를 메모리에 올리지 않고 파일로 바로 스트리밍
+            def fetch():
+                response = requests.get(video.uri, headers={"x-goog-api-key": self.api_key},
+                                        stream=True, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                with open(temp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+
+            DOWNLOAD_POLICY.call(fetch, description="Veo 비디오 다운로드")
+        else:
+            # 응답에 바이트가 직접 들어 있는 경우 (Vertex AI 등)
+            if not video.video_bytes:
+                self.client.files.download(file=video)
+            video.save(temp_path)
+        os.replace(temp_path, output_path)
+        return output_path
+
+    def submit(self, prompt: str, image_bytes: bytes = None, image_mime_type: str = "image/jpeg",
+               negative_prompt: str = None, output_path: str = None, max_wait: float = 600) -> Future:
+        """
+        작업을 제출하고 공용 폴러에 등록한 뒤 바로 Future 반환
+
+        Future는 비디오 저장이 끝나면 파일 경로를, 실패하면 예외를 담습니다.
+        future.cancel()을 호출하면 폴링을 멈춥니다. (서버 쪽 작업은 취소되지 않음)
+        """
+        operation = self.start_operation(prompt, image_bytes, image_mime_type, negative_prompt)
+        output_path = output_path or os.path.join("temp", f"veo_video_{uuid.uuid4()}.mp4")
+        future = Future()
+        self.poller.track(VeoOperation(self, operation, future, output_path, time.time() + max_wait))
+        return future
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    veo = VeoAPI(api_key=os.getenv("GOOGLE_API_KEY"))
+
+    future = veo.submit(
+        prompt="a close-up shot of a golden retriever playing in a field of sunflowers",
+        negative_prompt="barking, woofing",
+        output_path="veo3_video.mp4",
+    )
+    print("비디오 생성이 완료될 때까지 대기합니다...")
+    print(f"저장 완료: {future.result()}")
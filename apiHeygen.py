@@ -2,19 +2,22 @@ import requests
 import os
 from dotenv import load_dotenv
 import time
-import base64
+
+import rate_limiter
+from retry_policy import POLL_POLICY, REQUEST_TIMEOUT, SUBMIT_POLICY, raise_for_retryable_status
+from stream_body import Base64Source, StreamingJSONBody
 
 # Heygen API: image generation
 
 class HeygenAPI:
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.base_url = "https://api.heygen.com/v2/photo_avatar"
+        # HEYGEN_BASE_URL로 대역 서버(stub_server.py) 등 다른 주소 사용 가능
+        self.base_url = os.getenv("HEYGEN_BASE_URL", "https://api.heygen.com/v2/photo_avatar")
 
     def generate_avatar_photo(self, image_path: str, name: str, age: str, gender: str, ethnicity: str, orientation: str, pose: str, style: str, appearance: str):
         url = f"{self.base_url}/photo/generate"
-        with open(image_path, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        # 사진은 전송 시점에 청크 단위로 base64 인코딩 (전체 사본을 메모리에 만들지 않음)
         payload = {
             "name": name,
             "age": age,
@@ -24,15 +27,22 @@ class HeygenAPI:
             "pose": pose,
             "style": style,
             "appearance": appearance,
-            "photo": img_base64
+            "photo": Base64Source(image_path)
         }
+        body = StreamingJSONBody(payload)
         headers = {
             "accept": "application/json",
-            "Content-Type": "application/json",
-            "X-Api-Key": self.api_key
+            "X-Api-Key": self.api_key,
+            **body.headers()
         }
-        response = requests.post(url, headers=headers, json=payload)
-        return response.json()
+
+        def post():
+            rate_limiter.wait("heygen", "generate")
+            response = requests.post(url, headers=headers, data=body, timeout=REQUEST_TIMEOUT)
+            raise_for_retryable_status(response)
+            return response.json()
+
+        return SUBMIT_POLICY.call(post, description="HeyGen 생성 요청")
 
     def check_generation_status(self, generation_id: str):
         url = f"{self.base_url}/generation/{generation_id}"
@@ -40,8 +50,14 @@ class HeygenAPI:
             "accept": "application/json",
             "X-Api-Key": self.api_key
         }
-        response = requests.get(url, headers=headers)
-        return response.json()
+
+        def get():
+            rate_limiter.wait("heygen", "status")
+            response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            raise_for_retryable_status(response)
+            return response.json()
+
+        return POLL_POLICY.call(get, description="HeyGen 상태 조회")
 
 if __name__ == "__main__":
     load_dotenv()  # .env 파일에서 환경 변수 로드
@@ -11,13 +11,18 @@ except ImportError:
 import requests
 from dotenv import load_dotenv
 
+import rate_limiter
+from retry_policy import POLL_POLICY, REQUEST_TIMEOUT, SUBMIT_POLICY
+from stream_body import StreamingJSONBody
+
 # KlingAI API: video generation
 
 class KlingAIAPI:
     def __init__(self, ak: str, sk: str):
         self.ak = ak
         self.sk = sk
-        self.base_url = "https://api-singapore.klingai.com/v1"
+        # KLING_BASE_URL로 대역 서버(stub_server.py) 등 다른 주소 사용 가능
+        self.base_url = os.getenv("KLING_BASE_URL", "https://api-singapore.klingai.com/v1")
 
     # jwt 토큰 생성 및 반환
     def _get_api_token(self):
@@ -36,25 +41,34 @@ class KlingAIAPI:
             "Content-Type": "application/json"
         }
 
+    # data["image"]에는 URL, base64 문자열 또는 Base64Source(스트리밍 인코딩)를 넣을 수 있음
     def generate_video(self, data: dict):
         url = f"{self.base_url}/videos/image2video"
-        headers = self._get_headers()
+        body = StreamingJSONBody(data)
+        headers = {**self._get_headers(), **body.headers()}
         
         print("비디오 생성 작업을 시작합니다.")
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()  # HTTP 오류 시 예외 발생
-        
-        return response.json()
+
+        def post():
+            rate_limiter.wait("kling", "submit")
+            response = requests.post(url, headers=headers, data=body, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()  # HTTP 오류 시 예외 발생
+            return response.json()
+
+        return SUBMIT_POLICY.call(post, description="Kling 작업 제출")
 
     # 특정 작업의 ID 상태 조회 (task_id: 상태를 확인할 작업 ID)
     def check_task_status(self, task_id: str):
         url = f"{self.base_url}/videos/image2video/{task_id}"
         headers = self._get_headers()
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        return response.json()
+
+        def get():
+            rate_limiter.wait("kling", "status")
+            response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+
+        return POLL_POLICY.call(get, description="Kling 상태 조회")
 
 if __name__ == "__main__":
     load_dotenv()
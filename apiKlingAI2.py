@@ -1,23 +1,48 @@
-import openai
 import os
+import threading
 import time
 import requests
-import re
 from dotenv import load_dotenv
 
+import rate_limiter
+from poe_stream import VIDEO_EXTENSIONS, find_media_url, iter_sdk_deltas, iter_sse_deltas, scan_stream
+from retry_policy import DOWNLOAD_POLICY, GENERATE_TIMEOUT, REQUEST_TIMEOUT, RetryPolicy, RetryableError
+from stream_body import StreamingJSONBody, image_data_url_source
+
 # Poe API를 통한 KlingAI 비디오 생성 및 다운로드
 
 class KlingAI2API:
     def __init__(self, api_key: str):
-        self.client = openai.OpenAI(
-            api_key=api_key,
-            base_url="https://api.poe.com/v1",
-        )
+        self.api_key = api_key
+        # POE_BASE_URL로 대역 서버(stub_server.py) 등 다른 주소 사용 가능
+        self.base_url = os.getenv("POE_BASE_URL", "https://api.poe.com/v1")
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI SDK 클라이언트 (SDK 로드가 느리므로 처음 사용할 때 생성)"""
+        with self._client_lock:
+            if self._client is None:
+                import openai
+                self._client = openai.OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=GENERATE_TIMEOUT[1],
+                    max_retries=0,  # 재시도는 generate_and_download의 RetryPolicy에서 처리
+                )
+            return self._client
 
-    def generate_video(self, prompt: str):
-        """비디오 생성 요청"""
+    def generate_video(self, prompt: str, image_path: str = None):
+        """비디오 생성 요청 (첨부 이미지가 있으면 image2video)"""
         print(f"비디오 생성 요청: {prompt}")
         
+        # 첨부 이미지는 청크 단위로 base64 인코딩하며 직접 전송
+        if image_path and os.path.exists(image_path):
+            print(f"첨부 이미지: {image_path}")
+            return self._generate_video_with_attachment(prompt, image_path)
+        
+        rate_limiter.wait("poe", "chat")
         chat = self.client.chat.completions.create(
             model="DrRobertKlingVideo",
             messages=[{"role": "user", "content": prompt}],
@@ -28,24 +53,64 @@ class KlingAI2API:
         
         return response_content
 
-    def extract_image_url(self, response_content: str):
-        """응답에서 이미지 URL 추출"""
-        # 이미지 URL 패턴 매칭 (http/https로 시작하는 URL)
-        url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+\.(jpg|jpeg|png|gif|bmp|webp)'
-        urls = re.findall(url_pattern, response_content, re.IGNORECASE)
-        
-        if urls:
-            return urls[0][0] + '.' + urls[0][1]  # URL + 확장자
-        
-        # 더 일반적인 URL 패턴
-        general_url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-        general_urls = re.findall(general_url_pattern, response_content)
-        
-        for url in general_urls:
-            if any(ext in url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']):
-                return url
-                
-        return None
+    def _attachment_payload(self, prompt: str, image_path: str):
+        """첨부 이미지를 스트리밍 base64(data URL)로 포함한 chat completions 요청 본문"""
+        return {
+            "model": "DrRobertKlingVideo",
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": image_data_url_source(image_path)}
+                    }
+                ]
+            }],
+        }
+
+    def _generate_video_with_attachment(self, prompt: str, image_path: str):
+        """첨부 이미지를 스트리밍 본문으로 포함해 chat completions 요청 전송"""
+        body = StreamingJSONBody(self._attachment_payload(prompt, image_path))
+        headers = {"Authorization": f"Bearer {self.api_key}", **body.headers()}
+        rate_limiter.wait("poe", "chat")
+        response = requests.post(f"{self.base_url}/chat/completions", headers=headers, data=body,
+                                 timeout=GENERATE_TIMEOUT)
+        response.raise_for_status()
+        
+        response_content = response.json()["choices"][0]["message"]["content"]
+        print(f"응답: {response_content}")
+        
+        return response_content
+
+    def stream_video_url(self, prompt: str, image_path: str = None):
+        """
+        응답을 스트리밍으로 받으며 완성된 비디오 URL이 나타나는 즉시 반환
+        
+        Returns:
+            tuple: (비디오 URL 또는 None, 그때까지 받은 응답 텍스트)
+        """
+        print(f"비디오 생성 요청 (스트리밍): {prompt}")
+        if image_path and os.path.exists(image_path):
+            print(f"첨부 이미지: {image_path}")
+            deltas = iter_sse_deltas(self.base_url, self.api_key, self._attachment_payload(prompt, image_path))
+        else:
+            rate_limiter.wait("poe", "chat")
+            deltas = iter_sdk_deltas(self.client.chat.completions.create(
+                model="DrRobertKlingVideo",
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            ))
+        
+        # 비디오 모델이므로 비디오 URL만 결과로 인정 (미리보기 이미지 URL을 영상으로 저장하지 않도록)
+        media_url, response_content = scan_stream(deltas, VIDEO_EXTENSIONS)
+        print(f"응답: {response_content}")
+        
+        return media_url, response_content
+
+    def extract_video_url(self, response_content: str):
+        """응답에서 비디오 URL 추출 (없으면 None)"""
+        return find_media_url(response_content, VIDEO_EXTENSIONS)
 
     def download_image(self, image_url: str, output_dir: str = ".", filename: str = None):
         """이미지 파일 다운로드"""
@@ -53,11 +118,11 @@ class KlingAI2API:
             if not filename:
                 # URL에서 파일명 추출 또는 기본 파일명 생성
                 if '/' in image_url:
-                    filename = image_url.split('/')[-1]
-                    if not filename.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')):
-                        filename = f"klingai_image_{int(time.time())}.png"
+                    filename = image_url.split('?')[0].split('/')[-1]
+                    if not filename.lower().endswith(VIDEO_EXTENSIONS):
+                        filename = f"klingai_video_{int(time.time())}.mp4"
                 else:
-                    filename = f"klingai_image_{int(time.time())}.png"
+                    filename = f"klingai_video_{int(time.time())}.mp4"
             
             file_path = os.path.join(output_dir, filename)
             
@@ -67,12 +132,14 @@ class KlingAI2API:
             # 출력 디렉토리가 없으면 생성
             os.makedirs(output_dir, exist_ok=True)
             
-            response = requests.get(image_url, stream=True)
-            response.raise_for_status()
-            
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            def fetch():
+                response = requests.get(image_url, stream=True, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                with open(file_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f.write(chunk)
+
+            DOWNLOAD_POLICY.call(fetch, description="다운로드")
             
             print(f"다운로드 완료: {file_path}")
             return {
@@ -88,7 +155,7 @@ class KlingAI2API:
                 "message": f"다운로드 실패: {e}"
             }
 
-    def generate_and_download(self, prompt: str, output_dir: str = ".", filename: str = None, max_retries: int = 3):
+    def generate_and_download(self, prompt: str, output_dir: str = ".", filename: str = None, max_retries: int = 3, image_path: str = None, stream: bool = True):
         """
         이미지 생성 요청부터 다운로드까지 전체 프로세스 실행
         
@@ -97,54 +164,52 @@ class KlingAI2API:
             output_dir: 다운로드할 디렉토리 경로
             filename: 저장할 파일명 (None이면 자동 생성)
             max_retries: 재시도 횟수
+            image_path: 첨부할 이미지 파일 경로 (None이면 텍스트만)
+            stream: True면 응답을 스트리밍으로 받아 URL이 나오는 즉시 다운로드 시작
         
         Returns:
             dict: {"success": bool, "file_path": str, "message": str, "response": str}
         """
-        for attempt in range(max_retries):
-            try:
-                print(f"시도 {attempt + 1}/{max_retries}")
-                
-                # 이미지 생성 요청
-                response_content = self.generate_video(prompt)
-                
-                # URL 추출
-                image_url = self.extract_image_url(response_content)
-                
-                if not image_url:
-                    print("응답에서 이미지 URL을 찾을 수 없습니다.")
-                    if attempt < max_retries - 1:
-                        print("재시도합니다...")
-                        time.sleep(5)
-                        continue
-                    else:
-                        return {
-                            "success": False,
-                            "file_path": None,
-                            "message": "이미지 URL을 찾을 수 없습니다.",
-                            "response": response_content
-                        }
-                
-                print(f"이미지 URL 발견: {image_url}")
-                
-                # 이미지 다운로드
-                download_result = self.download_image(image_url, output_dir, filename)
-                download_result["response"] = response_content
-                
-                return download_result
-                
-            except Exception as e:
-                print(f"오류 발생: {e}")
-                if attempt < max_retries - 1:
-                    print("재시도합니다...")
-                    time.sleep(5)
-                else:
-                    return {
-                        "success": False,
-                        "file_path": None,
-                        "message": f"처리 중 오류 발생: {e}",
-                        "response": None
-                    }
+        def attempt():
+            if stream:
+                image_url, response_content = self.stream_video_url(prompt, image_path)
+            else:
+                response_content = self.generate_video(prompt, image_path)
+                image_url = self.extract_video_url(response_content)
+            
+            # 비디오 URL이 없으면 재시도 대상 (재시도 후에도 없으면 실패로 반환되어 ProviderError가 됨)
+            if not image_url:
+                raise RetryableError("응답에서 비디오 URL을 찾을 수 없습니다.", response_content)
+            return response_content, image_url
+
+        # 타임아웃/429/5xx/URL 누락만 지수 백오프로 재시도, 인증 오류나 정책 위반은 즉시 실패
+        policy = RetryPolicy(max_attempts=max_retries, base_delay=2.0, max_delay=20.0, deadline=900.0,
+                             idempotent=False)
+        try:
+            response_content, image_url = policy.call(attempt, description="klingai 생성 요청")
+        except RetryableError as e:
+            return {
+                "success": False,
+                "file_path": None,
+                "message": "비디오 URL을 찾을 수 없습니다.",
+                "response": e.content
+            }
+        except Exception as e:
+            print(f"오류 발생: {e}")
+            return {
+                "success": False,
+                "file_path": None,
+                "message": f"처리 중 오류 발생: {e}",
+                "response": None
+            }
+        
+        print(f"이미지 URL 발견: {image_url}")
+        
+        # 이미지 다운로드
+        download_result = self.download_image(image_url, output_dir, filename)
+        download_result["response"] = response_content
+        
+        return download_result
 
 if __name__ == "__main__":
     load_dotenv()
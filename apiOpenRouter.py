@@ -0,0 +1,206 @@
+import binascii
+import os
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+import rate_limiter
+from retry_policy import GENERATE_POLICY, GENERATE_TIMEOUT
+from stream_body import StreamingJSONBody, image_data_url_source
+
+# OpenRouter API: 이미지 생성/편집 (google/gemini-2.5-flash-image-preview)
+#
+# 응답의 choices[0].message.images에는 수 MB 크기의 data:image/...;base64 URL이 들어 있습니다.
+# 응답 전체를 json.dumps로 출력하지 않고 요약만 로그로 남기며,
+# base64는 청크 단위로 디코딩해 바로 파일에 쓰거나 bytes/PIL 이미지로 넘깁니다.
+# 인스턴스에 요청별 상태를 두지 않으므로 여러 스레드에서 같은 객체를 함께 써도 됩니다.
+
+DEFAULT_MODEL = "google/gemini-2.5-flash-image-preview"
+DECODE_CHUNK_SIZE = 4 * 256 * 1024  # base64 4문자 단위로 나누어 떨어지는 크기
+
+_MIME_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp", "image/gif": ".gif"}
+
+
+def parse_data_url(data_url: str) -> Tuple[str, int]:
+    """data URL의 MIME 타입과 base64 데이터 시작 위치 반환 (데이터 부분을 복사하지 않음)"""
+    if not data_url.startswith("data:"):
+        raise ValueError(f"data URL이 아닙니다: {data_url[:40]}")
+    comma = data_url.index(",", 0, 256)
+    header = data_url[5:comma]
+    if not header.endswith(";base64"):
+        raise ValueError(f"base64 data URL이 아닙니다: {header}")
+    return header[:-len(";base64")], comma + 1
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """data URL을 디코딩한 bytes 반환"""
+    _, start = parse_data_url(data_url)
+    return binascii.a2b_base64(data_url[start:])
+
+
+def decode_data_url_to_file(data_url: str, file_path: str, chunk_size: int = DECODE_CHUNK_SIZE) -> int:
+    """data URL을 청크 단위로 디코딩하며 파일에 기록하고 기록한 바이트 수 반환"""
+    _, start = parse_data_url(data_url)
+    written = 0
+    with open(file_path, "wb") as f:
+        for offset in range(start, len(data_url), chunk_size):
+            chunk = binascii.a2b_base64(data_url[offset:offset + chunk_size])
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def to_pil_image(data: bytes):
+    """디코딩한 bytes를 PIL 이미지로 변환 (Pillow는 필요할 때만 로드)"""
+    import io
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def iter_response_images(result: dict) -> Iterator[Tuple[int, str]]:
+    """응답에서 (순번, data URL) 목록 순회"""
+    for choice in result.get("choices") or []:
+        for index, image in enumerate((choice.get("message") or {}).get("images") or []):
+            yield index, image["image_url"]["url"]
+
+
+def summarize_response(result: dict) -> dict:
+    """로그용 응답 요약 (base64 데이터 제외)"""
+    choice = (result.get("choices") or [{}])[0]
+    message = choice.get("message") or {}
+    content = message.get("content") or ""
+    images = []
+    for _, data_url in iter_response_images(result):
+        if data_url.startswith("data:"):
+            mime_type, start = parse_data_url(data_url)
+            images.append({"mime_type": mime_type, "bytes": (len(data_url) - start) * 3 // 4})
+        else:
+            images.append({"url": data_url[:120]})
+    return {
+        "id": result.get("id"),
+        "model": result.get("model"),
+        "finish_reason": choice.get("finish_reason"),
+        "content": content[:200] + ("..." if len(content) > 200 else ""),
+        "images": images,
+        "usage": result.get("usage"),
+        "error": result.get("error"),
+    }
+
+
+class OpenRouterAPI:
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, site_url: str = None, site_name: str = None):
+        self.api_key = api_key
+        self.model = model
+        self.site_url = site_url if site_url is not None else os.getenv("YOUR_SITE_URL", "")
+        self.site_name = site_name if site_name is not None else os.getenv("YOUR_SITE_NAME", "")
+        # OPENROUTER_BASE_URL로 대역 서버(stub_server.py) 등 다른 주소 사용 가능
+        self.base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+    def chat(self, prompt: str, image_path: str = None, mime_type: str = "image/png") -> dict:
+        """이미지(선택)와 프롬프트를 보내고 응답 JSON 반환 (첨부 이미지는 청크 단위로 인코딩하며 전송)"""
+        content = [{"type": "text", "text": prompt}]
+        if image_path:
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"이미지 파일을 찾을 수 없습니다: {image_path}")
+            content.append({"type": "image_url", "image_url": {"url": image_data_url_source(image_path, mime_type)}})
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "modalities": ["image", "text"]
+        }
+        body = StreamingJSONBody(payload)
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "HTTP-Referer": self.site_url or "",  # 선택: openrouter.ai 순위 집계용 사이트 URL
+            "X-Title": self.site_name or "",  # 선택: openrouter.ai 순위 집계용 사이트 이름
+            **body.headers()
+        }
+
+        def post():
+            rate_limiter.wait("openrouter", "chat")
+            response = requests.post(f"{self.base_url}/chat/completions", headers=headers, data=body,
+                                     timeout=GENERATE_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+
+        result = GENERATE_POLICY.call(post, description="OpenRouter 이미지 생성")
+        print(f"OpenRouter 응답: {summarize_response(result)}")
+        return result
+
+    def generate_image_files(self, prompt: str, image_path: str = None, output_dir: str = ".",
+                             filename_prefix: str = "openrouter_image", mime_type: str = "image/png") -> List[str]:
+        """생성된 이미지를 파일로 저장하고 경로 목록 반환 (파일명은 동시 호출에도 겹치지 않음)"""
+        result = self.chat(prompt, image_path, mime_type)
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for index, data_url in iter_response_images(result):
+            if not data_url.startswith("data:"):
+                print(f"예상하지 못한 이미지 URL 형식: {data_url[:120]}")
+                continue
+            image_mime_type, _ = parse_data_url(data_url)
+            extension = _MIME_EXTENSIONS.get(image_mime_type, ".png")
+            file_path = os.path.join(output_dir, f"{filename_prefix}_{uuid.uuid4().hex[:12]}_{index + 1}{extension}")
+            size = decode_data_url_to_file(data_url, file_path)
+            print(f"이미지 저장: {file_path} ({size / 1024:.0f}KB)")
+            paths.append(file_path)
+        return paths
+
+    def generate_image_bytes(self, prompt: str, image_path: str = None, mime_type: str = "image/png") -> List[bytes]:
+        """생성된 이미지를 디코딩한 bytes 목록 반환"""
+        result = self.chat(prompt, image_path, mime_type)
+        return [decode_data_url(data_url) for _, data_url in iter_response_images(result)
+                if data_url.startswith("data:")]
+
+    def generate_pil_images(self, prompt: str, image_path: str = None, mime_type: str = "image/png") -> list:
+        """생성된 이미지를 PIL 이미지 목록으로 반환"""
+        return [to_pil_image(data) for data in self.generate_image_bytes(prompt, image_path, mime_type)]
+
+
+def run_cli(default_prompt: str, filename_prefix: str, description: str, argv: Optional[List[str]] = None):
+    """apiBanana2.py / send_image_with_prompt.py 공용 명령행 실행"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("image", help="첨부할 이미지 파일 경로")
+    parser.add_argument("--prompt", default=default_prompt, help="이미지와 함께 보낼 프롬프트")
+    parser.add_argument("--output-dir", default=".", help="생성된 이미지를 저장할 디렉토리")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="OpenRouter 모델")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        print("❌ OPENROUTER_API_KEY가 .env 파일에 설정되지 않았습니다.")
+        print("   .env 파일에 다음과 같이 추가해주세요:")
+        print("   OPENROUTER_API_KEY=sk-or-v1-your-api-key-here")
+        return 1
+    if not os.path.exists(args.image):
+        print(f"❌ 이미지 파일을 찾을 수 없습니다: {args.image}")
+        return 1
+
+    print("API 요청을 전송 중...")
+    client = OpenRouterAPI(api_key, model=args.model)
+    try:
+        paths = client.generate_image_files(args.prompt, args.image, args.output_dir, filename_prefix)
+    except Exception as e:
+        print(f"❌ API 요청이 실패했습니다: {e}")
+        return 1
+    if not paths:
+        print("❌ 응답에서 이미지를 찾을 수 없습니다.")
+        return 1
+    for path in paths:
+        print(f"이미지가 '{path}'로 저장되었습니다!")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(run_cli(
+        "Create a new image based on this reference.",
+        "openrouter_image",
+        "OpenRouter 이미지 생성",
+    ))
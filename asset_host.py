@@ -0,0 +1,208 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+import uuid
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Union
+from urllib.parse import parse_qs, quote, urlparse
+
+# 작업별 이미지를 짧은 수명의 서명된 URL로 게시하는 에셋 호스팅
+#
+# KlingAI image2video는 base64 대신 이미지 URL도 받으므로, 준비된 이미지를 URL로 넘기면
+# 생성 요청 본문이 수백 바이트로 줄어들고 413 재압축 단계도 필요 없어집니다.
+# ASSET_HOSTING=local 일 때 LocalAssetServer가 활성화되며, 다른 저장소(S3 등)는
+# AssetStore를 상속해 publish()만 구현하면 됩니다.
+# 여러 작업자 프로세스가 포트 하나의 서버를 공유하므로 서명 키(ASSET_SIGNING_KEY)와
+# 공급자가 접근할 외부 주소(ASSET_PUBLIC_BASE_URL)가 모두 설정된 경우에만 활성화합니다.
+
+DEFAULT_TTL = 30 * 60  # Kling이 이미지를 가져갈 때까지 충분한 시간 (30분)
+
+
+class AssetStore:
+    """이미지를 게시하고 외부에서 접근 가능한 URL을 돌려주는 저장소 인터페이스"""
+
+    def publish(self, data: Union[bytes, str], suffix: str = ".jpg", ttl: int = DEFAULT_TTL) -> str:
+        """바이트 또는 파일 경로를 게시하고 ttl초 동안 유효한 URL 반환"""
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """만료된 에셋 정리 (필요한 저장소만 구현)"""
+
+
+def sign_asset(secret: bytes, name: str, expires: int) -> str:
+    message = f"{name}:{expires}".encode("utf-8")
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+class _SignedAssetHandler(SimpleHTTPRequestHandler):
+    """서명과 만료 시간을 검증한 뒤 에셋 디렉토리의 파일만 제공"""
+
+    store: "LocalAssetServer" = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=self.store.root_dir, **kwargs)
+
+    def _check_signature(self) -> bool:
+        parsed = urlparse(self.path)
+        name = os.path.basename(parsed.path)
+        query = parse_qs(parsed.query)
+        try:
+            expires = int(query["exp"][0])
+            signature = query["sig"][0]
+        except (KeyError, ValueError, IndexError):
+            self.send_error(403, "Missing signature")
+            return False
+        if expires < time.time():
+            self.send_error(410, "Asset expired")
+            return False
+        expected = sign_asset(self.store.secret, name, expires)
+        if not hmac.compare_digest(expected, signature):
+            self.send_error(403, "Invalid signature")
+            return False
+        return True
+
+    def do_GET(self):
+        if self._check_signature():
+            super().do_GET()
+
+    def do_HEAD(self):
+        if self._check_signature():
+            super().do_HEAD()
+
+    def list_directory(self, path):
+        self.send_error(404, "Not found")
+        return None
+
+    def log_message(self, format, *args):
+        # 요청마다 stderr에 출력하지 않음
+        pass
+
+
+class LocalAssetServer(AssetStore):
+    """
+    로컬 디렉토리를 정적 파일 서버로 노출하는 AssetStore
+
+    public_base_url은 공급자(KlingAI)가 접근할 수 있는 주소여야 합니다.
+    (예: http://15.165.13.49:8502)
+    secret은 같은 포트의 서버를 공유하는 모든 프로세스가 같은 값을 써야 합니다.
+    """
+
+    def __init__(self, public_base_url: str, secret: str, root_dir: str = "temp/assets", host: str = "0.0.0.0",
+                 port: int = 8502):
+        if not public_base_url or not secret:
+            raise ValueError("LocalAssetServer에는 public_base_url과 secret이 모두 필요합니다.")
+        self.root_dir = os.path.abspath(root_dir)
+        self.host = host
+        self.port = port
+        self.public_base_url = public_base_url.rstrip("/")
+        self.secret = secret.encode("utf-8")
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def start(self):
+        """백그라운드 스레드에서 HTTP 서버 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._server is not None:
+                return
+            handler = type("SignedAssetHandler", (_SignedAssetHandler,), {"store": self})
+            try:
+                self._server = ThreadingHTTPServer((self.host, self.port), handler)
+            except OSError as e:
+                # 같은 ASSET_SIGNING_KEY와 디렉토리를 쓰는 다른 프로세스가 이미 서버를 띄운 경우
+                print(f"에셋 서버 포트 {self.port} 사용 중, 기존 서버를 사용합니다: {e}")
+                self._server = False
+                return
+            self._thread = threading.Thread(target=self._server.serve_forever, name="asset-host", daemon=True)
+            self._thread.start()
+            print(f"에셋 서버 시작: {self.host}:{self.port} -> {self.public_base_url}")
+
+    def stop(self):
+        with self._lock:
+            if not self._server:
+                self._server = None
+                return
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def publish(self, data: Union[bytes, str], suffix: str = ".jpg", ttl: int = DEFAULT_TTL) -> str:
+        self.start()
+        self.purge_expired()
+
+        # 만료 시각을 파일 이름에 넣어 purge_expired가 게시마다 다른 ttl을 지킬 수 있게 함
+        expires = int(time.time()) + ttl
+        name = f"{expires}_{uuid.uuid4().hex}{suffix}"
+        file_path = os.path.join(self.root_dir, name)
+        if isinstance(data, str):
+            with open(data, "rb") as src, open(file_path, "wb") as dst:
+                while chunk := src.read(1024 * 1024):
+                    dst.write(chunk)
+        else:
+            with open(file_path, "wb") as f:
+                f.write(data)
+
+        signature = sign_asset(self.secret, name, expires)
+        return f"{self.public_base_url}/{quote(name)}?exp={expires}&sig={signature}"
+
+    def purge_expired(self):
+        """게시할 때 정한 만료 시각이 지난 파일 삭제 (만료 시각이 없는 이름은 수정 후 DEFAULT_TTL 기준)"""
+        now = time.time()
+        for name in os.listdir(self.root_dir):
+            file_path = os.path.join(self.root_dir, name)
+            prefix, _, _ = name.partition("_")
+            try:
+                expires = int(prefix) if prefix.isdigit() else os.path.getmtime(file_path) + DEFAULT_TTL
+                if now > expires:
+                    os.remove(file_path)
+            except OSError:
+                pass
+
+
+_asset_store = None
+_asset_store_warned = False
+_asset_store_lock = threading.Lock()
+
+
+def get_asset_store() -> Optional[AssetStore]:
+    """
+    환경 변수 설정에 따른 프로세스 공용 AssetStore 반환 (비활성화 시 None)
+
+    ASSET_HOSTING=local          로컬 정적 파일 서버 사용
+    ASSET_HOST_PORT=8502         서버 포트
+    ASSET_PUBLIC_BASE_URL=...    공급자가 접근할 외부 주소 (필수)
+    ASSET_SIGNING_KEY=...        URL 서명 키, 모든 프로세스가 같은 값 (필수)
+
+    필수 값이 없으면 경고 후 비활성화합니다. (이미지는 base64로 전송)
+    """
+    global _asset_store, _asset_store_warned
+    with _asset_store_lock:
+        if _asset_store is not None:
+            return _asset_store
+        if os.getenv("ASSET_HOSTING", "").lower() == "local":
+            public_base_url = os.getenv("ASSET_PUBLIC_BASE_URL")
+            secret = os.getenv("ASSET_SIGNING_KEY")
+            if not (public_base_url and secret):
+                if not _asset_store_warned:
+                    _asset_store_warned = True
+                    print("⚠️ ASSET_HOSTING=local에는 ASSET_PUBLIC_BASE_URL과 ASSET_SIGNING_KEY가 모두 필요합니다. "
+                          "에셋 호스팅 없이 이미지를 base64로 전송합니다.")
+                return None
+            _asset_store = LocalAssetServer(
+                public_base_url=public_base_url,
+                secret=secret,
+                root_dir=os.getenv("ASSET_HOST_DIR", "temp/assets"),
+                port=int(os.getenv("ASSET_HOST_PORT", "8502")),
+            )
+        return _asset_store
+
+
+def set_asset_store(store: Optional[AssetStore]):
+    """다른 저장소 구현(또는 테스트용 대체 저장소)을 프로세스 공용으로 등록"""
+    global _asset_store
+    with _asset_store_lock:
+        _asset_store = store
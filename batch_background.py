@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from apiOpenRouter import DEFAULT_MODEL, OpenRouterAPI, decode_data_url_to_file, iter_response_images, parse_data_url
+
+# 사진 여러 장의 배경을 한 번에 바꾸는 배치 처리 (OpenRouter Gemini 이미지 모델)
+#
+# 입력은 디렉토리(이미지 파일 전체) 또는 매니페스트 파일입니다.
+#   - .jsonl: 한 줄에 {"image": "경로", "prompt": "(선택) 개별 프롬프트", "output": "(선택) 결과 경로"}
+#   - 그 외: 한 줄에 이미지 경로 하나 (# 주석, 빈 줄 무시)
+# 매니페스트 안의 상대 경로(image, output)는 매니페스트 위치 기준이며,
+# 결과 파일 확장자는 모델이 돌려준 이미지 형식(MIME)에 맞춰 정합니다.
+# 결과 파일이 이미 있으면 건너뛰므로 중단된 배치를 같은 명령으로 다시 실행하면 이어서 처리합니다.
+# 동시 요청 수는 --concurrency로 제한하며, 공급자 한도는 rate_limiter가 별도로 지킵니다.
+
+DEFAULT_PROMPT = "이 이미지의 배경을 제주도 한라산과 바다로 바꿔주세요. 인물은 그대로 유지하고 배경만 제주도의 아름다운 자연경관으로 변경해주세요."
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+_MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+
+class BatchItem:
+    def __init__(self, image_path: str, output_path: str, prompt: str):
+        self.image_path = image_path
+        self.output_path = output_path
+        self.prompt = prompt
+
+
+def _default_output_path(image_path: str, output_dir: str) -> str:
+    # a.jpg와 a.png가 같은 결과 파일을 쓰지 않도록 원본 확장자까지 이름에 포함 (a.jpg_background.png)
+    return os.path.join(output_dir, f"{os.path.basename(image_path)}_background.png")
+
+
+def _output_root(output_path: str) -> str:
+    """결과 경로에서 이미지 확장자를 뺀 부분 (실제 확장자는 응답 MIME 타입으로 정함)"""
+    root, extension = os.path.splitext(output_path)
+    return root if extension.lower() in _MIME_TYPES or extension.lower() in _EXTENSIONS.values() else output_path
+
+
+def _output_for_mime(output_path: str, mime_type: str) -> str:
+    return _output_root(output_path) + _EXTENSIONS.get(mime_type, ".png")
+
+
+def _existing_output(output_path: str) -> Optional[str]:
+    """이전 실행에서 (어떤 형식으로든) 이미 만든 결과 파일"""
+    root = _output_root(output_path)
+    for extension in sorted(set(_EXTENSIONS.values()) | {".jpeg"}):
+        if os.path.exists(root + extension):
+            return root + extension
+    return None
+
+
+def load_items(source: str, output_dir: str, prompt: str = DEFAULT_PROMPT) -> List[BatchItem]:
+    """디렉토리 또는 매니페스트에서 처리할 항목 목록 생성"""
+    items = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image_path = os.path.join(source, name)
+                items.append(BatchItem(image_path, _default_output_path(image_path, output_dir), prompt))
+        return items
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if source.endswith(".jsonl") else {"image": line}
+            # 매니페스트 안의 상대 경로는 매니페스트 위치 기준
+            image_path = os.path.join(base_dir, entry["image"])
+            if entry.get("output"):
+                output_path = os.path.join(base_dir, entry["output"])
+            else:
+                output_path = _default_output_path(image_path, output_dir)
+            items.append(BatchItem(image_path, output_path, entry.get("prompt") or prompt))
+
+    # 확장자만 다른 결과 경로도 같은 파일이 될 수 있으므로 확장자를 뺀 경로로 충돌 확인
+    seen = {}
+    for item in items:
+        root = os.path.abspath(_output_root(item.output_path))
+        if root in seen:
+            raise ValueError(f"결과 경로가 겹칩니다: {seen[root]}, {item.image_path} -> {item.output_path}")
+        seen[root] = item.image_path
+    return items
+
+
+def process_item(client: OpenRouterAPI, item: BatchItem) -> dict:
+    """이미지 한 장 처리: 결과 이미지를 임시 파일에 청크 단위로 쓰고 완료 후 이름 변경"""
+    existing = _existing_output(item.output_path)
+    if existing:
+        return {"image": item.image_path, "status": "skipped", "output": existing}
+
+    start_time = time.time()
+    temp_path = None
+    try:
+        mime_type = _MIME_TYPES.get(os.path.splitext(item.image_path)[1].lower(), "image/png")
+        result = client.chat(item.prompt, item.image_path, mime_type)
+        data_url = next((url for _, url in iter_response_images(result) if url.startswith("data:")), None)
+        if data_url is None:
+            raise RuntimeError(f"응답에서 이미지를 찾을 수 없습니다: {result.get('error')}")
+        del result  # 수 MB의 응답 JSON을 디코딩 중에 두 벌 들고 있지 않도록
+
+        # JPEG 응답을 .png 이름으로 저장하지 않도록 응답 MIME 타입으로 확장자 결정
+        output_path = _output_for_mime(item.output_path, parse_data_url(data_url)[0])
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        temp_path = f"{output_path}.part"
+        size = decode_data_url_to_file(data_url, temp_path)
+        os.replace(temp_path, output_path)
+    except Exception as e:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return {"image": item.image_path, "status": "failed", "error": str(e),
+                "latency": round(time.time() - start_time, 2)}
+
+    return {"image": item.image_path, "status": "done", "output": output_path, "bytes": size,
+            "latency": round(time.time() - start_time, 2)}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_batch(items: List[BatchItem], client: OpenRouterAPI, concurrency: int = 4) -> dict:
+    """항목을 동시 요청 수 제한 안에서 처리하고 처리량/지연시간 보고서 반환"""
+    results = []
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        futures = [executor.submit(process_item, client, item) for item in items]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            count = len(results)
+            detail = result.get("output") or result.get("error")
+            latency = f" {result['latency']:.1f}s" if "latency" in result else ""
+            print(f"[{count}/{len(items)}] {result['status']}{latency}: {result['image']} -> {detail}")
+
+    elapsed = time.time() - start_time
+    latencies = [r["latency"] for r in results if r["status"] == "done"]
+    summary = {
+        "total": len(items),
+        "done": len(latencies),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "elapsed": round(elapsed, 2),
+        "images_per_minute": round(len(latencies) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        summary.update({
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_max": max(latencies),
+        })
+    return {"summary": summary, "items": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="사진 배경 일괄 변경 (OpenRouter)")
+    parser.add_argument("source", help="이미지 디렉토리 또는 매니페스트(.jsonl / 경로 목록)")
+    parser.add_argument("--output-dir", default="temp/batch_background", help="결과 이미지 디렉토리")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="매니페스트에 프롬프트가 없을 때 사용할 프롬프트")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시 요청 수")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="OpenRouter 모델")
+    parser.add_argument("--report", help="처리 결과 보고서(JSON) 저장 경로")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        print("❌ OPENROUTER_API_KEY가 .env 파일에 설정되지 않았습니다.")
+        return 1
+
+    try:
+        items = load_items(args.source, args.output_dir, args.prompt)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if not items:
+        print(f"처리할 이미지가 없습니다: {args.source}")
+        return 1
+    print(f"{len(items)}개 이미지 처리 시작 (동시 {args.concurrency}개)")
+
+    report = run_batch(items, OpenRouterAPI(api_key, model=args.model), args.concurrency)
+    print(f"완료: {json.dumps(report['summary'], ensure_ascii=False)}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["summary"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+# 이미지 처리 벤치마크 (compress_image, compress_image_for_api, 업로드부터 공급자 전송 본문까지)
+#
+#   uv run python benchmarks/bench_images.py --repeat 5
+#   uv run python benchmarks/bench_images.py --baseline benchmarks/results/images_20250101-120000.json
+#
+# 실제로 올라오는 크기와 모드의 이미지(48MP JPEG, 긴 PNG 스크린샷, 투명 팔레트 PNG 등)를 생성해
+# temp/bench_images에 캐시하고, 이미지와 함수 조합마다 새 프로세스에서 지연 시간(중앙값/p95),
+# 결과 크기, 최대 메모리(tracemalloc 파이썬 힙, Pillow 버퍼를 포함한 RSS 증가량)를 기록합니다.
+
+CORPUS_DIR = "temp/bench_images"
+FUNCTIONS = ["compress_image", "compress_image_for_api", "upload_to_payload"]
+REGRESSION_METRICS = ["median_seconds", "output_bytes", "tracemalloc_peak_mb", "rss_delta_mb"]
+
+
+def _photo(size, seed: int):
+    """카메라 사진처럼 고주파 성분이 있는 RGB 이미지 (그라데이션 + 채널별 노이즈)"""
+    from PIL import Image, ImageFilter
+
+    gradient = Image.linear_gradient("L").resize(size)
+    bands = [Image.blend(gradient, Image.effect_noise(size, 30 + 10 * channel).filter(ImageFilter.BoxBlur(1)), 0.4)
+             for channel in range((seed % 3), (seed % 3) + 3)]
+    return Image.merge("RGB", bands)
+
+
+def _screenshot(size, mode: str = "RGB"):
+    """넓은 단색 영역과 글줄이 많은 화면 캡처 형태 이미지"""
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    image = Image.new(mode, size, (245, 246, 248, 255) if mode == "RGBA" else (245, 246, 248))
+    draw = ImageDraw.Draw(image)
+    for top in range(0, height, 240):
+        draw.rectangle((40, top + 20, width - 40, top + 220), outline=(200, 200, 210), width=2,
+                       fill=(255, 255, 255))
+        for line in range(6):
+            y = top + 45 + line * 28
+            draw.rectangle((70, y, 70 + (width - 200) * (0.4 + 0.1 * ((top // 240 + line) % 6)), y + 12),
+                           fill=(60, 60, 70))
+    return image
+
+
+def _palette(size):
+    """투명색이 지정된 팔레트(P) PNG (로고, 스티커 형태)"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("P", size, 0)
+    image.putpalette([0, 0, 0] + [(index * 37) % 256 for index in range(3, 768)])
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    for index in range(1, 64):
+        x, y = (index * 97) % width, (index * 61) % height
+        draw.ellipse((x, y, x + width // 6, y + height // 6), fill=index)
+    image.info["transparency"] = 0
+    return image
+
+
+# 이름: (파일 이름, 생성 함수, 저장 옵션)
+CORPUS = {
+    "jpeg_48mp": ("jpeg_48mp.jpg", lambda: _photo((8064, 6048), 1), {"quality": 92}),
+    "jpeg_12mp": ("jpeg_12mp.jpg", lambda: _photo((4032, 3024), 2), {"quality": 90}),
+    "jpeg_portrait_small": ("jpeg_portrait_small.jpg", lambda: _photo((1080, 1440), 3), {"quality": 85}),
+    "png_photo_rgb": ("png_photo_rgb.png", lambda: _photo((3024, 4032), 4), {}),
+    "png_screenshot_tall": ("png_screenshot_tall.png", lambda: _screenshot((2880, 12000)), {}),
+    "png_screenshot_rgba": ("png_screenshot_rgba.png", lambda: _screenshot((2560, 1600), "RGBA"), {}),
+    "png_palette_transparent": ("png_palette_transparent.png", lambda: _palette((2048, 2048)), {}),
+    "png_grayscale": ("png_grayscale.png", lambda: _photo((3000, 4000), 5).convert("L"), {}),
+}
+
+
+def build_corpus(names: List[str]) -> dict:
+    """코퍼스 이미지 생성 (이미 있으면 재사용), 이름별 경로 반환"""
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    paths = {}
+    for name in names:
+        filename, make, options = CORPUS[name]
+        path = os.path.join(CORPUS_DIR, filename)
+        if not os.path.exists(path):
+            print(f"코퍼스 생성 중: {filename}")
+            make().save(path, **options)
+        paths[name] = path
+    return paths
+
+
+def _upload_to_payload(data: bytes) -> int:
+    """app.py 업로드부터 공급자 요청 본문까지: 업로드 압축 → temp PNG 저장 → API 압축 → base64 스트리밍"""
+    from PIL import Image
+
+    from image_utils import compress_image
+    from providers import KlingVideoGenerator
+
+    compressed = compress_image(io.BytesIO(data), max_size_mb=2, quality=80)
+    path = os.path.join(CORPUS_DIR, f"upload_{uuid.uuid4()}.png")
+    try:
+        Image.open(compressed).save(path)
+        source = KlingVideoGenerator("bench", "bench")._prepare_image(path, None)
+        return sum(len(chunk) for chunk in source.iter_encoded())
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _call(function: str, path: str, data: bytes) -> int:
+    """측정 대상 한 번 실행, 결과 크기(바이트) 반환"""
+    from image_utils import compress_image, compress_image_for_api
+
+    if function == "compress_image":
+        upload = io.BytesIO(data)
+        result = compress_image(upload, max_size_mb=2, quality=80)
+        return len(result.getvalue())
+    if function == "compress_image_for_api":
+        return len(compress_image_for_api(path))
+    return _upload_to_payload(data)
+
+
+def _measure(task: dict) -> dict:
+    """새 프로세스에서 이미지 하나, 함수 하나 측정"""
+    common.use_repo_root()
+    # 공급자 준비 단계가 이미지를 게시하지 않고 base64 본문을 만들도록
+    os.environ.pop("ASSET_HOSTING", None)
+    import image_utils  # noqa: F401
+    import providers  # noqa: F401  (import 시간과 메모리를 측정에서 제외)
+
+    path, function = task["path"], task["function"]
+    with open(path, "rb") as f:
+        data = f.read()
+    common.reset_peak_rss()
+    rss_before = common.peak_rss_mb()["peak_rss_mb"]
+
+    timings, output_bytes = [], None
+    for _ in range(task["repeat"]):
+        start_time = time.perf_counter()
+        output_bytes = _call(function, path, data)
+        timings.append(time.perf_counter() - start_time)
+    rss_after = common.peak_rss_mb()["peak_rss_mb"]
+
+    # tracemalloc은 시간을 늘리므로 따로 한 번 더 실행 (Pillow의 C 버퍼는 RSS 증가량으로 확인)
+    tracemalloc.start()
+    _call(function, path, data)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "input_bytes": len(data),
+        "output_bytes": output_bytes,
+        "median_seconds": round(statistics.median(timings), 4),
+        "p95_seconds": round(common.percentile(timings, 0.95), 4),
+        "tracemalloc_peak_mb": round(traced_peak / (1024 * 1024), 1),
+        "rss_delta_mb": round(rss_after - rss_before, 1),
+        "peak_rss_mb": rss_after,
+        "repeat": task["repeat"],
+    }
+
+
+def _run(task: dict) -> dict:
+    # 이전 측정에서 커진 최대 RSS가 섞이지 않도록 측정마다 새 프로세스
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_measure, task).result()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="이미지 처리 벤치마크")
+    parser.add_argument("--repeat", type=int, default=3, help="조합별 반복 횟수")
+    parser.add_argument("--image", choices=sorted(CORPUS), action="append", help="일부 이미지만 측정")
+    parser.add_argument("--function", choices=FUNCTIONS, action="append", help="일부 함수만 측정")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: benchmarks/results/images_<시각>.json)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="회귀로 볼 증가 비율 (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    common.use_repo_root()
+    paths = build_corpus(args.image or list(CORPUS))
+
+    results = {}
+    for function in args.function or FUNCTIONS:
+        for name, path in paths.items():
+            print(f"측정 중: {function}/{name}")
+            results[f"{function}/{name}"] = _run({"function": function, "path": path, "repeat": args.repeat})
+
+    print()
+    common.print_table(results, ["input_bytes", "output_bytes", "median_seconds", "p95_seconds",
+                                 "tracemalloc_peak_mb", "rss_delta_mb"])
+    meta = common.run_meta(["pillow"])
+    meta["repeat"] = args.repeat
+    path = common.save_results("images", results, meta, args.output)
+    print(f"\n결과 저장: {path}")
+
+    if args.baseline:
+        return common.report_regressions(
+            common.compare(results, args.baseline, REGRESSION_METRICS, args.threshold), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
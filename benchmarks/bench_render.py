@@ -0,0 +1,265 @@
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+# 렌더링 벤치마크 (subtitle_creator_agent, 자막 그리기, 장면별 렌더링, final_producer_agent 전체 67초 렌더링)
+#
+#   uv run python benchmarks/bench_render.py --repeat 3
+#   uv run python benchmarks/bench_render.py --baseline benchmarks/results/render_20250101-120000.json
+#
+# resources/theme의 테마 영상과 생성한 테스트 사진으로 실제와 같은 7장면 스토리보드를 만들고,
+# 측정마다 새 프로세스에서 실행해 벽시계 시간, 초당 프레임, 최대 RSS(파이썬/ffmpeg), 결과 파일 크기를 기록합니다.
+# 결과는 benchmarks/results/render_<시각>.json에 저장되며, --baseline과 비교해 --threshold 넘게 느려지거나
+# 메모리를 더 쓰면 표시하고 종료 코드 1을 돌려줍니다. (moviepy 업그레이드 전후 비교 등)
+
+DURATIONS = [10, 10, 10, 5, 10, 10, 12]
+FPS = 24
+SUBTITLE_LINES = {
+    2: "가족과 함께 바다에 갔던 날",
+    3: "당신이 처음 웃어 주던 그 봄날",
+    5: "아이들이 처음 걸음마를 떼던 날",
+    6: "우리 함께 걷던 동네 골목길",
+}
+BENCH_DIR = "temp/bench_render"
+# 벤치마크가 실제 작업자와 렌더링 슬롯을 나눠 쓰지 않도록 별도 DB
+BENCH_ADMISSION_DB = os.path.join(BENCH_DIR, "admission.sqlite3")
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/nanum/NanumGothic.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+REGRESSION_METRICS = ["wall_seconds", "peak_rss_mb", "child_peak_rss_mb", "cold_seconds"]
+
+
+def make_test_photo(path: str, index: int, size=(1536, 2048)):
+    """인물 사진 크기의 테스트 이미지 (그라데이션 + 도형, 번호마다 다른 색)"""
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    tint = Image.new("RGB", size, ((60 * index) % 256, (120 + 40 * index) % 256, (200 - 30 * index) % 256))
+    image = Image.blend(image, tint, 0.5)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((width * 0.25, height * 0.15, width * 0.75, height * 0.55), fill=(230, 200, 180))
+    draw.rectangle((width * 0.15, height * 0.55, width * 0.85, height), fill=(70, 70, 90))
+    image.save(path)
+
+
+def _theme_clip(path: str) -> str:
+    # 배포 서버에만 있는 테마 영상이 없으면 저장소에 포함된 영상으로 대신함
+    if os.path.exists(path):
+        return path
+    clips = sorted(glob.glob("resources/theme/*.mp4"))
+    if not clips:
+        raise FileNotFoundError("resources/theme에 테마 영상이 없습니다.")
+    return clips[0]
+
+
+def _subtitle_style(font: Optional[str]) -> Optional[str]:
+    """자막 스타일 이름 (기본 폰트가 없으면 찾은 폰트로 bench 스타일 추가, 폰트가 없으면 None)"""
+    from scenes import SUBTITLE_STYLES
+
+    if not font and os.path.exists(SUBTITLE_STYLES["default"]["font"]):
+        return "default"
+    font = font or next((path for path in FONT_CANDIDATES if os.path.exists(path)), None)
+    if not font:
+        return None
+    SUBTITLE_STYLES["bench"] = {**SUBTITLE_STYLES["default"], "font": font}
+    return "bench"
+
+
+def build_storyboard(photo_source: str, font: Optional[str]) -> dict:
+    """7장면 스토리보드와 장면 기술자 생성 (테스트 사진/정지 영상은 BENCH_DIR에 캐시)"""
+    from scenes import PHOTO_SCENES, THEME_CLIPS, make_scene, make_subtitle
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    image_paths, video_paths = [], []
+    for index in range(len(PHOTO_SCENES)):
+        image_path = os.path.join(BENCH_DIR, f"photo_{index + 1}.png")
+        if not os.path.exists(image_path):
+            make_test_photo(image_path, index + 1)
+        image_paths.append(image_path)
+        if photo_source == "video":
+            # 공급자가 만든 모션 영상 대신 같은 길이의 정지 영상 사용
+            video_path = os.path.join(BENCH_DIR, f"photo_{index + 1}.mp4")
+            if not os.path.exists(video_path):
+                from pipeline import write_still_video
+                write_still_video(image_path, video_path)
+            video_paths.append(video_path)
+
+    style = _subtitle_style(font)
+    if style is None:
+        print("⚠ 자막 폰트를 찾을 수 없어 자막 없이 측정합니다. (--font로 지정)")
+
+    scenes = []
+    for number, duration in enumerate(DURATIONS, start=1):
+        if number in THEME_CLIPS:
+            source = {"kind": "video", "path": _theme_clip(THEME_CLIPS[number]), "fallback": False}
+        elif photo_source == "video":
+            source = {"kind": "video", "path": video_paths[PHOTO_SCENES[number]], "fallback": False}
+        else:
+            source = {"kind": "image", "path": image_paths[PHOTO_SCENES[number]], "fallback": False}
+        subtitle = make_subtitle(SUBTITLE_LINES[number], style) if style and number in SUBTITLE_LINES else None
+        scenes.append(make_scene(number, number, duration, source, subtitle))
+
+    script = "\n".join(SUBTITLE_LINES.get(number, f"장면 {number}") for number in range(1, 8))
+    state = {
+        "script": script,
+        "storyboard": [{"image_index": number, "duration": duration}
+                       for number, duration in enumerate(DURATIONS, start=1)],
+        "image_paths": image_paths,
+        "generated_video_paths": video_paths,
+    }
+    return {"scenes": scenes, "state": state, "style": style}
+
+
+def _child_setup(style: Optional[str], font_path: Optional[str]):
+    common.use_repo_root()
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    os.environ["ADMISSION_DB"] = BENCH_ADMISSION_DB
+    if style == "bench":
+        from scenes import SUBTITLE_STYLES
+        SUBTITLE_STYLES["bench"] = {**SUBTITLE_STYLES["default"], "font": font_path}
+
+
+def _measure(task: dict) -> dict:
+    """새 프로세스에서 측정 하나 실행"""
+    _child_setup(task.get("style"), task.get("font"))
+    import admission
+    import pipeline
+    from scenes import SUBTITLE_CACHE_DIR, render_subtitle_image
+
+    kind = task["kind"]
+    result = {}
+    start_time = time.perf_counter()
+    if kind == "subtitle_creator":
+        output = pipeline.subtitle_creator_agent(task["state"])
+        result["error"] = output.get("error_message")
+    elif kind == "subtitle":
+        subtitle = task["subtitle"]
+        cached = os.path.join(SUBTITLE_CACHE_DIR, f"{subtitle['hash']}.png")
+        if os.path.exists(cached):
+            os.remove(cached)
+        render_subtitle_image(subtitle)
+        result["cold_seconds"] = time.perf_counter() - start_time
+        warm_start = time.perf_counter()
+        render_subtitle_image(subtitle)
+        result["warm_seconds"] = time.perf_counter() - warm_start
+    else:
+        scenes = task["scenes"]
+        if kind == "full":
+            # 실제 작업과 같이 수락 제어 구간 안에서 렌더링
+            output = pipeline.final_producer_agent({"scenes": scenes, "audio_path": None})
+        else:
+            decoders = sum(1 for scene in scenes if scene["source"]["kind"] == "video")
+            with admission.render(decoders) as threads:
+                output = pipeline.render_final_video(scenes, None, threads)
+        video_path = output.get("final_video_path")
+        result["error"] = output.get("error_message")
+        if video_path and os.path.exists(video_path):
+            result["output_bytes"] = os.path.getsize(video_path)
+            if not task.get("keep_outputs"):
+                os.remove(video_path)
+        frames = int(sum(scene["duration"] for scene in scenes) * FPS)
+        result["frames"] = frames
+    result["wall_seconds"] = time.perf_counter() - start_time
+    if result.get("frames"):
+        result["fps"] = result["frames"] / result["wall_seconds"]
+    result.update(common.peak_rss_mb())
+    return result
+
+
+def _run(task: dict) -> dict:
+    # 이전 측정의 메모리/캐시가 섞이지 않도록 측정마다 새 프로세스
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_measure, task).result()
+
+
+def _summarize(runs: List[dict]) -> dict:
+    """반복 측정 요약: 시간은 중앙값, 메모리는 최댓값"""
+    summary = dict(runs[-1])
+    for key in ("wall_seconds", "cold_seconds", "warm_seconds", "fps"):
+        if key in summary:
+            summary[key] = round(statistics.median(run[key] for run in runs), 4)
+    for key in ("peak_rss_mb", "child_peak_rss_mb"):
+        summary[key] = max(run[key] for run in runs)
+    summary["repeat"] = len(runs)
+    return {key: value for key, value in summary.items() if value is not None}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="렌더링 벤치마크")
+    parser.add_argument("--repeat", type=int, default=1, help="항목별 반복 횟수 (시간은 중앙값)")
+    parser.add_argument("--photo-source", choices=("video", "image"), default="video",
+                        help="사진 장면 배경: video(생성 영상 대신 정지 영상), image(원본 사진)")
+    parser.add_argument("--font", help="자막 폰트 (기본 폰트가 없을 때)")
+    parser.add_argument("--only", choices=("subtitles", "scenes", "full"), action="append",
+                        help="일부만 측정 (여러 번 지정 가능)")
+    parser.add_argument("--threads", type=int, help="인코더 스레드 수 (ADMISSION_ENCODER_THREADS)")
+    parser.add_argument("--keep-outputs", action="store_true", help="렌더링 결과 영상을 지우지 않음")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: benchmarks/results/render_<시각>.json)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="회귀로 볼 증가 비율 (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    common.use_repo_root()
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    os.environ["ADMISSION_DB"] = BENCH_ADMISSION_DB
+    if args.threads:
+        os.environ["ADMISSION_ENCODER_THREADS"] = str(args.threads)
+    parts = set(args.only or ("subtitles", "scenes", "full"))
+
+    storyboard = build_storyboard(args.photo_source, args.font)
+    scenes, style = storyboard["scenes"], storyboard["style"]
+    base_task = {"style": style, "keep_outputs": args.keep_outputs}
+    if style == "bench":
+        from scenes import SUBTITLE_STYLES
+        base_task["font"] = SUBTITLE_STYLES["bench"]["font"]
+
+    tasks = {}
+    if "subtitles" in parts:
+        tasks["subtitle_creator"] = {**base_task, "kind": "subtitle_creator", "state": storyboard["state"]}
+        for scene in scenes:
+            if scene["subtitle"]:
+                tasks[f"subtitle-{scene['index']}"] = {**base_task, "kind": "subtitle", "subtitle": scene["subtitle"]}
+    if "scenes" in parts:
+        for scene in scenes:
+            tasks[f"scene-{scene['index']}"] = {**base_task, "kind": "scene", "scenes": [scene]}
+    if "full" in parts:
+        tasks["full"] = {**base_task, "kind": "full", "scenes": scenes}
+
+    results = {}
+    for name, task in tasks.items():
+        runs = []
+        for attempt in range(args.repeat):
+            print(f"측정 중: {name} ({attempt + 1}/{args.repeat})")
+            runs.append(_run(task))
+        results[name] = _summarize(runs)
+        if results[name].get("error"):
+            print(f"  오류: {results[name]['error']}")
+
+    print()
+    common.print_table(results, ["wall_seconds", "fps", "peak_rss_mb", "child_peak_rss_mb", "output_bytes"])
+    meta = common.run_meta(["moviepy", "imageio-ffmpeg", "numpy", "pillow"])
+    meta.update(photo_source=args.photo_source, repeat=args.repeat, subtitle_style=style,
+                encoder_threads=os.getenv("ADMISSION_ENCODER_THREADS"))
+    path = common.save_results("render", results, meta, args.output)
+    print(f"\n결과 저장: {path}")
+
+    if args.baseline:
+        return common.report_regressions(
+            common.compare(results, args.baseline, REGRESSION_METRICS, args.threshold), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# 벤치마크 공용 도우미 (결과 JSON 저장, 이전 결과와 비교)
+#
+# 결과 파일 형식:
+#   {"benchmark": "render", "meta": {...실행 환경...}, "results": {"<항목>": {"<지표>": 값, ...}, ...}}
+# --baseline으로 이전 결과를 주면 같은 항목의 지표를 비교해 threshold(비율)를 넘게 나빠진 항목을 표시합니다.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def use_repo_root():
+    """저장소 루트를 import 경로와 작업 디렉토리로 (temp/, resources/ 상대 경로 사용)"""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _package_version(name: str) -> Optional[str]:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def run_meta(packages: List[str] = ()) -> dict:
+    """결과를 비교할 때 확인할 실행 환경"""
+    import admission
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": admission.cpu_count(),
+        "memory_mb": admission.memory_mb(),
+        "packages": {name: _package_version(name) for name in packages},
+    }
+
+
+def reset_peak_rss() -> bool:
+    """이 프로세스의 최대 RSS 기록 초기화 (Linux만 가능, 측정 구간의 최대값만 보기 위해)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _vm_hwm_kb() -> Optional[int]:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> dict:
+    """이 프로세스와 (종료를 기다린) 자식 프로세스(ffmpeg 등)의 최대 RSS(MB)"""
+    # ru_maxrss는 exec 후에도 부모의 값이 이어지므로 Linux에서는 /proc의 VmHWM 사용
+    # (ru_maxrss 단위는 Linux KB, macOS 바이트)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    self_kb = _vm_hwm_kb()
+    self_peak = self_kb / 1024 if self_kb is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    return {
+        "peak_rss_mb": round(self_peak, 1),
+        "child_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def save_results(benchmark: str, results: Dict[str, dict], meta: dict, output: Optional[str] = None) -> str:
+    """결과 JSON 저장 (output이 없으면 benchmarks/results/<이름>_<시각>.json)"""
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{benchmark}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": benchmark, "meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def compare(results: Dict[str, dict], baseline_path: str, metrics: List[str], threshold: float) -> List[dict]:
+    """이전 결과보다 threshold 비율 넘게 커진(나빠진) 지표 목록 (지표는 모두 작을수록 좋은 값)"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, values in results.items():
+        for metric in metrics:
+            before, after = (baseline.get(name) or {}).get(metric), values.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if change > threshold:
+                regressions.append({"name": name, "metric": metric, "baseline": before, "current": after,
+                                    "change": round(change, 3)})
+    return regressions
+
+
+def print_table(results: Dict[str, dict], columns: List[str]):
+    name_width = max([len("항목")] + [len(name) for name in results]) + 2
+    widths = [max(len(column) + 2, 14) for column in columns]
+    print(f"{'항목':<{name_width}}" + "".join(f"{column:>{width}}" for column, width in zip(columns, widths)))
+    for name, values in results.items():
+        cells = []
+        for column, width in zip(columns, widths):
+            value = values.get(column)
+            cells.append(f"{value:>{width}.3f}" if isinstance(value, float) else f"{str(value):>{width}}")
+        print(f"{name:<{name_width}}" + "".join(cells))
+
+
+def report_regressions(regressions: List[dict], threshold: float) -> int:
+    """회귀 출력 후 종료 코드 반환 (있으면 1)"""
+    if not regressions:
+        print(f"기준 대비 {threshold * 100:.0f}% 넘게 나빠진 항목이 없습니다.")
+        return 0
+    print(f"⚠ 기준 대비 {threshold * 100:.0f}% 넘게 나빠진 항목:")
+    for item in regressions:
+        print(f"  {item['name']} {item['metric']}: {item['baseline']} → {item['current']} "
+              f"(+{item['change'] * 100:.0f}%)")
+    return 1
@@ -0,0 +1,459 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+# 여러 가족이 동시에 영상을 만드는 상황의 부하 테스트 (공급자 대역 서버 사용, 크레딧 소모 없음)
+#
+#   uv run python benchmarks/load_test.py --sessions 8 --orders-per-session 2 --workers 4
+#   uv run python benchmarks/load_test.py --mode queue --sessions 20 --time-scale 0.01
+#
+# 세션마다 사진 4장과 스크립트로 주문을 제출하고(--mode api: http_api.py에 multipart POST,
+# --mode queue: 작업 큐에 직접 등록) 완료될 때까지 상태를 폴링한 뒤 다음 주문을 넣습니다.
+# 작업자(worker.py)는 stub_server의 공급자 대역을 호출하고 실제로 렌더링합니다.
+# 실행 중에는 CPU 사용률, 메모리, 작업자 RSS, 렌더링 슬롯(admission), 대기 작업 수를 1초마다 기록하고,
+# 끝나면 시간당 주문 수, 지연 시간 분위수(전체/대기/처리/제출), 자원 포화 정도를 benchmarks/results/load_<시각>.json에 저장합니다.
+# 큐, 수락 제어, 레이트 리미터, 체크포인트 DB는 실행마다 temp/load_test/<시각>/ 아래에 따로 만들어 운영 데이터와 섞이지 않습니다.
+
+RUN_ROOT = "temp/load_test"
+PHOTO_COUNT = 4
+SESSION_LINES = [
+    "가족과 함께 바다에 갔던 날",
+    "당신이 처음 웃어 주던 그 봄날",
+    "아이들이 처음 걸음마를 떼던 날",
+    "우리 함께 걷던 동네 골목길",
+]
+REGRESSION_METRICS = ["p50_seconds", "p95_seconds", "seconds_per_order"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _order_lines(session: int, order: int) -> List[str]:
+    from main import FIXED_LINES
+
+    variable = iter(f"{SESSION_LINES[(session + order + index) % len(SESSION_LINES)]} ({session}-{order})"
+                    for index in range(4))
+    return [FIXED_LINES.get(number) or next(variable) for number in range(7)]
+
+
+def _multipart(fields: Dict[str, str], files: List[tuple]) -> tuple:
+    """(필드 이름, 파일 경로) 목록으로 multipart/form-data 본문 생성"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8"))
+    for name, path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        header = (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                  f'filename="{os.path.basename(path)}"\r\nContent-Type: application/octet-stream\r\n\r\n')
+        parts.append(header.encode("utf-8") + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class ApiClient:
+    """http_api.py로 제출/조회 (주문 시스템과 같은 경로)"""
+
+    def __init__(self, base_url: str, download: bool):
+        self.base_url = base_url
+        self.download = download
+
+    def _request(self, method: str, path: str, body: bytes = None, headers: dict = None, timeout: float = 60):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read()
+
+    def submit(self, key: str, lines: List[str], photos: List[str]) -> str:
+        body, content_type = _multipart({"script": "\n".join(lines)}, [("photos", path) for path in photos])
+        response = self._request("POST", "/jobs", body, {"Content-Type": content_type, "Idempotency-Key": key})
+        return json.loads(response)["id"]
+
+    def status(self, job_id: str) -> dict:
+        return json.loads(self._request("GET", f"/jobs/{job_id}"))
+
+    def fetch_video(self, job_id: str) -> int:
+        if not self.download:
+            return 0
+        return len(self._request("GET", f"/jobs/{job_id}/video", timeout=300))
+
+
+class QueueClient:
+    """작업 큐에 직접 제출 (HTTP 계층을 빼고 작업자 처리량만 볼 때)"""
+
+    def __init__(self):
+        from job_queue import get_job_queue
+
+        self.queue = get_job_queue()
+
+    def submit(self, key: str, lines: List[str], photos: List[str]) -> str:
+        from main import DEFAULT_THEME, initial_state
+
+        order = {"theme": DEFAULT_THEME, "lines": lines, "photos": photos, "audio": None}
+        return self.queue.enqueue(initial_state(order), f"load-{key}")
+
+    def status(self, job_id: str) -> dict:
+        job = self.queue.get(job_id)
+        return {"status": job.status, "created": job.created, "started": job.started, "finished": job.finished,
+                "error": job.error, "failed_stage": job.failed_stage}
+
+    def fetch_video(self, job_id: str) -> int:
+        return 0
+
+
+def run_session(client, session: int, orders: int, photos: List[str], start_delay: float, think_time: float,
+                poll_interval: float, deadline: float) -> List[dict]:
+    """한 가족의 세션: 주문 제출 → 완료까지 폴링 → (생각 시간) → 다음 주문"""
+    from job_queue import FAILED, SUCCEEDED
+
+    time.sleep(start_delay)
+    records = []
+    for order in range(orders):
+        record = {"session": session, "order": order}
+        submit_start = time.time()
+        try:
+            job_id = client.submit(f"{session}-{order}-{uuid.uuid4().hex[:8]}", _order_lines(session, order), photos)
+        except (OSError, urllib.error.URLError, ValueError) as e:
+            records.append({**record, "status": "submit_error", "error": str(e)})
+            continue
+        record.update(job_id=job_id, submit_seconds=time.time() - submit_start)
+
+        status = {"status": None}
+        while time.time() < deadline:
+            try:
+                status = client.status(job_id)
+            except (OSError, urllib.error.URLError, ValueError) as e:
+                status = {"status": None, "error": str(e)}
+            if status["status"] in (SUCCEEDED, FAILED):
+                break
+            time.sleep(poll_interval)
+        record["end_to_end_seconds"] = time.time() - submit_start
+        record["status"] = status["status"] if status["status"] in (SUCCEEDED, FAILED) else "timeout"
+        if status.get("started") and status.get("created"):
+            record["queue_wait_seconds"] = status["started"] - status["created"]
+        if status.get("finished") and status.get("started"):
+            record["processing_seconds"] = status["finished"] - status["started"]
+        if record["status"] == FAILED:
+            record["error"] = f"{status.get('failed_stage')}: {status.get('error')}"
+        elif record["status"] == SUCCEEDED:
+            record["video_bytes"] = client.fetch_video(job_id)
+        records.append(record)
+        print(f"[세션 {session}] 주문 {order + 1}/{orders} {record['status']} ({record['end_to_end_seconds']:.0f}초)")
+        if order < orders - 1:
+            time.sleep(think_time)
+    return records
+
+
+class ResourceSampler(threading.Thread):
+    """주기적으로 CPU, 메모리, 작업자 RSS, 렌더링 슬롯, 대기 작업 수 기록 (/proc을 읽으므로 Linux 전용 지표 포함)"""
+
+    def __init__(self, process_groups: List[int], interval: float = 1.0):
+        super().__init__(name="resource-sampler", daemon=True)
+        self.process_groups = set(process_groups)
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def _cpu_times() -> Optional[tuple]:
+        try:
+            with open("/proc/stat", "r") as f:
+                values = [int(value) for value in f.readline().split()[1:]]
+        except OSError:
+            return None
+        idle = values[3] + values[4]
+        return sum(values) - idle, sum(values)
+
+    @staticmethod
+    def _memory_used_mb() -> Optional[float]:
+        try:
+            with open("/proc/meminfo", "r") as f:
+                info = {line.split(":")[0]: int(line.split()[1]) for line in f}
+        except OSError:
+            return None
+        return (info["MemTotal"] - info.get("MemAvailable", info["MemFree"])) / 1024
+
+    def _group_rss_mb(self) -> Optional[float]:
+        """작업자/API 프로세스 그룹(자식 ffmpeg 포함)의 RSS 합"""
+        total_pages = 0
+        try:
+            pids = [name for name in os.listdir("/proc") if name.isdigit()]
+        except OSError:
+            return None
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/stat", "r") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            # fields[0]=state, [2]=pgrp, [21]=rss(페이지)
+            if int(fields[2]) in self.process_groups:
+                total_pages += int(fields[21])
+        return total_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+    def run(self):
+        import admission
+        from job_queue import QUEUED, RUNNING, get_job_queue
+
+        controller = admission.get_admission()
+        queue = get_job_queue()
+        previous = self._cpu_times()
+        while not self._stopped.wait(self.interval):
+            current = self._cpu_times()
+            sample = {"time": time.time(), "memory_used_mb": self._memory_used_mb(), "group_rss_mb": self._group_rss_mb()}
+            if previous and current and current[1] > previous[1]:
+                sample["cpu_percent"] = 100 * (current[0] - previous[0]) / (current[1] - previous[1])
+            previous = current
+            counts = queue.counts()
+            sample.update(queued=counts.get(QUEUED, 0), running=counts.get(RUNNING, 0))
+            if controller:
+                snapshot = controller.snapshot()
+                sample.update(active_encodes=snapshot["active_encodes"], active_decoders=snapshot["active_decoders"])
+            self.samples.append(sample)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def summary(self, capacity: dict) -> dict:
+        def values(key):
+            return [sample[key] for sample in self.samples if sample.get(key) is not None]
+
+        summary = {"samples": len(self.samples)}
+        for key in ("cpu_percent", "memory_used_mb", "group_rss_mb"):
+            if values(key):
+                summary[f"avg_{key}"] = round(sum(values(key)) / len(values(key)), 1)
+                summary[f"max_{key}"] = round(max(values(key)), 1)
+        for key in ("queued", "running", "active_encodes", "active_decoders"):
+            if values(key):
+                summary[f"max_{key}"] = max(values(key))
+        # 렌더링 슬롯이 모두 찬 시간 비율 (1에 가까우면 인코딩이 병목)
+        encodes = values("active_encodes")
+        if encodes and capacity.get("encode_slots"):
+            summary["encode_saturation"] = round(
+                sum(1 for value in encodes if value >= capacity["encode_slots"]) / len(encodes), 3)
+        return summary
+
+
+def _latency(records: List[dict], key: str) -> dict:
+    values = [record[key] for record in records if record.get(key) is not None]
+    if not values:
+        return {"count": 0}
+    return {"count": len(values),
+            "p50_seconds": round(common.percentile(values, 0.5), 2),
+            "p95_seconds": round(common.percentile(values, 0.95), 2),
+            "p99_seconds": round(common.percentile(values, 0.99), 2),
+            "max_seconds": round(max(values), 2)}
+
+
+def _start(command: List[str], log_path: str, env: dict) -> subprocess.Popen:
+    # 새 세션으로 시작해 종료할 때 작업자의 spawn 자식과 ffmpeg까지 함께 정리
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env, start_new_session=True)
+
+
+def _stop(process: subprocess.Popen, timeout: float = 15):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def _wait_ready(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except (OSError, urllib.error.URLError):
+            time.sleep(0.5)
+    raise RuntimeError(f"서버가 시작되지 않았습니다: {url}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    common.use_repo_root()
+    import admission
+
+    parser = argparse.ArgumentParser(description="다중 세션 부하 테스트")
+    parser.add_argument("--mode", choices=("api", "queue"), default="api",
+                        help="api: http_api.py로 제출, queue: 작업 큐에 직접 등록")
+    parser.add_argument("--sessions", type=int, default=4, help="동시에 주문하는 세션(가족) 수")
+    parser.add_argument("--orders-per-session", type=int, default=1, help="세션마다 차례로 넣을 주문 수")
+    parser.add_argument("--workers", type=int, default=admission.detect_capacity().worker_processes,
+                        help="작업자 프로세스 수 (기본값은 CPU/메모리로 계산)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="세션 시작을 이 시간(초)에 걸쳐 분산")
+    parser.add_argument("--think-time", type=float, default=0.0, help="세션 안에서 주문 사이 대기(초)")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="상태 폴링 주기(초)")
+    parser.add_argument("--timeout", type=float, default=3600, help="전체 제한 시간(초)")
+    parser.add_argument("--stub-profile", help="대역 서버 지연/실패 프로필 JSON")
+    parser.add_argument("--seed", type=int, default=0, help="대역 서버 난수 시드")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="대역 서버 지연 배율")
+    parser.add_argument("--download", action="store_true", help="완성된 영상을 API로 내려받기까지 측정 (api 모드)")
+    parser.add_argument("--keep-videos", action="store_true", help="완성된 영상을 지우지 않음")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: benchmarks/results/load_<시각>.json)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="회귀로 볼 증가 비율 (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    import stub_server
+    from bench_render import make_test_photo
+
+    run_dir = os.path.join(RUN_ROOT, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    photos = []
+    for index in range(PHOTO_COUNT):
+        path = os.path.join(RUN_ROOT, f"photo_{index + 1}.jpg")
+        if not os.path.exists(path):
+            make_test_photo(path, index + 1)
+        photos.append(path)
+
+    # 대역 서버는 이 프로세스의 스레드로 실행
+    routes = {}
+    if args.stub_profile:
+        with open(args.stub_profile, "r", encoding="utf-8") as f:
+            routes = json.load(f)
+    stub = stub_server.make_server("127.0.0.1", 0, stub_server.StubProfile(routes, args.seed, args.time_scale))
+    threading.Thread(target=stub.serve_forever, name="stub-server", daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    os.environ.update(stub_server.stub_env(stub_url))
+    os.environ.update({
+        "JOB_QUEUE_DB": os.path.join(run_dir, "jobs.sqlite3"),
+        "ADMISSION_DB": os.path.join(run_dir, "admission.sqlite3"),
+        "RATE_LIMIT_DB": os.path.join(run_dir, "ratelimit.sqlite3"),
+        "CIRCUIT_BREAKER_DB": os.path.join(run_dir, "circuit_breaker.sqlite3"),
+        "CHECKPOINT_DB": os.path.join(run_dir, "checkpoints.sqlite3"),
+        "TASK_LEDGER_DB": os.path.join(run_dir, "task_ledger.sqlite3"),
+        "TRACING_DB": os.path.join(run_dir, "metrics.sqlite3"),
+        "TRACE_DIR": os.path.join(run_dir, "traces"),
+        "PYTHONUNBUFFERED": "1",
+    })
+    os.environ.pop("HTTP_API_TOKEN", None)
+    os.environ.pop("ASSET_HOSTING", None)
+    env = dict(os.environ)
+
+    # 작업자가 load_dotenv()로 읽을 .env까지 합쳐, 실제 공급자에 요청할 수 있는 설정이 남아 있으면 중단
+    from dotenv import dotenv_values
+
+    leaks = stub_server.real_providers(stub_url, {**dotenv_values(".env"), **env})
+    if leaks:
+        stub.shutdown()
+        print(f"❌ 실제 공급자로 요청이 나갈 수 있어 부하 테스트를 중단합니다: {', '.join(leaks)}")
+        return 1
+
+    processes = [_start([sys.executable, "worker.py", "--workers", str(args.workers), "--poll-interval", "0.5"],
+                        os.path.join(run_dir, "worker.log"), env)]
+    if args.mode == "api":
+        port = _free_port()
+        processes.append(_start([sys.executable, "http_api.py", "--port", str(port), "--workers", "0"],
+                                os.path.join(run_dir, "api.log"), env))
+        base_url = f"http://127.0.0.1:{port}"
+        _wait_ready(base_url + "/healthz")
+        client = ApiClient(base_url, args.download)
+    else:
+        client = QueueClient()
+
+    capacity = admission.detect_capacity().to_dict()
+    print(f"부하 테스트 시작: 세션 {args.sessions}개 × 주문 {args.orders_per_session}개, 작업자 {args.workers}개, "
+          f"모드 {args.mode}, 대역 서버 {stub_url} (로그: {run_dir})")
+    sampler = ResourceSampler([process.pid for process in processes])
+    sampler.start()
+
+    start_time = time.time()
+    deadline = start_time + args.timeout
+    records = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            futures = [executor.submit(run_session, client, session, args.orders_per_session, photos,
+                                       args.ramp_up * session / max(1, args.sessions), args.think_time,
+                                       args.poll_interval, deadline)
+                       for session in range(args.sessions)]
+            for future in futures:
+                records.extend(future.result())
+    finally:
+        wall_seconds = time.time() - start_time
+        sampler.stop()
+        for process in processes:
+            _stop(process)
+        stub.shutdown()
+        stub.server_close()
+
+    if not args.keep_videos:
+        from job_queue import get_job_queue
+
+        queue = get_job_queue()
+        for record in records:
+            job = queue.get(record["job_id"]) if record.get("job_id") else None
+            video_path = (job.result or {}).get("final_video_path") if job else None
+            if video_path and os.path.exists(video_path):
+                os.remove(video_path)
+
+    from job_queue import FAILED, SUCCEEDED
+
+    succeeded = [record for record in records if record["status"] == SUCCEEDED]
+    errors = {}
+    for record in records:
+        if record.get("error"):
+            errors[record["error"]] = errors.get(record["error"], 0) + 1
+    results = {
+        "orders": {
+            "submitted": len(records),
+            "succeeded": len(succeeded),
+            "failed": sum(1 for record in records if record["status"] == FAILED),
+            "timed_out": sum(1 for record in records if record["status"] == "timeout"),
+            "submit_errors": sum(1 for record in records if record["status"] == "submit_error"),
+            "wall_seconds": round(wall_seconds, 1),
+            "orders_per_hour": round(len(succeeded) / wall_seconds * 3600, 1) if wall_seconds else 0,
+            "seconds_per_order": round(wall_seconds / len(succeeded), 2) if succeeded else None,
+        },
+        "end_to_end": _latency(succeeded, "end_to_end_seconds"),
+        "queue_wait": _latency(succeeded, "queue_wait_seconds"),
+        "processing": _latency(succeeded, "processing_seconds"),
+        "submit": _latency(records, "submit_seconds"),
+        "resources": sampler.summary(capacity),
+    }
+
+    print()
+    print(json.dumps(results["orders"], ensure_ascii=False))
+    common.print_table({key: results[key] for key in ("end_to_end", "queue_wait", "processing", "submit")},
+                       ["count", "p50_seconds", "p95_seconds", "p99_seconds", "max_seconds"])
+    print(json.dumps(results["resources"], ensure_ascii=False))
+    for error, count in errors.items():
+        print(f"  오류 {count}건: {error}")
+
+    meta = common.run_meta(["moviepy", "langgraph", "pillow"])
+    meta.update(mode=args.mode, sessions=args.sessions, orders_per_session=args.orders_per_session,
+                workers=args.workers, time_scale=args.time_scale, seed=args.seed, stub_profile=args.stub_profile,
+                capacity=capacity, errors=errors, run_dir=run_dir)
+    path = common.save_results("load", results, meta, args.output)
+    print(f"\n결과 저장: {path}")
+
+    if args.baseline:
+        return common.report_regressions(
+            common.compare(results, args.baseline, REGRESSION_METRICS, args.threshold), args.threshold)
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
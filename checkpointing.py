@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+# LangGraph 워크플로우 체크포인트 (노드가 끝날 때마다 상태 저장)
+#
+# langgraph-checkpoint-sqlite가 설치되어 있으면 temp/checkpoints.sqlite3에 저장하므로
+# 프로세스가 재시작되어도 이어서 실행할 수 있습니다. 없으면 MemorySaver를 사용합니다. (같은 프로세스 안에서만 유지)
+# 상태에는 클립 객체 대신 파일 경로 같은 직렬화 가능한 값만 둡니다.
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer():
+    """프로세스 공용 체크포인터"""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is not None:
+            return _checkpointer
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError:
+            from langgraph.checkpoint.memory import MemorySaver
+            print("langgraph-checkpoint-sqlite가 없어 메모리 체크포인트를 사용합니다. (재시작 후 이어하기 불가)")
+            _checkpointer = MemorySaver()
+            return _checkpointer
+
+        db_path = os.getenv("CHECKPOINT_DB", "temp/checkpoints.sqlite3")
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Streamlit 세션 스레드들이 함께 쓰므로 check_same_thread=False (SqliteSaver가 내부에서 잠금)
+        _checkpointer = SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+        return _checkpointer
+
+
+def thread_config(thread_id: str) -> dict:
+    """작업 하나(thread_id)의 체크포인트를 가리키는 실행 설정"""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def failed_stage(graph, config: dict) -> Optional[str]:
+    """마지막 실행이 실패한 단계 이름 (실패하지 않았으면 None)"""
+    snapshot = graph.get_state(config)
+    return (snapshot.values or {}).get("failed_stage")
+
+
+def prepare_resume(graph, config: dict, stages: List[str]) -> bool:
+    """
+    실패한 단계부터 다시 실행할 수 있도록 체크포인트 갱신
+
+    직전 단계가 방금 끝난 것처럼(as_node) 오류 표시를 지운 상태를 기록하면,
+    다음 graph.invoke(None, config)는 실패한 단계부터 실행됩니다.
+    첫 단계가 실패했거나 실패 기록이 없으면 False (처음부터 다시 실행해야 함)
+    """
+    stage = failed_stage(graph, config)
+    if stage not in stages or stages.index(stage) == 0:
+        return False
+    previous = stages[stages.index(stage) - 1]
+    graph.update_state(config, {"error_message": None, "failed_stage": None}, as_node=previous)
+    return True
@@ -0,0 +1,338 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 공급자별 서킷 브레이커와 할당량 상태 추적 (스레드, 프로세스 간 공유)
+#
+# HeyGen/Kling 등이 할당량 부족(402, insufficient_quota), 인증 오류, 5xx를 반복해서 반환하면
+# 해당 공급자+오류 종류의 브레이커가 열리고, 열려 있는 동안에는 모든 세션의 호출이
+# 네트워크 요청 없이 즉시 실패합니다. reset_timeout이 지나면 한 번의 시험 호출(half-open)을
+# 허용하고, 성공하면 닫히고 실패하면 더 긴 시간 동안 다시 열립니다.
+# 상태는 레이트 리미터처럼 로컬 SQLite 파일에 저장되므로 모든 작업자 프로세스가 같은 브레이커를 봅니다.
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 오류 종류별 (연속 실패 임계값, 최초 차단 시간(초))
+ERROR_CLASS_SETTINGS = {
+    "quota": (1, 600),
+    "auth": (2, 1800),
+    "server": (3, 60),
+}
+
+# 크레딧/결제 문구만 할당량 부족으로 봄 ("Quota exceeded for requests per minute" 같은 429는 레이트 리밋)
+_QUOTA_PATTERN = re.compile(
+    r"insufficient_quota|insufficient.(credit|balance|fund)|\b402\b|payment required|billing",
+    re.IGNORECASE,
+)
+_AUTH_PATTERN = re.compile(r"unauthori[sz]ed|forbidden|invalid.api.key|authentication", re.IGNORECASE)
+_SERVER_PATTERN = re.compile(r"server error|bad gateway|service unavailable|gateway time-?out", re.IGNORECASE)
+
+
+def classify_error(error) -> Optional[str]:
+    """예외 또는 오류 메시지를 브레이커 오류 종류(quota/auth/server)로 분류 (해당 없으면 None)"""
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if status_code == 402:
+        return "quota"
+    if status_code in (401, 403):
+        return "auth"
+    if isinstance(status_code, int) and status_code >= 500:
+        return "server"
+
+    message = str(error)
+    if _QUOTA_PATTERN.search(message):
+        return "quota"
+    if _AUTH_PATTERN.search(message):
+        return "auth"
+    if _SERVER_PATTERN.search(message):
+        return "server"
+    return None
+
+
+class CircuitOpenError(Exception):
+    """브레이커가 열려 있어 호출하지 않고 즉시 실패함"""
+
+    def __init__(self, provider: str, error_class: str, retry_in: float):
+        super().__init__(f"[{provider}] {error_class} 오류로 차단됨 ({retry_in:.0f}초 후 재시도)")
+        self.provider = provider
+        self.error_class = error_class
+        self.retry_in = retry_in
+
+
+PROBE_TTL = 30 * 60  # 시험 호출 중 프로세스가 비정상 종료해도 다음 시험 호출이 영구히 막히지 않도록
+
+
+class BreakerStore:
+    """브레이커 상태를 저장하는 SQLite 파일"""
+
+    def __init__(self, db_path: str = "temp/circuit_breaker.sqlite3"):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS breakers (provider TEXT, error_class TEXT, state TEXT, failures INTEGER, "
+                "opened_at REAL, reset_timeout REAL, probe_until REAL, last_error TEXT, "
+                "PRIMARY KEY (provider, error_class))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self, fn):
+        """쓰기 잠금 없이 현재 상태만 읽을 때"""
+        return fn(self._connect())
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return [tuple(row) for row in self._connect().execute("SELECT provider, error_class FROM breakers")]
+
+
+class CircuitBreaker:
+    """공급자 하나, 오류 종류 하나에 대한 브레이커 (store가 있으면 상태를 SQLite에서 읽고 씀)"""
+
+    def __init__(self, provider: str, error_class: str, failure_threshold: int, reset_timeout: float,
+                 max_reset_timeout: float = 3600, store: Optional[BreakerStore] = None):
+        self.provider = provider
+        self.error_class = error_class
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self.probe_until = 0.0  # 진행 중인 시험 호출의 만료 시각 (0이면 없음)
+        self._store = store
+        self._lock = threading.Lock()
+
+    def _load(self, conn):
+        row = conn.execute(
+            "SELECT state, failures, opened_at, reset_timeout, probe_until, last_error FROM breakers "
+            "WHERE provider = ? AND error_class = ?", (self.provider, self.error_class)
+        ).fetchone()
+        if row is None:
+            row = (CLOSED, 0, 0.0, self.base_reset_timeout, 0.0, None)
+        self.state, self.failures, self.opened_at, self.reset_timeout, self.probe_until, self.last_error = row
+
+    def _state(self) -> tuple:
+        return self.state, self.failures, self.opened_at, self.reset_timeout, self.probe_until, self.last_error
+
+    def _save(self, conn):
+        conn.execute(
+            "INSERT OR REPLACE INTO breakers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.provider, self.error_class, self.state, self.failures, self.opened_at, self.reset_timeout,
+             self.probe_until, self.last_error)
+        )
+
+    def _update(self, fn):
+        """저장된 상태를 읽어 fn으로 바꾼 뒤 저장 (다른 프로세스와 BEGIN IMMEDIATE로 직렬화)"""
+        with self._lock:
+            if self._store is None:
+                return fn()
+
+            def run(conn):
+                self._load(conn)
+                before = self._state()
+                result = fn()
+                if self._state() != before:
+                    self._save(conn)
+                return result
+
+            return self._store.transaction(run)
+
+    def _view(self, fn):
+        with self._lock:
+            if self._store is not None:
+                self._store.read(self._load)
+            return fn()
+
+    def _probe_in_flight(self) -> bool:
+        return self.probe_until > time.time()
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.time())
+
+    def allow_request(self) -> bool:
+        """호출 가능 여부 (열린 상태에서 시간이 지났으면 시험 호출 한 번 허용)"""
+        def allow():
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.retry_in() <= 0:
+                self.state = HALF_OPEN
+                self.probe_until = 0.0
+            if self.state == HALF_OPEN and not self._probe_in_flight():
+                self.probe_until = time.time() + PROBE_TTL
+                return True
+            return False
+
+        return self._update(allow)
+
+    def is_blocking(self) -> bool:
+        """라우팅 후보에서 제외해야 하는지 (시험 호출 가능 시점이면 False)"""
+        def blocking():
+            if self.state == OPEN:
+                return self.retry_in() > 0
+            return self.state == HALF_OPEN and self._probe_in_flight()
+
+        return self._view(blocking)
+
+    def is_probe_ready(self) -> bool:
+        """차단 시간이 지나 시험 호출을 기다리는 상태인지"""
+        def probe_ready():
+            if self.state == OPEN:
+                return self.retry_in() <= 0
+            return self.state == HALF_OPEN and not self._probe_in_flight()
+
+        return self._view(probe_ready)
+
+    def record_success(self):
+        def succeed():
+            self.state = CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self.probe_until = 0.0
+
+        self._update(succeed)
+
+    def record_failure(self, error):
+        def fail():
+            self.last_error = str(error)[:200]
+            if self.state == HALF_OPEN:
+                # 시험 호출 실패: 차단 시간을 늘려 다시 열기
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._open()
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open()
+
+        self._update(fail)
+
+    def release_probe(self):
+        """시험 호출이 이 오류 종류와 무관하게 끝난 경우 (다음 호출이 다시 시험할 수 있게)"""
+        def release():
+            self.probe_until = 0.0
+
+        self._update(release)
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.probe_until = 0.0
+        print(f"서킷 브레이커 열림: {self.provider}/{self.error_class} ({self.reset_timeout:.0f}초)")
+
+    def snapshot(self) -> dict:
+        def view():
+            return {
+                "provider": self.provider,
+                "error_class": self.error_class,
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": round(self.retry_in(), 1) if self.state == OPEN else 0.0,
+                "last_error": self.last_error,
+            }
+
+        return self._view(view)
+
+
+_store = None
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_store() -> BreakerStore:
+    """프로세스 공용 브레이커 상태 저장소"""
+    global _store
+    with _breakers_lock:
+        if _store is None:
+            _store = BreakerStore(os.getenv("CIRCUIT_BREAKER_DB", "temp/circuit_breaker.sqlite3"))
+        return _store
+
+
+def get_breaker(provider: str, error_class: str) -> CircuitBreaker:
+    """공급자+오류 종류의 브레이커 반환 (상태는 모든 프로세스가 공유)"""
+    key = (provider, error_class)
+    store = get_store()
+    with _breakers_lock:
+        if key not in _breakers:
+            threshold, timeout = ERROR_CLASS_SETTINGS[error_class]
+            _breakers[key] = CircuitBreaker(provider, error_class, threshold, timeout, store=store)
+        return _breakers[key]
+
+
+def _provider_breakers(provider: str) -> List[CircuitBreaker]:
+    return [get_breaker(provider, error_class) for error_class in ERROR_CLASS_SETTINGS]
+
+
+def is_open(provider: str) -> bool:
+    """공급자의 브레이커 중 하나라도 호출을 막고 있는지"""
+    return any(breaker.is_blocking() for breaker in _provider_breakers(provider))
+
+
+def is_probe_ready(provider: str) -> bool:
+    """시험 호출로 브레이커를 닫아 볼 수 있는 공급자인지"""
+    return any(breaker.is_probe_ready() for breaker in _provider_breakers(provider))
+
+
+def before_call(provider: str):
+    """호출 전 확인: 열린 브레이커가 있으면 CircuitOpenError 발생"""
+    granted = []
+    for breaker in _provider_breakers(provider):
+        if not breaker.allow_request():
+            for other in granted:
+                other.release_probe()
+            raise CircuitOpenError(provider, breaker.error_class, breaker.retry_in())
+        granted.append(breaker)
+
+
+def release(provider: str):
+    """취소 등으로 결과를 판단할 수 없는 호출이 끝났을 때 시험 호출 권한만 반환"""
+    for breaker in _provider_breakers(provider):
+        breaker.release_probe()
+
+
+def record_success(provider: str):
+    for breaker in _provider_breakers(provider):
+        breaker.record_success()
+
+
+def record_failure(provider: str, error) -> Optional[str]:
+    """실패를 분류해 해당 브레이커에 기록하고 오류 종류 반환"""
+    error_class = classify_error(error)
+    for breaker in _provider_breakers(provider):
+        if breaker.error_class == error_class:
+            breaker.record_failure(error)
+        else:
+            breaker.release_probe()
+    return error_class
+
+
+def snapshot() -> List[dict]:
+    """UI 및 메트릭 노출용 전체 브레이커 상태 (다른 프로세스가 기록한 브레이커 포함)"""
+    with _breakers_lock:
+        keys = set(_breakers)
+    keys.update(key for key in get_store().keys() if key[1] in ERROR_CLASS_SETTINGS)
+    return [get_breaker(provider, error_class).snapshot() for provider, error_class in sorted(keys)]
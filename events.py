@@ -0,0 +1,236 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+# 진행 이벤트 버스
+#
+# 에이전트와 공급자 어댑터는 st.write/st.progress를 직접 부르지 않고 emit()으로 이벤트만 남깁니다.
+# 이벤트는 현재 컨텍스트에 등록된 싱크(sink)로 전달되며, 싱크가 없으면 콘솔에 출력합니다.
+#   - 작업자: job_queue.JobEventSink (큐에 기록, UI가 주기적으로 읽어 표시)
+#   - CLI/로그: PrintSink, 지표: MetricsSink, 그 외: CallbackSink
+# 진행률(progress)과 공급자 폴링 상태(status)는 최신 값만 의미가 있으므로 ThrottledSink가
+# 일정 간격으로 합쳐서 전달합니다. 따라서 폴링 횟수가 늘어도 UI로 가는 메시지는 늘지 않습니다.
+
+STAGE = "stage"
+INFO = "info"
+SUCCESS = "success"
+WARNING = "warning"
+ERROR = "error"
+DEBUG = "debug"
+PROGRESS = "progress"
+STATUS = "status"
+
+# 최신 값 하나로 합쳐도 되는 이벤트 종류
+COALESCED_KINDS = (PROGRESS, STATUS)
+
+
+class ProgressEvent:
+    def __init__(self, kind: str, message: str = "", stage: Optional[str] = None, fraction: Optional[float] = None,
+                 data: Optional[dict] = None, timestamp: Optional[float] = None):
+        self.kind = kind
+        self.message = message
+        self.stage = stage
+        self.fraction = fraction
+        self.data = data
+        self.timestamp = timestamp or time.time()
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "ProgressEvent":
+        return cls(**values)
+
+
+class EventSink:
+    """이벤트를 받는 쪽의 공통 인터페이스"""
+
+    def handle(self, event: ProgressEvent):
+        raise NotImplementedError
+
+    def flush(self):
+        """보류 중인 이벤트 전달 (컨텍스트를 벗어날 때 호출)"""
+
+
+class PrintSink(EventSink):
+    """콘솔 출력 (CLI, 로그)"""
+
+    _PREFIX = {STAGE: "▶", SUCCESS: "✔", WARNING: "⚠", ERROR: "✖"}
+
+    def __init__(self, verbose: bool = False, prefix: str = ""):
+        self.verbose = verbose
+        self.prefix = prefix
+
+    def handle(self, event: ProgressEvent):
+        if event.kind == DEBUG and not self.verbose:
+            return
+        if event.kind == STAGE and (event.data or {}).get("phase") == "end":
+            return
+        stage = f"[{event.stage}] " if event.stage else ""
+        message = event.message
+        if event.kind == PROGRESS and event.fraction is not None:
+            message = f"{event.fraction * 100:.0f}% {message}"
+        print(f"{self.prefix}{stage}{self._PREFIX.get(event.kind, '-')} {message}")
+
+
+class CallbackSink(EventSink):
+    def __init__(self, callback: Callable[[ProgressEvent], None]):
+        self.callback = callback
+
+    def handle(self, event: ProgressEvent):
+        self.callback(event)
+
+
+class FanoutSink(EventSink):
+    """여러 싱크에 같은 이벤트 전달"""
+
+    def __init__(self, *sinks: EventSink):
+        self.sinks = list(sinks)
+
+    def handle(self, event: ProgressEvent):
+        for sink in self.sinks:
+            sink.handle(event)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+class ThrottledSink(EventSink):
+    """progress/status 이벤트를 interval마다 최신 값 하나로 합쳐 전달 (그 외 이벤트는 즉시 전달)"""
+
+    def __init__(self, sink: EventSink, interval: float = 1.0):
+        self.sink = sink
+        self.interval = interval
+        self._pending = {}
+        self._last_sent = {}
+        self._lock = threading.Lock()
+
+    def handle(self, event: ProgressEvent):
+        with self._lock:
+            if event.kind in COALESCED_KINDS:
+                if time.time() - self._last_sent.get(event.kind, 0.0) < self.interval:
+                    self._pending[event.kind] = event
+                    return
+                self._pending.pop(event.kind, None)
+                self._last_sent[event.kind] = time.time()
+                ready = [event]
+            else:
+                # 순서를 지키기 위해 보류 중인 진행 상태를 먼저 전달
+                ready = self._take_pending() + [event]
+        for pending in ready:
+            self.sink.handle(pending)
+
+    def _take_pending(self) -> List[ProgressEvent]:
+        pending = sorted(self._pending.values(), key=lambda event: event.timestamp)
+        self._pending.clear()
+        now = time.time()
+        for event in pending:
+            self._last_sent[event.kind] = now
+        return pending
+
+    def flush(self):
+        with self._lock:
+            ready = self._take_pending()
+        for pending in ready:
+            self.sink.handle(pending)
+        self.sink.flush()
+
+
+class MetricsSink(EventSink):
+    """종류별 이벤트 수와 단계별 소요 시간 집계"""
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._stage_seconds = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def handle(self, event: ProgressEvent):
+        with self._lock:
+            self._counts[(event.stage, event.kind)] += 1
+            data = event.data or {}
+            if event.kind == STAGE and data.get("phase") == "end":
+                self._stage_seconds[event.stage].append(data.get("elapsed", 0.0))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "events": [{"stage": stage, "kind": kind, "count": count}
+                           for (stage, kind), count in sorted(self._counts.items(), key=str)],
+                "stage_seconds": {stage: list(values) for stage, values in self._stage_seconds.items()},
+            }
+
+
+_default_sink = PrintSink()
+_current_sink = contextvars.ContextVar("event_sink", default=None)
+_current_stage = contextvars.ContextVar("event_stage", default=None)
+
+
+@contextmanager
+def use_sink(sink: EventSink):
+    """이 구간(같은 컨텍스트를 복사한 스레드 포함)의 이벤트를 sink로 전달"""
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+        sink.flush()
+
+
+@contextmanager
+def stage(name: str):
+    """단계 시작/종료 이벤트를 남기고, 구간 안의 이벤트에 단계 이름을 붙임"""
+    token = _current_stage.set(name)
+    start_time = time.time()
+    emit(STAGE, name, phase="start")
+    outcome = {"ok": True}
+    try:
+        yield outcome
+    except Exception:
+        outcome["ok"] = False
+        raise
+    finally:
+        emit(STAGE, name, phase="end", ok=outcome["ok"], elapsed=round(time.time() - start_time, 3))
+        _current_stage.reset(token)
+
+
+def emit(kind: str, message: str = "", fraction: Optional[float] = None, **data):
+    event = ProgressEvent(kind, message, _current_stage.get(), fraction, data or None)
+    sink = _current_sink.get() or _default_sink
+    try:
+        sink.handle(event)
+    except Exception as e:
+        # 표시 실패가 작업을 멈추지 않도록
+        print(f"진행 이벤트 전달 실패: {e}")
+
+
+def info(message: str, **data):
+    emit(INFO, message, **data)
+
+
+def success(message: str, **data):
+    emit(SUCCESS, message, **data)
+
+
+def warning(message: str, **data):
+    emit(WARNING, message, **data)
+
+
+def error(message: str, **data):
+    emit(ERROR, message, **data)
+
+
+def debug(message: str, **data):
+    emit(DEBUG, message, **data)
+
+
+def status(message: str):
+    """공급자 폴링 상태처럼 최신 값만 의미 있는 메시지 (on_status 콜백으로 사용)"""
+    emit(STATUS, message)
+
+
+def progress(fraction: float, message: str = "", **data):
+    emit(PROGRESS, message, fraction=max(0.0, min(1.0, fraction)), **data)
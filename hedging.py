@@ -0,0 +1,213 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+from providers import ProviderError, ProviderRouter, StatusCallback, is_fatal
+
+# 비디오 생성 꼬리 지연시간을 줄이기 위한 헤징(hedged request) 정책
+#
+# 1순위 공급자의 작업이 평소 완료 시간의 특정 백분위(기본 p90)를 넘겨도 끝나지 않으면
+# 같은 작업을 다른 공급자에 한 번 더 제출하고, 먼저 끝난 결과를 사용합니다.
+# 늦게 끝난 쪽은 cancel_event로 폴링을 중단하며, 중단할 수 없는 공급자의 결과 파일은 삭제합니다.
+#
+# HEDGE_MAX_COST는 작업 하나에 대해 1순위, 헤지 요청, 실패 후 폴백을 모두 합친 예상 비용 상한입니다.
+# 기본값 2.5는 KlingAI(1.0) + Poe KlingAI(1.0) 헤지는 허용하고, Veo(3.2)로의 헤지는 막습니다.
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+_warned_routers = set()
+_warned_lock = threading.Lock()
+
+
+class HedgePolicy:
+    """헤징 설정 (기본 비활성화)"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 0.9, min_delay: float = 60.0,
+                 max_cost_per_job: float = 2.5):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_cost_per_job = max_cost_per_job
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        """
+        HEDGE_ENABLED=1            헤징 사용
+        HEDGE_PERCENTILE=0.9       1순위 공급자의 완료 시간 백분위
+        HEDGE_MIN_DELAY=60         헤지 요청 전 최소 대기 시간(초)
+        HEDGE_MAX_COST=2.5         작업 하나에 쓸 수 있는 최대 예상 비용(USD), 1순위 + 헤지 + 폴백 합계
+        """
+        return cls(
+            enabled=os.getenv("HEDGE_ENABLED", "").lower() in ("1", "true", "yes"),
+            percentile=float(os.getenv("HEDGE_PERCENTILE", "0.9")),
+            min_delay=float(os.getenv("HEDGE_MIN_DELAY", "60")),
+            max_cost_per_job=float(os.getenv("HEDGE_MAX_COST", "2.5")),
+        )
+
+    def hedge_delay(self, router: ProviderRouter, provider) -> float:
+        """1순위 공급자가 이 시간 안에 끝나지 않으면 헤지 요청을 보냄"""
+        stats = router.stats[provider.name]
+        if stats.samples >= router.min_samples:
+            delay = stats.percentile(self.percentile)
+        else:
+            delay = provider.expected_latency
+        return max(self.min_delay, delay)
+
+    def can_hedge(self, router: ProviderRouter) -> bool:
+        """현재 1순위 공급자에 비용 상한 안에서 헤지할 수 있는 2순위 공급자가 있는지"""
+        ranked = router.ranked()
+        if len(ranked) < 2:
+            return False
+        primary = ranked[0]
+        return any(primary.cost_per_job + provider.cost_per_job <= self.max_cost_per_job
+                   for provider in ranked[1:])
+
+    def check(self, router: ProviderRouter):
+        """헤징을 켰는데 설정상 헤지 요청이 한 번도 나갈 수 없으면 라우터마다 한 번 경고"""
+        if not self.enabled or self.can_hedge(router):
+            return
+        with _warned_lock:
+            if id(router) in _warned_routers:
+                return
+            _warned_routers.add(id(router))
+        names = ", ".join(f"{p.name}(${p.cost_per_job:.2f})" for p in router.ranked())
+        print(f"⚠️ HEDGE_ENABLED가 켜져 있지만 헤지 요청을 보낼 수 없습니다: "
+              f"공급자 {names or '없음'}, HEDGE_MAX_COST=${self.max_cost_per_job:.2f}")
+
+
+def _discard_result(future):
+    """늦게 끝난 작업의 결과 파일 정리"""
+    try:
+        path = future.result()
+    except Exception:
+        return
+    if isinstance(path, str) and os.path.exists(path):
+        os.remove(path)
+
+
+def hedged_run(router: ProviderRouter, policy: HedgePolicy, method: str, *args,
+               on_status: StatusCallback = None, **kwargs):
+    """
+    router.run과 같은 결과를 반환하되, 1순위 공급자가 느리면 2순위 공급자로 헤지 요청
+
+    공급자 스레드에서 발생한 상태 메시지는 큐에 모았다가 호출한 스레드에서 on_status로 전달합니다.
+    (Streamlit처럼 스크립트 스레드에서만 UI를 갱신할 수 있는 환경을 위해)
+    """
+    ranked = router.ranked()
+    if not ranked:
+        raise ProviderError("router", "사용 가능한 공급자가 없습니다.")
+
+    messages = queue.Queue()
+    cancel_events = {}
+    futures = {}
+    spent = 0.0
+
+    def notify(message: str):
+        if on_status:
+            on_status(message)
+        else:
+            print(message)
+
+    def drain():
+        while True:
+            try:
+                notify(messages.get_nowait())
+            except queue.Empty:
+                return
+
+    def fallback(exclude):
+        """남은 공급자로 일반 폴백 (이미 쓴 비용까지 합쳐 HEDGE_MAX_COST를 넘는 공급자는 시도하지 않음)"""
+        return router.run(method, *args, on_status=on_status, exclude=exclude,
+                          budget=policy.max_cost_per_job - spent, **kwargs)
+
+    def launch(provider):
+        nonlocal spent
+        spent += provider.cost_per_job
+        cancel_event = threading.Event()
+        cancel_events[provider.name] = cancel_event
+        # 작업 원장의 job_id 등 호출 측 컨텍스트를 공급자 스레드에서도 유지
+        future = _executor.submit(
+            contextvars.copy_context().run, router.call, provider, method, *args,
+            on_status=lambda message, name=provider.name: messages.put(f"[{name}] {message}"),
+            cancel_event=cancel_event, **kwargs
+        )
+        futures[future] = provider
+        notify(f"공급자 선택: {provider.name} (예상 {router.expected_time(provider):.0f}초)")
+        return future
+
+    primary = ranked[0]
+    launch(primary)
+    hedge_at = time.time() + policy.hedge_delay(router, primary)
+    hedged = False
+    errors = []
+    fatal_error = None
+
+    while futures:
+        timeout = 1.0 if hedged else max(0.0, min(1.0, hedge_at - time.time()))
+        done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+        drain()
+
+        for future in done:
+            provider = futures.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+                notify(f"{provider.name} 실패: {e}")
+                if is_fatal(e):
+                    # 콘텐츠 정책 등 다른 공급자도 같은 결과일 실패는 새 요청을 보내지 않음
+                    fatal_error = fatal_error or e
+                continue
+
+            # 먼저 끝난 결과 사용, 나머지는 중단하고 결과를 버림
+            for other_future, other in futures.items():
+                cancel_events[other.name].set()
+                other_future.add_done_callback(_discard_result)
+                notify(f"{provider.name}이(가) 먼저 완료되어 {other.name} 작업을 중단합니다.")
+            return result
+
+        # 1순위가 평소보다 느리거나 실패한 경우 다음 공급자 투입
+        if fatal_error is not None:
+            if not futures:
+                raise fatal_error
+            continue
+        if not hedged and (time.time() >= hedge_at or not futures):
+            hedged = True
+            tried = set(cancel_events)
+            candidates = router.ranked(exclude=tried)
+            if not candidates:
+                continue
+            # 비용 상한 안에 들어오는 가장 빠른 공급자로 헤지 (비싼 공급자 하나 때문에 헤징을 포기하지 않도록)
+            affordable = [p for p in candidates if spent + p.cost_per_job <= policy.max_cost_per_job]
+            secondary = affordable[0] if affordable else candidates[0]
+            if not affordable:
+                notify(f"헤지 요청 생략: 예상 비용 ${spent + secondary.cost_per_job:.2f}가 상한 ${policy.max_cost_per_job:.2f}을 넘습니다.")
+                if not futures:
+                    # 1순위가 이미 실패했다면 비용 상한 안에서 일반 폴백 (상한 안에 공급자가 없으면 ProviderError)
+                    return fallback(tried)
+                continue
+            if futures:
+                notify(f"{primary.name} 작업이 p{int(policy.percentile * 100)} 시간을 넘겨 {secondary.name}에 헤지 요청을 보냅니다.")
+            launch(secondary)
+
+    # 헤지한 두 공급자가 모두 실패하면 남은 공급자로 일반 폴백
+    drain()
+    if fatal_error is not None:
+        raise fatal_error
+    try:
+        return fallback(set(cancel_events))
+    except ProviderError as e:
+        raise ProviderError("hedge", "; ".join(errors + [str(e)]))
+
+
+def run_video(router: ProviderRouter, *args, policy: Optional[HedgePolicy] = None,
+              on_status: StatusCallback = None, **kwargs):
+    """헤징 설정에 따라 generate_video를 헤지 실행 또는 일반 라우팅으로 실행"""
+    policy = policy or HedgePolicy.from_env()
+    if policy.enabled:
+        policy.check(router)
+        return hedged_run(router, policy, "generate_video", *args, on_status=on_status, **kwargs)
+    return router.run("generate_video", *args, on_status=on_status, **kwargs)
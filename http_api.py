@@ -0,0 +1,361 @@
+import argparse
+import atexit
+import hmac
+import io
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from email import policy
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+from PIL import Image
+
+import admission
+import tracing
+from job_queue import FAILED, QUEUED, SUCCEEDED, get_job_queue
+from main import initial_state, normalize_lines, validate_order
+
+# 영상 제작 HTTP API (주문 시스템 연동용, Streamlit 없이 작업 큐에 직접 제출)
+#
+#   uv run python http_api.py --host 0.0.0.0 --port 8600 --workers 2
+#
+#   POST /jobs                  multipart/form-data: theme, script(또는 line1~line7), photos(여러 개), audio
+#                               → 202 {"id": ..., "status": "queued", ...}
+#   GET  /jobs/<id>             상태, 진행 단계, 진행률, 대기 순번/예상 시작 시간
+#   GET  /jobs/<id>/events      진행 이벤트 (?after=<seq> 이후만)
+#   GET  /jobs/<id>/video       완성된 영상 다운로드
+#   POST /jobs/<id>/resume      실패한 작업을 실패한 단계부터 다시 실행
+#   GET  /jobs/<id>/trace      단계/공급자/인코딩 구간별 소요 시간 (TRACING_ENABLED=1일 때)
+#   GET  /metrics               구간 소요 시간 히스토그램 (Prometheus 텍스트 형식)
+#   GET  /healthz               로드 밸런서 상태 확인 (대기/실행 작업 수, 작업자 수, 렌더링 슬롯)
+#
+# UI와 같은 작업 큐(job_queue)에 넣고 worker.py 작업자가 같은 워크플로우를 실행하므로,
+# 이 서버는 입력 저장과 상태 조회만 합니다. Idempotency-Key 헤더를 주면 같은 키로 다시 제출해도
+# 작업이 하나만 만들어지고, HTTP_API_TOKEN을 설정하면 Authorization: Bearer <토큰>이 필요합니다.
+
+MAX_UPLOAD_MB = int(os.getenv("HTTP_API_MAX_UPLOAD_MB", "200"))
+VIDEO_CHUNK_SIZE = 1024 * 1024
+
+_JOB_PATH = re.compile(r"^/jobs/([A-Za-z0-9_.-]+)(?:/(events|video|resume|trace))?$")
+
+
+class APIError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_multipart(content_type: str, body: bytes) -> List[dict]:
+    """multipart/form-data 본문을 [{"name", "filename", "data"}] 목록으로 (cgi 모듈 대신 email 파서 사용)"""
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\nMIME-Version: 1.0\r\n\r\n".encode("latin-1") + body
+    )
+    if not message.is_multipart():
+        raise APIError(HTTPStatus.BAD_REQUEST, "multipart/form-data 본문이 아닙니다.")
+    return [{
+        "name": part.get_param("name", header="content-disposition"),
+        "filename": part.get_filename(),
+        "data": part.get_payload(decode=True) or b"",
+    } for part in message.iter_parts()]
+
+
+def _save_image(data: bytes) -> str:
+    # UI와 같이 PNG로 다시 저장해 이미지 형식을 통일
+    try:
+        image = Image.open(io.BytesIO(data))
+        file_path = f"temp/{uuid.uuid4()}.png"
+        image.save(file_path)
+    except Exception as e:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"이미지를 읽을 수 없습니다: {e}")
+    return file_path
+
+
+def build_job_input(fields: List[dict]) -> dict:
+    """폼 필드로 워크플로우 초기 상태 만들기 (업로드 파일은 작업자가 읽을 수 있도록 temp/에 저장)"""
+    values = {field["name"]: field["data"].decode("utf-8").strip()
+              for field in fields if not field["filename"] and field["name"]}
+    if values.get("script"):
+        lines = values["script"].splitlines()
+    else:
+        lines = [values.get(f"line{number}", "") for number in range(1, 8)]
+
+    order = {
+        "theme": values.get("theme") or "따뜻한 추억 (Warm Memories)",
+        "lines": normalize_lines(lines),
+        "photos": [],
+        "audio": None,
+    }
+    errors = validate_order(order)
+    if errors:
+        raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, " ".join(errors))
+
+    os.makedirs("temp", exist_ok=True)
+    for field in fields:
+        if not field["filename"] or not field["data"]:
+            continue
+        if field["name"] == "photos":
+            order["photos"].append(_save_image(field["data"]))
+        elif field["name"] == "audio":
+            order["audio"] = f"temp/{uuid.uuid4()}.mp3"
+            with open(order["audio"], "wb") as f:
+                f.write(field["data"])
+    return initial_state(order)
+
+
+def _remove_inputs(job_input: dict):
+    """작업으로 만들지 못한 입력의 업로드 파일 삭제"""
+    for path in job_input["image_paths"] + [job_input["audio_path"]]:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def job_status(job) -> dict:
+    """API 응답용 작업 상태 (입력/결과 상태 전체 대신 진행 상황만)"""
+    queue = get_job_queue()
+    status = {
+        "id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "attempts": job.attempts,
+        "created": job.created,
+        "started": job.started,
+        "finished": job.finished,
+        "progress": job.progress,
+        "status_message": job.status_message,
+        "node": socket.gethostname(),
+    }
+    if job.status == QUEUED:
+        status["position"] = queue.position(job.id)
+        status["estimated_start_seconds"] = round(queue.estimate_start(job.id, workers=len(queue.workers()) or 1))
+    if job.status == FAILED:
+        status.update(error=job.error, failed_stage=job.failed_stage, resume_url=f"/jobs/{job.id}/resume")
+    if job.status == SUCCEEDED:
+        status["video_url"] = f"/jobs/{job.id}/video"
+    return status
+
+
+class JobAPIHandler(BaseHTTPRequestHandler):
+    server_version = "nowagift-jobs/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: HTTPStatus, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Render-Node", socket.gethostname())
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorize(self):
+        token = os.getenv("HTTP_API_TOKEN")
+        if not token:
+            return
+        if not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise APIError(HTTPStatus.UNAUTHORIZED, "인증 토큰이 올바르지 않습니다.")
+
+    def _get_job(self, job_id: str):
+        job = get_job_queue().get(job_id)
+        if job is None:
+            raise APIError(HTTPStatus.NOT_FOUND, f"작업을 찾을 수 없습니다: {job_id}")
+        return job
+
+    def _dispatch(self, method: str):
+        try:
+            url = urlparse(self.path)
+            if url.path == "/healthz" and method == "GET":
+                return self._health()
+            if url.path == "/metrics" and method == "GET":
+                return self._metrics()
+            self._authorize()
+            if url.path == "/jobs" and method == "POST":
+                return self._submit()
+            match = _JOB_PATH.match(url.path)
+            if not match:
+                raise APIError(HTTPStatus.NOT_FOUND, "알 수 없는 경로입니다.")
+            job_id, action = match.groups()
+            handler = {
+                ("GET", None): self._status,
+                ("GET", "events"): self._events,
+                ("GET", "video"): self._video,
+                ("GET", "trace"): self._trace,
+                ("POST", "resume"): self._resume,
+            }.get((method, action))
+            if handler is None:
+                raise APIError(HTTPStatus.METHOD_NOT_ALLOWED, "지원하지 않는 요청입니다.")
+            return handler(job_id, parse_qs(url.query))
+        except APIError as e:
+            # 읽지 않은 요청 본문이 남아 있을 수 있으므로 연결을 닫음
+            self.close_connection = True
+            self._send_json(e.status, {"error": e.message})
+        except Exception as e:
+            print(f"API 요청 처리 중 오류 발생: {e}")
+            # 본문을 어디까지 읽었는지 알 수 없으므로 남은 바이트가 다음 요청으로 해석되지 않게 연결을 닫음
+            self.close_connection = True
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"요청 처리 중 오류 발생: {e}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _health(self):
+        queue = get_job_queue()
+        controller = admission.get_admission()
+        self._send_json(HTTPStatus.OK, {
+            "ok": True,
+            "node": socket.gethostname(),
+            "jobs": queue.counts(),
+            "workers": len(queue.workers()),
+            "admission": controller.snapshot() if controller else None,
+        })
+
+    def _metrics(self):
+        body = tracing.prometheus_text().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _discard_body(self):
+        """읽지 않은 요청 본문을 버림 (keep-alive 연결에서 남은 바이트가 다음 요청으로 해석되지 않도록)"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_UPLOAD_MB * 1024 * 1024 or self.headers.get("Transfer-Encoding"):
+            # 너무 크거나 길이를 알 수 없는 본문은 읽지 않고 응답 후 연결을 닫음
+            self.close_connection = True
+            return
+        while length > 0:
+            chunk = self.rfile.read(min(length, VIDEO_CHUNK_SIZE))
+            if not chunk:
+                self.close_connection = True
+                return
+            length -= len(chunk)
+
+    def _submit(self):
+        queue = get_job_queue()
+        # 주문 시스템이 재시도해도 같은 주문으로 작업이 두 번 만들어지지 않도록
+        idempotency_key = self.headers.get("Idempotency-Key")
+        job_id = None
+        if idempotency_key:
+            job_id = "order-" + re.sub(r"[^A-Za-z0-9_.-]", "_", idempotency_key)[:100]
+            existing = queue.get(job_id)
+            if existing is not None:
+                self._discard_body()
+                return self._send_json(HTTPStatus.OK, job_status(existing))
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            raise APIError(HTTPStatus.LENGTH_REQUIRED, "요청 본문이 없습니다.")
+        if length > MAX_UPLOAD_MB * 1024 * 1024:
+            raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"업로드는 {MAX_UPLOAD_MB}MB까지 가능합니다.")
+        content_type = self.headers.get("Content-Type", "")
+        if not content_type.startswith("multipart/form-data"):
+            raise APIError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "multipart/form-data로 제출해주세요.")
+
+        job_input = build_job_input(parse_multipart(content_type, self.rfile.read(length)))
+        try:
+            job_id = queue.enqueue(job_input, job_id)
+        except sqlite3.IntegrityError:
+            # 같은 Idempotency-Key로 동시에 들어온 다른 요청이 먼저 작업을 만든 경우
+            _remove_inputs(job_input)
+            existing = queue.get(job_id) if job_id else None
+            if existing is None:
+                raise
+            return self._send_json(HTTPStatus.OK, job_status(existing))
+        except Exception:
+            _remove_inputs(job_input)
+            raise
+        print(f"작업 접수: {job_id} (사진 {len(job_input['image_paths'])}장)")
+        self._send_json(HTTPStatus.ACCEPTED, job_status(queue.get(job_id)))
+
+    def _status(self, job_id: str, query: dict):
+        self._send_json(HTTPStatus.OK, job_status(self._get_job(job_id)))
+
+    def _events(self, job_id: str, query: dict):
+        self._get_job(job_id)
+        try:
+            after = int(query.get("after", ["0"])[0])
+        except ValueError:
+            raise APIError(HTTPStatus.BAD_REQUEST, "after는 정수여야 합니다.")
+        self._send_json(HTTPStatus.OK, {"id": job_id, "events": get_job_queue().job_events(job_id, after)})
+
+    def _trace(self, job_id: str, query: dict):
+        self._get_job(job_id)
+        self._send_json(HTTPStatus.OK, {"id": job_id, "traces": tracing.load_traces(job_id)})
+
+    def _video(self, job_id: str, query: dict):
+        job = self._get_job(job_id)
+        video_path = (job.result or {}).get("final_video_path")
+        if job.status != SUCCEEDED or not (video_path and os.path.exists(video_path)):
+            raise APIError(HTTPStatus.CONFLICT, f"완성된 영상이 없습니다. (상태: {job.status})")
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(video_path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{job_id}.mp4"')
+        self.end_headers()
+        with open(video_path, "rb") as f:
+            while chunk := f.read(VIDEO_CHUNK_SIZE):
+                self.wfile.write(chunk)
+
+    def _resume(self, job_id: str, query: dict):
+        job = self._get_job(job_id)
+        if not get_job_queue().resume(job_id):
+            raise APIError(HTTPStatus.CONFLICT, f"실패한 작업만 다시 실행할 수 있습니다. (상태: {job.status})")
+        self._send_json(HTTPStatus.ACCEPTED, job_status(get_job_queue().get(job_id)))
+
+    def log_message(self, format, *args):
+        print(f"[{time.strftime('%H:%M:%S')}] {self.address_string()} {format % args}")
+
+
+def start_workers(count: int) -> Optional[subprocess.Popen]:
+    """count개의 작업자를 API 서버와 함께 시작 (별도로 worker.py를 실행하면 0)"""
+    if count <= 0:
+        return None
+    process = subprocess.Popen([sys.executable, "worker.py", "--workers", str(count)])
+    atexit.register(process.terminate)
+    return process
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="영상 제작 HTTP API")
+    parser.add_argument("--host", default="127.0.0.1", help="바인딩 주소")
+    parser.add_argument("--port", type=int, default=8600, help="포트")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("EMBEDDED_WORKERS", "1")),
+                        help="함께 시작할 작업자 수 (0이면 worker.py를 따로 실행)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("OPENROUTER_API_KEY"):
+        print("❌ OPENROUTER_API_KEY가 .env 파일에 설정되지 않았습니다.")
+        return 1
+
+    get_job_queue()
+    start_workers(args.workers)
+    server = ThreadingHTTPServer((args.host, args.port), JobAPIHandler)
+    print(f"작업 API 시작: http://{args.host}:{args.port} (작업자 {args.workers}개)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+import io
+
+from PIL import Image
+
+import tracing
+
+# 업로드 및 API 전송용 이미지 압축 유틸리티
+# (Streamlit에 의존하지 않으므로 에이전트, 공급자 어댑터, 벤치마크에서 공용으로 사용)
+
+# 이미지 압축 함수
+def compress_image(image_file, max_size_mb=5, quality=85):
+    """이미지를 압축하여 파일 크기를 줄입니다."""
+    with tracing.span("image.compress", kind="upload"):
+        return _compress_image(image_file, max_size_mb, quality)
+
+def _compress_image(image_file, max_size_mb, quality):
+    try:
+        # 파일 크기 확인
+        file_size_mb = len(image_file.getvalue()) / (1024 * 1024)
+
+        if file_size_mb <= max_size_mb:
+            return image_file  # 이미 작으면 그대로 반환
+
+        # PIL Image로 열기
+        img = Image.open(image_file)
+
+        # RGB로 변환 (JPEG 저장을 위해)
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+
+        # 크기 조정 (긴 변을 1920px로 제한)
+        width, height = img.size
+        if width > 1920 or height > 1920:
+            if width > height:
+                new_width = 1920
+                new_height = int(height * (1920 / width))
+            else:
+                new_height = 1920
+                new_width = int(width * (1920 / height))
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+        # 압축된 이미지를 BytesIO에 저장
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+        output.seek(0)
+
+        return output
+
+    except Exception as e:
+        print(f"이미지 압축 중 오류 발생: {e}")
+        return image_file
+
+# API용 이미지 압축 함수 (더 작은 크기로)
+def compress_image_for_api(image_path, max_width=1024, quality=70):
+    """API 전송을 위해 이미지를 더 크게 압축합니다."""
+    with tracing.span("image.compress", kind="api", max_width=max_width):
+        return _compress_image_for_api(image_path, max_width, quality)
+
+def _compress_image_for_api(image_path, max_width, quality):
+    try:
+        with Image.open(image_path) as img:
+            # RGB로 변환
+            if img.mode in ('RGBA', 'P'):
+                img = img.convert('RGB')
+
+            # 크기 조정 (긴 변을 1024px로 제한)
+            width, height = img.size
+            if width > max_width or height > max_width:
+                if width > height:
+                    new_width = max_width
+                    new_height = int(height * (max_width / width))
+                else:
+                    new_height = max_width
+                    new_width = int(width * (max_width / height))
+                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+            # 메모리에 저장
+            output = io.BytesIO()
+            img.save(output, format='JPEG', quality=quality, optimize=True)
+            return output.getvalue()
+
+    except Exception as e:
+        print(f"API용 이미지 압축 중 오류 발생: {e}")
+        # 실패시 원본 파일 읽기
+        with open(image_path, "rb") as f:
+            return f.read()
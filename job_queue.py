@@ -0,0 +1,324 @@
+import heapq
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import events
+
+# 영상 제작 작업 큐 (SQLite)
+#
+# Streamlit UI는 작업을 넣고(enqueue) 상태만 조회하며, 실제 워크플로우는 worker.py의 작업자 프로세스가
+# 큐에서 작업을 하나씩 가져가(claim) 실행합니다. 브라우저를 닫거나 새로 고쳐도 작업은 계속되고,
+# 작업자 수는 UI와 별개로 늘릴 수 있습니다.
+# 작업자는 실행 중인 작업의 heartbeat를 주기적으로 갱신하며, 갱신이 끊긴 작업(작업자 비정상 종료)은
+# 다른 작업자가 체크포인트에서 이어서 실행하도록 다시 대기열에 넣습니다.
+# 작업 중 발생한 진행 이벤트는 JobEventSink가 기록합니다. 일반 이벤트는 events 테이블에 쌓고,
+# 진행률(progress)과 공급자 폴링 상태(status)는 작업 행의 최신 값 하나만 덮어씁니다.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# heartbeat가 이 시간 이상 끊긴 실행 중 작업은 다시 대기열로
+STALE_AFTER = 120
+# 작업자를 죽게 만드는 작업(메모리 부족 등)이 끝없이 다시 배정되지 않도록 하는 최대 시도 횟수
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# 완료 기록이 없을 때 작업 한 건의 예상 소요 시간(초)
+DEFAULT_JOB_SECONDS = 600
+
+
+class Job:
+    def __init__(self, row: sqlite3.Row):
+        self.id = row["id"]
+        self.status = row["status"]
+        self.input = json.loads(row["input"]) if row["input"] else None
+        self.result = json.loads(row["result"]) if row["result"] else None
+        self.error = row["error"]
+        self.failed_stage = row["failed_stage"]
+        self.stage = row["stage"]
+        self.resume = bool(row["resume"])
+        self.attempts = row["attempts"]
+        self.worker = row["worker"]
+        self.created = row["created"]
+        self.started = row["started"]
+        self.finished = row["finished"]
+        self.heartbeat = row["heartbeat"]
+        self.progress = json.loads(row["progress"]) if row["progress"] else None
+        self.status_message = row["status_message"]
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class JobQueue:
+    """작업 입력, 상태, 결과를 SQLite에 보관하고 여러 프로세스가 나눠 가져가도록 하는 큐"""
+
+    def __init__(self, db_path: str = "temp/jobs.sqlite3"):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                input TEXT,
+                result TEXT,
+                error TEXT,
+                failed_stage TEXT,
+                stage TEXT,
+                resume INTEGER DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                worker TEXT,
+                created REAL,
+                started REAL,
+                finished REAL,
+                heartbeat REAL,
+                progress TEXT,
+                status_message TEXT
+            )
+        """)
+        # 이전 버전에서 만든 DB에 진행 상태 컬럼 추가
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("progress", "status_message"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                event TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                job_id TEXT,
+                status TEXT,
+                heartbeat REAL
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, job_input: dict, job_id: str = None) -> str:
+        """작업 추가 후 작업 ID 반환 (job_id는 체크포인트 thread_id와 작업 원장 job_id로도 사용)"""
+        job_id = job_id or uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO jobs (id, status, input, created) VALUES (?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(job_input, ensure_ascii=False), time.time())
+        )
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """가장 오래된 대기 작업 하나를 이 작업자에게 배정 (없으면 None)"""
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE로 쓰기 잠금을 먼저 잡아 두 작업자가 같은 작업을 가져가지 않도록 함
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started = ?, heartbeat = ?, "
+                "error = NULL WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(row) if row else None
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def add_event(self, job_id: str, event: events.ProgressEvent):
+        self._connect().execute(
+            "INSERT INTO job_events (job_id, event) VALUES (?, ?)",
+            (job_id, json.dumps(event.to_dict(), ensure_ascii=False, default=str))
+        )
+
+    def set_progress(self, job_id: str, event: events.ProgressEvent):
+        """진행률/폴링 상태는 최신 값만 보관"""
+        if event.kind == events.PROGRESS:
+            self._update(job_id, progress=json.dumps(event.to_dict(), ensure_ascii=False, default=str))
+        else:
+            self._update(job_id, status_message=event.message)
+
+    def job_events(self, job_id: str, after: int = 0) -> List[dict]:
+        """작업의 진행 이벤트 목록 (seq 포함, after 이후만)"""
+        rows = self._connect().execute(
+            "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+        return [{"seq": row["seq"], **json.loads(row["event"])} for row in rows]
+
+    def set_stage(self, job_id: str, stage: str):
+        self._update(job_id, stage=stage, heartbeat=time.time())
+
+    def touch(self, job_id: str):
+        self._update(job_id, heartbeat=time.time())
+
+    def complete(self, job_id: str, result: dict):
+        self._update(job_id, status=SUCCEEDED, result=json.dumps(result, ensure_ascii=False),
+                     error=None, failed_stage=None, finished=time.time())
+
+    def fail(self, job_id: str, error: str, failed_stage: str = None, result: dict = None):
+        self._update(job_id, status=FAILED, error=str(error)[:2000], failed_stage=failed_stage,
+                     result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+                     finished=time.time())
+
+    def resume(self, job_id: str) -> bool:
+        """실패한 작업을 다시 대기열에 넣음 (작업자가 체크포인트에서 실패한 단계부터 실행)"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, resume = 1, finished = NULL WHERE id = ? AND status = ?",
+            (QUEUED, job_id, FAILED)
+        )
+        return cursor.rowcount > 0
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER, max_attempts: int = MAX_ATTEMPTS) -> int:
+        """
+        heartbeat가 끊긴 실행 중 작업을 다시 대기열로 (체크포인트에서 이어서 실행)
+
+        이미 max_attempts번 시도한 작업은 다시 넣지 않고 실패로 기록합니다. (이어하기로 다시 실행 가능)
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, failed_stage = stage, worker = NULL, finished = ? "
+                "WHERE status = ? AND heartbeat < ? AND attempts >= ?",
+                (FAILED, f"작업자가 {max_attempts}번 모두 작업 도중 종료되어 중단했습니다.", now,
+                 RUNNING, now - stale_after, max_attempts)
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, resume = 1, worker = NULL WHERE status = ? AND heartbeat < ?",
+                (QUEUED, RUNNING, now - stale_after)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if failed:
+            print(f"최대 시도 횟수({max_attempts})에 도달한 작업 {failed}개를 실패로 기록했습니다.")
+        return requeued
+
+    def position(self, job_id: str) -> int:
+        """대기 순번 (0이면 다음 차례)"""
+        job = self.get(job_id)
+        if job is None or job.status != QUEUED:
+            return 0
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND created < ?", (QUEUED, job.created)
+        ).fetchone()
+        return row[0]
+
+    def average_duration(self) -> float:
+        """최근 완료된 작업의 평균 소요 시간(초)"""
+        row = self._connect().execute(
+            "SELECT AVG(finished - started) FROM (SELECT finished, started FROM jobs WHERE status = ? "
+            "AND started IS NOT NULL ORDER BY finished DESC LIMIT 20)", (SUCCEEDED,)
+        ).fetchone()
+        return row[0] or DEFAULT_JOB_SECONDS
+
+    def estimate_start(self, job_id: str, workers: int) -> float:
+        """
+        대기 중인 작업이 시작될 때까지 남은 예상 시간(초)
+
+        실행 중인 작업은 평균 소요 시간에서 경과 시간을 뺀 만큼 남았다고 보고,
+        작업자가 빌 때마다 앞선 대기 작업을 하나씩 배정하는 순서를 그대로 따라갑니다.
+        """
+        average = self.average_duration()
+        now = time.time()
+        rows = self._connect().execute("SELECT started FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        workers = max(1, workers)
+        free_at = sorted(max(0.0, average - (now - (row["started"] or now))) for row in rows)[:workers]
+        free_at += [0.0] * (workers - len(free_at))
+        heapq.heapify(free_at)
+        for _ in range(self.position(job_id)):
+            heapq.heappush(free_at, heapq.heappop(free_at) + average)
+        return free_at[0]
+
+    def counts(self) -> dict:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        rows = self._connect().execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [Job(row).to_dict() for row in rows]
+
+    def report_worker(self, worker_id: str, job_id: Optional[str], status: dict):
+        """작업자 상태 기록 (공급자 브레이커/지연시간은 작업자 프로세스에 있으므로 UI는 여기서 조회)"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO workers (id, job_id, status, heartbeat) VALUES (?, ?, ?, ?)",
+            (worker_id, job_id, json.dumps(status, ensure_ascii=False), time.time())
+        )
+
+    def workers(self, alive_within: float = STALE_AFTER) -> List[dict]:
+        rows = self._connect().execute(
+            "SELECT * FROM workers WHERE heartbeat > ? ORDER BY id", (time.time() - alive_within,)
+        ).fetchall()
+        return [{"id": row["id"], "job_id": row["job_id"], "heartbeat": row["heartbeat"],
+                 "status": json.loads(row["status"]) if row["status"] else {}} for row in rows]
+
+
+class JobEventSink(events.EventSink):
+    """작업의 진행 이벤트를 큐에 기록 (ThrottledSink로 감싸 진행률 기록 횟수를 제한)"""
+
+    def __init__(self, queue: JobQueue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def handle(self, event: events.ProgressEvent):
+        if event.kind in events.COALESCED_KINDS:
+            self.queue.set_progress(self.job_id, event)
+        else:
+            self.queue.add_event(self.job_id, event)
+
+
+def worker_name() -> str:
+    """작업자 ID (작업자는 프로세스마다 하나)"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """프로세스 공용 작업 큐"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(os.getenv("JOB_QUEUE_DB", "temp/jobs.sqlite3"))
+        return _queue
@@ -1,6 +1,234 @@
-def main():
-    print("Hello from nowagift!")
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+import events
+import task_ledger
+import tracing
+
+# 추모 영상 일괄 제작 (Streamlit 없이 같은 LangGraph 워크플로우 실행)
+#
+#   uv run python main.py orders.json --parallel 2 --output-dir output
+#
+# 매니페스트는 주문 목록입니다.
+#   - .json: [{"id": "order-1", "theme": "...", "lines": ["문장1", ..., "문장7"],
+#              "photos": ["a.jpg", ...], "audio": "voice.mp3"}, ...] (또는 {"orders": [...]})
+#   - .csv: id, theme, line1 ~ line7, photos(;로 구분), audio 열
+# 상대 경로는 매니페스트 위치 기준이며, 1/4/7번째 문장을 비워 두면 화면과 같은 고정 문장을 씁니다.
+# 결과 영상이 이미 있는 주문은 건너뛰고, 이전 실행에서 실패한 주문은 실패한 단계부터 이어서 실행합니다.
+
+DEFAULT_THEME = "따뜻한 추억 (Warm Memories)"
+FIXED_LINES = {0: "내가 가장 행복했을 때는", 3: "여보,", 6: "지금, 선물"}
+TOTAL_DURATION = 67
+
+
+def _resolve(base_dir: str, path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    return os.path.normpath(os.path.join(base_dir, path))
+
+
+def normalize_lines(lines: List[Optional[str]]) -> List[str]:
+    """대본을 7줄로 맞추고 비어 있는 고정 줄 채우기 (매니페스트, HTTP API 공용)"""
+    lines = list(lines or [])
+    lines += [""] * (7 - len(lines))
+    return [(line or "").strip() or FIXED_LINES.get(number, "") for number, line in enumerate(lines[:7])]
+
+
+def load_orders(manifest: str) -> List[dict]:
+    """JSON/CSV 매니페스트에서 주문 목록 읽기"""
+    base_dir = os.path.dirname(os.path.abspath(manifest))
+    if manifest.lower().endswith(".csv"):
+        with open(manifest, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+        raw_orders = [{
+            "id": row.get("id"),
+            "theme": row.get("theme"),
+            "lines": [row.get(f"line{number}") or "" for number in range(1, 8)],
+            "photos": [path.strip() for path in (row.get("photos") or "").split(";") if path.strip()],
+            "audio": row.get("audio"),
+        } for row in rows]
+    else:
+        with open(manifest, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        raw_orders = data["orders"] if isinstance(data, dict) else data
+
+    orders = []
+    for index, raw in enumerate(raw_orders):
+        orders.append({
+            "id": str(raw.get("id") or f"order-{index + 1}"),
+            "theme": raw.get("theme") or DEFAULT_THEME,
+            "lines": normalize_lines(raw.get("lines")),
+            "photos": [_resolve(base_dir, path) for path in raw.get("photos") or []],
+            "audio": _resolve(base_dir, raw.get("audio")),
+        })
+    return orders
+
+
+def validate_order(order: dict) -> List[str]:
+    """화면의 입력 검증과 같은 기준"""
+    errors = []
+    if len([line for line in order["lines"] if line]) < 3:
+        errors.append("최소 3개 이상의 문항을 입력해주세요.")
+    missing = [path for path in order["photos"] + [order["audio"]] if path and not os.path.exists(path)]
+    if missing:
+        errors.append(f"파일을 찾을 수 없습니다: {', '.join(missing)}")
+    return errors
+
+
+def initial_state(order: dict) -> dict:
+    return dict(
+        theme=order["theme"],
+        script="\n".join(line for line in order["lines"] if line.strip()),
+        image_paths=order["photos"],
+        audio_path=order["audio"],
+        total_duration=TOTAL_DURATION,
+        storyboard=None,
+        final_video_path=None,
+        error_message=None,
+        failed_stage=None,
+        scenes=[],
+        generated_video_paths=[],
+    )
+
+
+def run_order(order: dict, output_dir: str, verbose: bool = False) -> dict:
+    """주문 하나를 워크플로우로 실행하고 결과 영상을 output_dir/<id>.mp4로 옮긴 뒤 보고서 항목 반환"""
+    load_dotenv()
+    from checkpointing import prepare_resume, thread_config
+    from pipeline import STAGES, get_graph
+
+    graph = get_graph()
+
+    thread_id = f"batch-{order['id']}"
+    config = thread_config(thread_id)
+    output_path = os.path.join(output_dir, f"{order['id']}.mp4")
+    metrics = events.MetricsSink()
+    sink = events.FanoutSink(events.ThrottledSink(events.PrintSink(verbose, prefix=f"[{order['id']}] ")), metrics)
+
+    start_time = time.time()
+    resumed = False
+    try:
+        with task_ledger.job_context(thread_id), events.use_sink(sink), tracing.trace(thread_id):
+            # 이전 실행에서 실패했다면 실패한 단계부터 이어서 실행
+            resumed = prepare_resume(graph, config, STAGES)
+            final_state = graph.invoke(None if resumed else initial_state(order), config)
+    except Exception as e:
+        final_state = {"error_message": f"작업 실행 중 오류 발생: {e}"}
+    elapsed = time.time() - start_time
+
+    report = {
+        "id": order["id"],
+        "status": "failed",
+        "resumed": resumed,
+        "seconds": round(elapsed, 2),
+        "stage_seconds": {stage: round(sum(values), 2)
+                          for stage, values in metrics.snapshot()["stage_seconds"].items()},
+    }
+    video_path = final_state.get("final_video_path")
+    if final_state.get("error_message") or not (video_path and os.path.exists(video_path)):
+        report.update(error=final_state.get("error_message") or "결과 영상이 없습니다.",
+                      failed_stage=final_state.get("failed_stage"))
+        return report
+
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.move(video_path, output_path)
+    report.update(status="done", output=output_path)
+    return report
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_batch(orders: List[dict], output_dir: str, parallel: int = 1, verbose: bool = False) -> dict:
+    """주문을 parallel개 프로세스에서 나눠 실행하고 주문별 소요 시간 보고서 반환"""
+    results = []
+    pending = []
+    for order in orders:
+        output_path = os.path.join(output_dir, f"{order['id']}.mp4")
+        errors = validate_order(order)
+        if os.path.exists(output_path):
+            results.append({"id": order["id"], "status": "skipped", "output": output_path})
+        elif errors:
+            results.append({"id": order["id"], "status": "failed", "error": " ".join(errors)})
+        else:
+            pending.append(order)
+
+    start_time = time.time()
+    # moviepy/ffmpeg 상태를 공유하지 않도록 주문마다 spawn된 프로세스에서 실행 (인코딩 수는 admission이 제한)
+    with ProcessPoolExecutor(max_workers=max(1, parallel), mp_context=get_context("spawn")) as executor:
+        futures = {executor.submit(run_order, order, output_dir, verbose): order for order in pending}
+        for future in as_completed(futures):
+            order = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"id": order["id"], "status": "failed", "error": f"작업 프로세스 오류: {e}"}
+            results.append(result)
+            detail = result.get("output") or result.get("error")
+            print(f"[{len(results)}/{len(orders)}] {result['status']} {result.get('seconds', 0):.0f}s: "
+                  f"{result['id']} -> {detail}")
+
+    elapsed = time.time() - start_time
+    latencies = [r["seconds"] for r in results if r["status"] == "done"]
+    summary = {
+        "total": len(orders),
+        "done": len(latencies),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "parallel": parallel,
+        "elapsed": round(elapsed, 2),
+        "orders_per_hour": round(len(latencies) / elapsed * 3600, 2) if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        summary.update({
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_max": max(latencies),
+        })
+    order_index = {order["id"]: index for index, order in enumerate(orders)}
+    results.sort(key=lambda result: order_index.get(result["id"], len(orders)))
+    return {"summary": summary, "orders": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="추모 영상 일괄 제작")
+    parser.add_argument("manifest", help="주문 매니페스트 (.json 또는 .csv)")
+    parser.add_argument("--output-dir", default="output", help="결과 영상 디렉토리")
+    parser.add_argument("--parallel", type=int, default=1, help="동시에 제작할 주문 수")
+    parser.add_argument("--report", help="주문별 소요 시간 보고서(JSON) 경로 (기본값: <output-dir>/report.json)")
+    parser.add_argument("--verbose", action="store_true", help="디버그 이벤트(스토리보드 등)도 출력")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("OPENROUTER_API_KEY"):
+        print("❌ OPENROUTER_API_KEY가 .env 파일에 설정되지 않았습니다.")
+        return 1
+
+    orders = load_orders(args.manifest)
+    if not orders:
+        print(f"처리할 주문이 없습니다: {args.manifest}")
+        return 1
+    print(f"{len(orders)}개 주문 처리 시작 (동시 {args.parallel}개)")
+
+    report = run_batch(orders, args.output_dir, args.parallel, args.verbose)
+    print(f"완료: {json.dumps(report['summary'], ensure_ascii=False)}")
+    report_path = args.report or os.path.join(args.output_dir, "report.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["summary"]["failed"] else 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,547 @@
+import threading
+import time
+import os
+import uuid
+from typing import TypedDict, List, Dict
+from dotenv import load_dotenv
+
+from providers import ENHANCE_APPEARANCE, ProviderError, get_image_router, get_video_router
+from hedging import run_video
+import circuit_breaker
+import rate_limiter
+from checkpointing import get_checkpointer
+import admission
+import events
+import tracing
+from scenes import NO_SUBTITLE_SCENES, SUBTITLE_STYLES, build_scene_clip, make_scene, make_subtitle, resolve_source
+
+# 추모 영상 제작 워크플로우 (LangGraph 에이전트와 그래프)
+# Streamlit UI(app.py)는 작업을 큐에 넣기만 하고, 실제 실행은 작업자(worker.py)가 이 모듈의 get_graph()로 합니다.
+# 에이전트는 화면에 직접 출력하지 않고 events로 진행 이벤트만 남깁니다. (싱크가 없으면 콘솔 출력)
+# moviepy, langchain, langgraph는 불러오는 데 수 초가 걸리므로 사용하는 단계에서 처음 필요할 때 불러오고,
+# 컴파일된 그래프(get_graph)와 LLM 클라이언트(get_llm)는 프로세스마다 한 번만 만듭니다.
+
+# 환경변수 로드
+load_dotenv()
+
+# --- 1. 기본 설정 및 API 키 입력 ---
+# .env 파일에서 OpenRouter API 키 로드
+
+openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+if openrouter_api_key:
+    os.environ["OPENAI_API_KEY"] = openrouter_api_key
+else:
+    raise RuntimeError(
+        "Missing OPENROUTER_API_KEY. Set it in your environment or .env file (OPENROUTER_API_KEY=...)."
+    )
+
+# 임시 파일들을 저장할 디렉토리 생성
+if not os.path.exists("temp"):
+    os.makedirs("temp")
+
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """시나리오 작성용 LLM 클라이언트 (프로세스 공용, 처음 사용할 때 생성)"""
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            from langchain_openai import ChatOpenAI
+            _llm = ChatOpenAI(
+                model="openai/gpt-5-nano",
+                temperature=0.5,
+                base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+                default_headers={
+                    "HTTP-Referer": os.getenv("YOUR_SITE_URL", ""),
+                    "X-Title": os.getenv("YOUR_SITE_NAME", ""),
+                }
+            )
+        return _llm
+
+# --- 2. LangGraph 상태 정의 ---
+# 각 에이전트가 작업 내용을 공유하는 데이터 구조
+class AgentState(TypedDict):
+    theme: str
+    script: str
+    image_paths: List[str]
+    audio_path: str
+    total_duration: int
+    storyboard: List[Dict]  # 시나리오 작가의 결과물 (이미지, 텍스트, 길이 등)
+    scenes: List[Dict]      # 장면 기술자 (배경 소스 경로, 길이, 자막 텍스트/스타일/위치/해시), 클립은 렌더링 단계에서 생성
+    final_video_path: str   # 최종 제작자의 결과물 (완성된 영상 경로)
+    error_message: str      # 오류 발생 시 메시지 저장
+    failed_stage: str       # 오류가 발생한 단계 (이어하기 시 이 단계부터 다시 실행)
+    generated_video_paths: List[str]  # image_video_generator_agent가 생성한 비디오 경로들
+
+# --- 3. 에이전트 및 도구(Tool) 정의 ---
+    """
+    각 에이전트는 특정 작업을 수행하며, 상태 업데이트
+    - 3.1. 시나리오 작가 에이전트: 스크립트와 이미지 개수를 기반으로 스토리보드 생성
+    - 3.2. 이미지-비디오 생성 에이전트: 사용자 이미지를 바탕으로 모션 비디오 생성
+    - 3.3. 자막 생성 에이전트: 스크립트를 바탕으로 자막 영상 생성
+    - 3.4. 최종 제작자 에이전트: 기존 영상과 자막 영상을 결합하여 최종 영상 제작
+    """
+
+# 3.1. 시나리오 작가 에이전트 (Scenario Writer Agent)
+def scenario_writer_agent(state: AgentState):
+    """스크립트와 이미지 개수를 기반으로 스토리보드를 생성합니다."""
+    events.info("입력된 스크립트와 사진들을 바탕으로 영상의 전체 흐름을 기획하고 있습니다...")
+
+    theme = state["theme"]
+    script = state["script"]
+    num_images = len(state["image_paths"])
+    total_duration = state["total_duration"]
+
+    from langchain_core.output_parsers import JsonOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    # LLM 모델 (프로세스 공용 클라이언트)
+    llm = get_llm()
+
+    # LLM에게 전달할 프롬프트 템플릿
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                """당신은 감동적인 추모 영상을 위한 시나리오 작가입니다.
+                사용자의 7개 장면으로 구성된 스크립트와 이미지를 바탕으로, 각 장면의 내용과 길이를 JSON 형식의 스토리보드(storyboard)로 만들어야 합니다.
+                
+                사용자의 스크립트는 기본적으로 7개로 구성되어 있습니다:
+                1. "내가 가장 행복했을 때는"
+                2. 사용자 자유 입력
+                3. 사용자 자유 입력  
+                4. "여보,"
+                5. 사용자 자유 입력
+                6. 사용자 자유 입력
+                7. "지금, 선물"
+                
+                - 전체 영상 길이는 반드시 {total_duration}초가 되어야 합니다.
+                - 각 장면은 10초, 10초, 10초, 5초, 10초, 10초, 12초로 구성됩니다.
+                - 각 장면(scene)은 'image_index', 'duration', 'subtitle' 키만 가져야 합니다.
+                - 'image_index'는 순서대로 1, 2, 3, 4, 5, 6, 7로 구성됩니다.
+                - 'duration'은 해당 장면의 초 단위 길이입니다. 모든 duration의 합은 {total_duration}이 되어야 합니다.
+                - narration, visual_cue, music_cue 등의 추가 필드는 절대 생성하지 마세요.
+                - 테마 '{theme}'의 분위기를 반영해주세요.
+                - 최종 출력은 오직 JSON 객체만 있어야 합니다.
+                """,
+            ),
+            (
+                "human",
+                "사용자 스크립트: {script}\n"
+            ),
+        ]
+    )
+    
+    # JSON 출력을 위한 파서
+    parser = JsonOutputParser()
+
+    # 체인 구성
+    chain = prompt | llm | parser
+
+    try:
+        rate_limiter.wait("openrouter", "chat")
+        storyboard_data = chain.invoke({
+            "total_duration": total_duration,
+            "num_images": num_images,
+            "theme": theme,
+            "script": script,
+        })
+        
+        # storyboard_data가 None인지 확인
+        if storyboard_data is None:
+            error_msg = "OpenAI API로부터 응답을 받지 못했습니다. API 키를 확인해주세요."
+            events.error(error_msg)
+            return {"error_message": error_msg}
+        
+        # 'storyboard' 키가 있는지 확인하고 추출
+        if isinstance(storyboard_data, dict) and 'storyboard' in storyboard_data:
+            storyboard = storyboard_data['storyboard']
+        elif isinstance(storyboard_data, dict) and 'scenes' in storyboard_data:
+            # 'scenes' 키가 있는 경우도 처리
+            storyboard = storyboard_data['scenes']
+        elif isinstance(storyboard_data, list):
+            # 직접 리스트로 반환된 경우
+            storyboard = storyboard_data
+        else:
+            # 딕셔너리이지만 storyboard나 scenes 키가 없는 경우, 값들을 리스트로 변환 시도
+            if isinstance(storyboard_data, dict):
+                # 딕셔너리의 값들이 scene 객체들인지 확인
+                values = list(storyboard_data.values())
+                if values and all(isinstance(v, dict) and 'image_index' in v for v in values):
+                    storyboard = values
+                else:
+                    storyboard = storyboard_data
+            else:
+                storyboard = storyboard_data
+
+        # storyboard가 리스트인지 최종 확인
+        if not isinstance(storyboard, list):
+            error_msg = f"스토리보드를 리스트 형태로 변환할 수 없습니다. 타입: {type(storyboard)}, 내용: {storyboard}"
+            events.error(error_msg)
+            return {"error_message": error_msg}
+
+        # storyboard duration 지정
+        durations = [10, 10, 10, 5, 10, 10, 12]
+        if len(storyboard) == len(durations):
+            for i in range(len(storyboard)):
+                if isinstance(storyboard[i], dict):
+                    storyboard[i]['duration'] = durations[i]
+        
+        events.success("스토리보드 기획 완료!")
+        # 디버깅을 위해 스토리보드 출력
+        events.debug("생성된 스토리보드", storyboard=storyboard)
+
+        return {"storyboard": storyboard}
+    
+    except Exception as e:
+        error_msg = f"시나리오 작성 중 오류 발생: {e}"
+        events.error(error_msg)
+        return {"error_message": error_msg}
+
+def write_still_video(image_path: str, video_path: str):
+    """사진 한 장으로 10초짜리 정지 영상 인코딩 (동시 인코딩 수 한도 안에서)"""
+    from moviepy import ImageClip
+
+    with admission.encode() as threads:
+        video_clip = ImageClip(image_path).with_duration(10)
+        try:
+            with tracing.span("encode", kind="still"):
+                video_clip.write_videofile(video_path, codec="libx264", fps=24, threads=threads)
+        finally:
+            video_clip.close()
+
+# 3.2. 이미지-비디오 생성 에이전트 (Image Video Generator Agent) 
+def image_video_generator_agent(state: AgentState):
+    """사용자 이미지를 바탕으로 이미지 보정 및 모션 비디오를 생성합니다. (공급자는 라우터가 선택)"""
+    events.info("업로드된 사진들을 바탕으로 움직이는 영상을 생성하고 있습니다...")
+    
+    image_paths = state.get("image_paths")
+    theme = state.get("theme")
+    
+    if not image_paths:
+        error_msg = "이미지-비디오 생성에 필요한 사진이 없습니다."
+        events.error(error_msg)
+        return {"error_message": error_msg}
+    
+    image_router = get_image_router()
+    video_router = get_video_router()
+    
+    if not video_router:
+        events.warning("비디오 생성 API 키가 설정되지 않았습니다. 원본 이미지를 사용합니다.")
+    elif not image_router:
+        events.info("이미지 보정 API 키가 설정되지 않았습니다. 원본 이미지로 비디오를 생성합니다.")
+    
+    video_prompt = f"Create a gentle, moving video from this memorial photo. {theme} style. Soft, warm lighting with subtle camera movement. The person in the photo should have a gentle, peaceful expression."
+    
+    generated_video_paths = []
+    
+    for idx, image_path in enumerate(image_paths):
+        try:
+            # 진행률 업데이트
+            events.progress(idx / len(image_paths), f"이미지 {idx + 1}/{len(image_paths)} 처리 중...")
+            
+            enhanced_image_path = image_path  # 기본값으로 원본 이미지 설정
+            video_creation_success = False
+            
+            # 할당량 부족/인증 오류 등으로 서킷 브레이커가 열린 공급자는 모든 세션에서 즉시 제외됨
+            use_original_images = not video_router.available()
+            if video_router and use_original_images:
+                events.warning("사용 가능한 비디오 공급자가 없습니다 (일시 차단). 원본 이미지를 사용합니다.")
+            
+            if not use_original_images:
+                try:
+                    if image_router.available():
+                        events.info(f"이미지 {idx + 1} 보정 중...")
+                        try:
+                            enhanced_image_path = image_router.run(
+                                "enhance_image", image_path, ENHANCE_APPEARANCE, on_status=events.status
+                            )
+                            events.success(f"이미지 {idx + 1} 보정 완료")
+                        except ProviderError as enhance_error:
+                            events.warning(f"이미지 {idx + 1} 보정 실패, 원본 이미지 사용: {enhance_error}")
+                    
+                    events.info(f"비디오 {idx + 1} 생성 중...")
+                    # HEDGE_ENABLED=1이면 느린 작업을 다른 공급자에 헤지 요청
+                    video_path = run_video(video_router, enhanced_image_path, video_prompt, on_status=events.status)
+                    generated_video_paths.append(video_path)
+                    events.success(f"비디오 {idx + 1} 생성 및 다운로드 완료")
+                    video_creation_success = True
+                
+                except Exception as api_error:
+                    error_msg = str(api_error)
+                    if circuit_breaker.classify_error(api_error) == "quota":
+                        events.warning(f"API 할당량이 부족합니다. 원본 이미지를 사용합니다.")
+                    elif "risk control" in error_msg.lower():
+                        events.info(f"콘텐츠 정책으로 인해 비디오 {idx + 1} 생성이 제한되었습니다. 정적 이미지를 사용합니다.")
+                    else:
+                        events.warning(f"API 오류 발생: {error_msg}. 원본 이미지를 사용합니다.")
+            
+            if not video_creation_success or use_original_images:
+                events.info(f"정적 비디오 {idx + 1} 생성 중...")
+                try:
+                    video_path = f"temp/static_video_{idx+1}_{uuid.uuid4()}.mp4"
+                    write_still_video(enhanced_image_path, video_path)
+                    generated_video_paths.append(video_path)
+                    events.success(f"정적 비디오 {idx + 1} 생성 완료")
+                except Exception as video_error:
+                    events.error(f"비디오 생성 중 오류 발생: {video_error}")
+                    try:
+                        video_path = f"temp/fallback_video_{idx+1}_{uuid.uuid4()}.mp4"
+                        write_still_video(image_path, video_path)
+                        generated_video_paths.append(video_path)
+                        events.warning(f"원본 이미지로 비디오 {idx + 1} 생성 완료")
+                    except Exception as final_error:
+                        error_msg = f"이미지 {idx + 1} 처리 중 치명적 오류 발생: {final_error}"
+                        return {"error_message": error_msg}
+            
+        except Exception as e:
+            events.error(f"이미지 {idx + 1} 처리 중 오류 발생: {e}")
+            try:
+                video_path = f"temp/fallback_video_{idx+1}_{uuid.uuid4()}.mp4"
+                write_still_video(image_path, video_path)
+                generated_video_paths.append(video_path)
+                events.warning(f"오류 복구: 원본 이미지로 비디오 {idx + 1} 생성 완료")
+            except:
+                error_msg = f"이미지 {idx + 1} 처리 중 치명적 오류 발생: {e}"
+                return {"error_message": error_msg}
+    
+    if not generated_video_paths:
+        error_msg = "생성된 비디오가 하나도 없습니다."
+        events.error(error_msg)
+        return {"error_message": error_msg}
+    
+    if not video_router.available():
+        events.success(f"총 {len(generated_video_paths)}개의 정적 비디오 생성 완료! (원본 이미지 사용)")
+    else:
+        events.success(f"총 {len(generated_video_paths)}개의 비디오 생성 완료!")
+    
+    return {"generated_video_paths": generated_video_paths}
+
+# 3.3. 자막 생성 에이전트 (Subtitle Creator Agent) 
+def subtitle_creator_agent(state: AgentState):
+    """스토리보드와 스크립트로 장면별 기술자(배경 소스, 자막 텍스트/스타일/위치)를 만듭니다."""
+    events.info("입력된 스크립트를 바탕으로 각 장면의 구성과 자막을 정리하고 있습니다...")
+    
+    script_lines = state.get("script").split("\n")
+    storyboard = state.get("storyboard")
+    image_paths = state.get("image_paths") or []
+    generated_video_paths = state.get("generated_video_paths") or []
+    
+    if not storyboard or not script_lines:
+        error_msg = "자막 생성에 필요한 정보(스토리보드, 스크립트)가 부족합니다."
+        events.error(error_msg)
+        return {"error_message": error_msg}
+    
+    # storyboard가 리스트가 아닌 경우 처리
+    if not isinstance(storyboard, list):
+        error_msg = f"스토리보드가 예상된 리스트 형식이 아닙니다. 현재 타입: {type(storyboard)}"
+        events.error(error_msg)
+        return {"error_message": error_msg}
+
+    # 폰트 경로 확인 (자막 이미지는 렌더링 단계에서 그림)
+    font_path = SUBTITLE_STYLES["default"]["font"]
+    if not os.path.exists(font_path):
+        error_msg = f"지정된 폰트 파일을 찾을 수 없습니다: {font_path}"
+        events.error(error_msg)
+        return {"error_message": error_msg}
+    
+    # 상태에는 클립 객체 대신 직렬화 가능한 장면 기술자만 저장
+    scenes = []
+    
+    for idx, scene in enumerate(storyboard):
+        if not isinstance(scene, dict):
+            events.error(f"장면 {idx+1}이 딕셔너리가 아닙니다. 타입: {type(scene)}, 내용: {scene}")
+            continue
+        
+        if 'duration' not in scene or 'image_index' not in scene:
+            events.error(f"장면 {idx+1}에 'duration' 또는 'image_index' 키가 없습니다. 키들: {list(scene.keys())}")
+            continue
+        
+        image_index = scene['image_index']
+        source = resolve_source(image_index, image_paths, generated_video_paths)
+        if source["fallback"]:
+            events.warning(f"장면 {idx+1}(이미지 인덱스 {image_index})에 사용할 사진이 없어 기본 클립을 사용합니다.")
+        
+        subtitle = None
+        if (idx + 1) not in NO_SUBTITLE_SCENES:
+            if idx < len(script_lines):
+                subtitle = make_subtitle(script_lines[idx].strip())
+            else:
+                events.warning(f"스크립트 문항이 부족합니다. 장면 {idx+1}의 자막은 건너뜁니다.")
+        
+        scenes.append(make_scene(idx + 1, image_index, scene['duration'], source, subtitle))
+
+    if not any(scene["subtitle"] for scene in scenes): 
+        error_msg = "자막을 구성할 장면이 하나도 없습니다."
+        events.error(error_msg)
+        return {"error_message": error_msg}
+    
+    events.success("장면 구성 및 자막 준비 완료!")
+    
+    return {"scenes": scenes}
+
+def render_final_video(scenes: List[Dict], audio_path: str, encoder_threads: int = None):
+    """장면 기술자로 클립을 만들어 하나의 영상으로 인코딩 (수락 제어 구간 안에서 호출)"""
+    from moviepy import AudioFileClip, concatenate_videoclips
+
+    # 장면 기술자로부터 클립을 이 단계에서만 만들고, 렌더링이 끝나면 모두 닫음
+    combined_clips = []
+    
+    # 진행률 및 시간 표시를 위한 설정
+    total_scenes = len(scenes)
+    start_time = time.time()
+
+    # 예상 시간 계산 (같은 장면 수의 최종 인코딩 기록이 있으면 그 평균, 없으면 장면당 평균 3초로 가정)
+    # scene.build는 지연 클립 구성만 재므로(수 ms) 실제 시간 대부분을 차지하는 encode 구간을 기준으로 함
+    estimated_total_time = tracing.mean("encode", total_scenes * 3.0, kind="final", scenes=total_scenes)
+
+    for scene_idx, scene in enumerate(scenes):
+        try:
+            # 경과 시간 및 예상 남은 시간과 함께 진행률 업데이트
+            elapsed_time = time.time() - start_time
+            estimated_remaining_time = max(0.0, estimated_total_time - elapsed_time)
+            events.progress(scene_idx / total_scenes, f"장면 {scene_idx + 1}/{total_scenes} 처리 중...",
+                            elapsed=round(elapsed_time), remaining=round(estimated_remaining_time))
+
+            # 1, 4, 7번째 장면은 자막 없이, 나머지는 캐시된 자막 이미지를 합성
+            with tracing.span("scene.build", kind=scene["source"]["kind"], scene=scene["index"]):
+                combined_clips.append(build_scene_clip(scene))
+        
+        except Exception as e:
+            for clip in combined_clips:
+                clip.close()
+            events.error(f"장면 생성 중 오류 발생: {e}")
+            return {"error_message": f"장면 생성 중 오류 발생: {e}"}
+
+    if not combined_clips:
+        error_msg = "영상을 구성할 장면이 하나도 없습니다."
+        events.error(error_msg)
+        return {"error_message": error_msg}
+
+    # 모든 영상 클립을 하나로 연결
+    final_video_clip = concatenate_videoclips(combined_clips, method="compose")
+
+    # 백그라운드 음악 추가
+    background_music_path = "resources/music/m0.mp3"
+    if os.path.exists(background_music_path):
+        background_music = AudioFileClip(background_music_path)
+
+        # 배경음악을 영상 길이에 맞게 조정
+        if background_music.duration < final_video_clip.duration:
+            # 음악이 짧으면 반복
+            loops_needed = int(final_video_clip.duration / background_music.duration) + 1
+            background_music = background_music.loop(loops_needed)
+
+        # 음악을 영상 길이에 맞게 자르기
+        background_music = background_music.subclipped(0, final_video_clip.duration)
+
+        # 배경음악 볼륨 조절 - MoviePy 버전 호환성을 위해 간단하게 처리
+        background_music = background_music.with_fps(22050)
+        # 볼륨 조절은 오디오 믹싱 시 CompositeAudioClip에서 처리
+
+        if audio_path:
+            # 사용자 음성이 있으면 믹싱
+            user_audio = AudioFileClip(audio_path)
+            if user_audio.duration > final_video_clip.duration:
+                user_audio = user_audio.subclipped(0, final_video_clip.duration)
+
+            # 두 오디오를 합성 (배경음악 + 사용자 음성)
+            from moviepy import CompositeAudioClip
+            # 배경음악과 사용자 음성을 믹싱 (배경음악은 자동으로 낮은 볼륨)
+            mixed_audio = CompositeAudioClip([background_music, user_audio])
+            final_video_clip = final_video_clip.with_audio(mixed_audio)
+        else:
+            # 사용자 음성이 없으면 배경음악만
+            final_video_clip = final_video_clip.with_audio(background_music)
+    else:
+        # 배경음악 파일이 없는 경우 기존 로직
+        if audio_path:
+            audio_clip = AudioFileClip(audio_path)
+            if audio_clip.duration > final_video_clip.duration:
+                audio_clip = audio_clip.subclipped(0, final_video_clip.duration)
+            final_video_clip = final_video_clip.with_audio(audio_clip)
+
+    output_filename = f"temp/final_video_{uuid.uuid4()}.mp4"
+    try:
+        with tracing.span("encode", kind="final", scenes=total_scenes, duration=final_video_clip.duration):
+            final_video_clip.write_videofile(output_filename, codec="libx264", audio_codec="aac", fps=24,
+                                             threads=encoder_threads)
+    finally:
+        final_video_clip.close()
+        for clip in combined_clips:
+            clip.close()
+    
+    events.success("영상 제작 완료!")
+    return {"final_video_path": output_filename}
+
+# 3.4. 최종 제작자 에이전트 (Final Producer Agent) 
+def final_producer_agent(state: AgentState):
+    """기존 영상과 자막 영상을 결합하여 최종 영상을 제작합니다."""
+    events.info("기획된 스토리보드에 따라 사진, 자막, 음성을 합쳐 최종 영상을 만들고 있습니다...")
+    
+    scenes = state.get("scenes")
+    audio_path = state.get("audio_path")
+    
+    if not scenes:
+        error_msg = "렌더링할 장면 정보가 없습니다."
+        events.error(error_msg)
+        return {"error_message": error_msg}
+    
+    # 동시에 여는 ffmpeg 리더 수(영상 장면 수)와 인코딩 슬롯을 확보한 뒤 렌더링 (한도를 넘으면 대기)
+    decoders = sum(1 for scene in scenes if scene["source"]["kind"] == "video")
+    with admission.render(decoders) as encoder_threads:
+        return render_final_video(scenes, audio_path, encoder_threads)
+
+# --- 4. LangGraph 워크플로우 구성 ---
+# 단계 순서 (실패 시 이어하기에서 직전 단계를 찾는 데 사용)
+STAGES = ["scenario_writer", "image_video_generator", "subtitle_creator", "final_producer"]
+
+def stage_node(stage: str, agent):
+    """에이전트 실행 결과에 실패 단계를 기록 (예외도 오류 메시지로 바꿔 체크포인트에 남김)"""
+    def run(state: AgentState):
+        with events.stage(stage) as outcome, tracing.span("node", stage=stage) as node_span:
+            try:
+                result = agent(state) or {}
+            except Exception as e:
+                events.error(f"{stage} 단계 실행 중 오류 발생: {e}")
+                result = {"error_message": f"{stage} 단계 실행 중 오류 발생: {e}"}
+            outcome["ok"] = not result.get("error_message")
+            if result.get("error_message"):
+                node_span.fail(result["error_message"])
+        if result.get("error_message"):
+            return {**result, "failed_stage": stage}
+        return {**result, "error_message": None, "failed_stage": None}
+    return run
+
+def continue_or_end(state: AgentState):
+    """오류가 있으면 이후 단계를 실행하지 않고 종료"""
+    return "end" if state.get("error_message") else "continue"
+
+def build_workflow():
+    """단계 노드와 조건부 간선으로 워크플로우 구성"""
+    from langgraph.graph import END, StateGraph
+
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("scenario_writer", stage_node("scenario_writer", scenario_writer_agent))
+    workflow.add_node("image_video_generator", stage_node("image_video_generator", image_video_generator_agent))
+    workflow.add_node("subtitle_creator", stage_node("subtitle_creator", subtitle_creator_agent))
+    workflow.add_node("final_producer", stage_node("final_producer", final_producer_agent))
+
+    workflow.set_entry_point("scenario_writer")
+    for stage, next_stage in zip(STAGES, STAGES[1:]):
+        workflow.add_conditional_edges(stage, continue_or_end, {"continue": next_stage, "end": END})
+    workflow.add_edge("final_producer", END)
+    return workflow
+
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_graph():
+    """컴파일된 그래프 (프로세스 공용, 노드가 끝날 때마다 상태를 체크포인트에 저장)"""
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = build_workflow().compile(checkpointer=get_checkpointer())
+        return _graph
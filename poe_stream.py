@@ -0,0 +1,129 @@
+import json
+import re
+from typing import Iterable, Iterator, Optional, Tuple
+
+import requests
+
+import rate_limiter
+from retry_policy import GENERATE_TIMEOUT
+from stream_body import StreamingJSONBody
+
+# Poe 봇 응답 스트리밍 및 미디어 URL 감지
+#
+# Poe 봇은 진행 상황 텍스트를 먼저 보내고 결과 URL을 마지막에 보냅니다.
+# 응답 전체를 기다리지 않고 스트림 조각(delta)을 받는 대로 미리 컴파일한 패턴으로 검사해,
+# 완성된 미디어 URL이 나타나는 즉시 돌려줍니다. (이후 스트림은 닫음)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".m4v")
+
+# 마크다운 ![](url) 안의 URL도 잡을 수 있도록 괄호는 URL 문자에서 제외
+_URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]()]+')
+_TRAILING_PUNCTUATION = ".,;:!?'"
+
+
+def _media_path_matches(url: str, extensions: Tuple[str, ...]) -> bool:
+    path = url.split("?", 1)[0].split("#", 1)[0].lower()
+    return path.endswith(extensions)
+
+
+class MediaURLScanner:
+    """스트림 조각을 이어 받으며 확장자가 맞는 첫 번째 완성된 URL을 찾음"""
+
+    def __init__(self, extensions: Tuple[str, ...] = IMAGE_EXTENSIONS):
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._parts = []
+        self._text = ""
+        self._scan_from = 0
+
+    @property
+    def text(self) -> str:
+        """지금까지 받은 응답 텍스트"""
+        return self._text
+
+    def feed(self, delta: str) -> Optional[str]:
+        """조각을 추가하고, 뒤에 구분 문자가 와서 끝이 확정된 미디어 URL이 있으면 반환"""
+        if not delta:
+            return None
+        self._text += delta
+        return self._scan(final=False)
+
+    def finish(self) -> Optional[str]:
+        """스트림 종료: 텍스트 끝에 걸쳐 있던 URL까지 확정해서 검사"""
+        return self._scan(final=True)
+
+    def _scan(self, final: bool) -> Optional[str]:
+        for match in _URL_PATTERN.finditer(self._text, self._scan_from):
+            if match.end() == len(self._text) and not final:
+                # 아직 URL이 이어서 들어올 수 있음: 다음 조각에서 이 위치부터 다시 검사
+                self._scan_from = match.start()
+                return None
+            self._scan_from = match.end()
+            url = match.group(0).rstrip(_TRAILING_PUNCTUATION)
+            if _media_path_matches(url, self.extensions):
+                return url
+        # 마지막 조각이 "http" 앞부분에서 끊긴 경우를 위해 약간 되돌아가서 다음 검사 시작
+        self._scan_from = max(self._scan_from, len(self._text) - len("https://"))
+        return None
+
+
+def find_media_url(text: str, extensions: Tuple[str, ...] = IMAGE_EXTENSIONS) -> Optional[str]:
+    """완성된 응답 텍스트에서 첫 번째 미디어 URL 추출"""
+    scanner = MediaURLScanner(extensions)
+    return scanner.feed(text) or scanner.finish()
+
+
+def iter_sdk_deltas(stream) -> Iterator[str]:
+    """openai SDK의 stream=True 응답에서 텍스트 조각만 추출"""
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+def iter_sse_deltas(base_url: str, api_key: str, payload: dict) -> Iterator[str]:
+    """chat completions를 SSE 스트림으로 직접 요청 (첨부 이미지는 StreamingJSONBody로 전송)"""
+    body = StreamingJSONBody({**payload, "stream": True})
+    headers = {"Authorization": f"Bearer {api_key}", "Accept": "text/event-stream", **body.headers()}
+    rate_limiter.wait("poe", "chat")
+    response = requests.post(f"{base_url}/chat/completions", headers=headers, data=body,
+                             stream=True, timeout=GENERATE_TIMEOUT)
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            event = json.loads(data)
+            if event.get("error"):
+                raise RuntimeError(f"스트림 오류: {event['error']}")
+            for choice in event.get("choices") or []:
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+    finally:
+        response.close()
+
+
+def scan_stream(deltas: Iterable[str], extensions: Tuple[str, ...] = IMAGE_EXTENSIONS) -> Tuple[Optional[str], str]:
+    """
+    스트림을 읽다가 미디어 URL이 완성되는 즉시 (url, 지금까지의 텍스트) 반환
+
+    URL을 찾으면 나머지 스트림은 읽지 않고 닫습니다. 끝까지 없으면 (None, 전체 텍스트)를 반환합니다.
+    """
+    scanner = MediaURLScanner(extensions)
+    iterator = iter(deltas)
+    try:
+        for delta in iterator:
+            url = scanner.feed(delta)
+            if url:
+                return url, scanner.text
+        return scanner.finish(), scanner.text
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
@@ -0,0 +1,711 @@
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import wait as wait_futures
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+import circuit_breaker
+import rate_limiter
+import tracing
+from apiBanana import BananaAPI
+from apiGemini import VeoAPI
+from apiHeygen import HeygenAPI
+from apiKlingAI import KlingAIAPI
+from apiKlingAI2 import KlingAI2API
+from apiOpenRouter import OpenRouterAPI
+from asset_host import get_asset_store
+from image_utils import compress_image_for_api
+from retry_policy import DOWNLOAD_POLICY, FATAL, PAYLOAD_TOO_LARGE, REQUEST_TIMEOUT, classify_failure
+from stream_body import Base64Source
+from task_ledger import get_task_ledger, task_key
+
+# 영상/이미지 생성 공급자 공통 인터페이스와 지연시간 기반 라우터
+#
+# 각 공급자 클라이언트(KlingAIAPI, KlingAI2API, Veo, BananaAPI, OpenRouter)를
+# VideoGenerator / ImageEnhancer 어댑터로 감싸고, ProviderRouter가 요청마다
+# 최근 p50/p95 지연시간, 오류율, 처리 중인 작업 수를 보고 가장 빠를 것으로 예상되는 공급자를 고릅니다.
+
+StatusCallback = Optional[Callable[[str], None]]
+
+# 사진 보정 요청에 공통으로 사용하는 문구 (HeyGen appearance, 이미지 편집 프롬프트)
+ENHANCE_APPEARANCE = "A headshot of a person with a gentle smile. Clean white background. Professional and warm expression."
+
+# 이미지 편집형 공급자(Banana, OpenRouter)에 보낼 때 인물 유지를 명시하는 프롬프트
+EDIT_PROMPT = "Retouch this photo while keeping the same person and identity. {prompt}"
+
+
+class ProviderError(Exception):
+    """공급자 호출 실패 (라우터는 fatal이 아니면 다음 공급자로 넘어감)"""
+
+    def __init__(self, provider: str, message: str, fatal: bool = False):
+        super().__init__(f"[{provider}] {message}")
+        self.provider = provider
+        self.message = message
+        self.fatal = fatal
+
+
+class ProviderCancelled(ProviderError):
+    """다른 공급자가 먼저 끝나 작업을 중단함 (실패 통계에 포함하지 않음)"""
+
+
+def _notify(on_status: StatusCallback, message: str):
+    if on_status:
+        on_status(message)
+    else:
+        print(message)
+
+
+def _remove_file(path: str):
+    """취소된 작업이 뒤늦게 저장한 결과 파일 삭제 (없으면 무시)"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _wait_or_cancel(cancel_event: Optional[threading.Event], seconds: float, provider: str):
+    """폴링 간격만큼 대기하되, 취소 요청이 오면 즉시 ProviderCancelled 발생"""
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise ProviderCancelled(provider, "다른 공급자가 먼저 완료되어 작업을 중단합니다.")
+
+
+def _download_to(url: str, file_path: str, provider: str = None):
+    """URL의 파일을 스트리밍으로 저장 (끊기면 처음부터 다시 받음)"""
+    def fetch():
+        response = requests.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        with open(file_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+        return file_path
+
+    with tracing.span("provider.download", provider=provider):
+        return DOWNLOAD_POLICY.call(fetch, description="다운로드")
+
+
+def _copy_result(source_path: str, output_dir: str, prefix: str) -> str:
+    """작업 원장에 남아 있는 이전 결과를 이번 작업용 새 파일로 복사 (원본은 다른 작업이 정리할 수 있으므로)"""
+    extension = os.path.splitext(source_path)[1]
+    file_path = os.path.join(output_dir, f"{prefix}_{uuid.uuid4()}{extension}")
+    shutil.copyfile(source_path, file_path)
+    return file_path
+
+
+_client_lock = threading.Lock()
+
+
+def _shared_client(adapter, factory: Callable):
+    """어댑터의 API 클라이언트를 처음 사용할 때 한 번만 만들어 재사용 (어댑터는 프로세스 공용 라우터에 속함)"""
+    with _client_lock:
+        client = adapter.__dict__.get("_api_client")
+        if client is None:
+            client = adapter._api_client = factory()
+        return client
+
+
+# --- 공통 인터페이스 ---
+
+class VideoGenerator:
+    """사진 한 장으로 짧은 모션 비디오를 만드는 공급자"""
+
+    name = "video"
+    expected_latency = 180.0  # 통계가 쌓이기 전 사용할 예상 소요 시간(초)
+    max_concurrency = 1       # 동시에 처리 가능한 작업 수 (대기열 길이 환산용)
+    cost_per_job = 1.0        # 작업당 예상 비용(USD), 헤징 비용 상한 계산용
+    fallback_only = False     # True면 다른 공급자가 모두 실패/차단됐을 때만 사용 (비싼 공급자)
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_video(self, image_path: str, prompt: str, output_dir: str = "temp",
+                       on_status: StatusCallback = None, cancel_event: Optional[threading.Event] = None) -> str:
+        """
+        비디오를 생성해 output_dir에 저장하고 파일 경로 반환 (실패 시 ProviderError)
+
+        cancel_event가 설정되면 폴링을 멈추고 ProviderCancelled를 발생시킵니다.
+        """
+        raise NotImplementedError
+
+
+class ImageEnhancer:
+    """사진을 보정/재생성하는 공급자"""
+
+    name = "image"
+    expected_latency = 60.0
+    max_concurrency = 1
+    fallback_only = False
+
+    def is_available(self) -> bool:
+        return True
+
+    def enhance_image(self, image_path: str, prompt: str, output_dir: str = "temp",
+                      on_status: StatusCallback = None) -> str:
+        """보정된 이미지를 output_dir에 저장하고 파일 경로 반환 (실패 시 ProviderError)"""
+        raise NotImplementedError
+
+
+# --- 비디오 생성 어댑터 ---
+
+class KlingVideoGenerator(VideoGenerator):
+    """KlingAI image2video (직접 API)"""
+
+    name = "kling"
+    expected_latency = 240.0
+    max_concurrency = 4
+    cost_per_job = 1.0
+
+    video_params = {"model_name": "kling-v2-1", "mode": "pro", "duration": "10", "cfg_scale": 0.5}
+
+    def __init__(self, ak: str, sk: str, max_wait: int = 600, interval: int = 15):
+        self.ak = ak
+        self.sk = sk
+        self.max_wait = max_wait
+        self.interval = interval
+
+    @property
+    def api(self) -> KlingAIAPI:
+        return _shared_client(self, lambda: KlingAIAPI(self.ak, self.sk))
+
+    def is_available(self) -> bool:
+        return bool(self.ak and self.sk)
+
+    def _prepare_image(self, image_path: str, on_status: StatusCallback):
+        """에셋 호스팅이 켜져 있으면 서명된 URL, 아니면 스트리밍 base64 소스 반환"""
+        compressed_img_data = compress_image_for_api(image_path)
+
+        asset_store = get_asset_store()
+        if asset_store:
+            # 에셋 호스팅 사용 시 서명된 URL만 전송 (요청 본문 수백 바이트)
+            try:
+                image_url = asset_store.publish(compressed_img_data, suffix=".jpg")
+                _notify(on_status, "전송할 이미지: 서명된 URL로 게시됨")
+                return image_url
+            except Exception as e:
+                _notify(on_status, f"이미지 게시 실패, base64로 전송합니다: {e}")
+
+        # base64 문자열은 만들지 않고, 전송 시점에 청크 단위로 인코딩
+        image_source = Base64Source(compressed_img_data)
+        base64_size_mb = image_source.encoded_size() / (1024 * 1024)
+        _notify(on_status, f"전송할 이미지 크기: {base64_size_mb:.2f}MB (base64)")
+
+        # Base64 크기가 너무 크면 더 압축
+        if base64_size_mb > 8:
+            compressed_img_data = compress_image_for_api(image_path, max_width=512, quality=50)
+            image_source = Base64Source(compressed_img_data)
+            _notify(on_status, f"재압축 후 크기: {image_source.encoded_size() / (1024 * 1024):.2f}MB (base64)")
+        return image_source
+
+    def submit(self, image_path: str, prompt: str, on_status: StatusCallback = None) -> str:
+        """작업을 제출하고 task_id 반환"""
+        klingai = self.api
+        image_source = self._prepare_image(image_path, on_status)
+        video_data = {**self.video_params, "image": image_source, "prompt": prompt}
+
+        with tracing.span("provider.submit", provider=self.name):
+            try:
+                init_response = klingai.generate_video(video_data)
+            except Exception as api_error:
+                if isinstance(image_source, str) or classify_failure(api_error) != PAYLOAD_TOO_LARGE:
+                    raise
+                _notify(on_status, "API 요청 크기 초과. 이미지를 더 압축하여 재시도합니다...")
+                # 최대 압축으로 재시도
+                video_data["image"] = Base64Source(compress_image_for_api(image_path, max_width=256, quality=30))
+                init_response = klingai.generate_video(video_data)
+
+        task_id = init_response.get("data", {}).get("task_id")
+        if not task_id:
+            raise ProviderError(self.name, f"생성 요청 실패: {init_response}")
+        return task_id
+
+    def wait_and_download(self, task_id: str, output_dir: str = "temp", on_status: StatusCallback = None,
+                          cancel_event: Optional[threading.Event] = None, ledger_id: str = None) -> str:
+        """작업 완료까지 폴링한 뒤 비디오를 내려받아 경로 반환 (ledger_id가 있으면 작업 원장 갱신)"""
+        klingai = self.api
+        ledger = get_task_ledger() if ledger_id else None
+        start_time = time.time()
+
+        while time.time() - start_time < self.max_wait:
+            with tracing.span("provider.poll", provider=self.name):
+                poll_data = klingai.check_task_status(task_id).get("data", {})
+            poll_status = poll_data.get("task_status")
+            _notify(on_status, f"KlingAI 상태: {poll_status}")
+
+            if poll_status == "succeed":
+                videos = poll_data.get("task_result", {}).get("videos", [])
+                if not videos:
+                    raise ProviderError(self.name, "비디오 정보가 응답에 포함되어 있지 않습니다.")
+                video_url = videos[0].get("url")
+                if ledger:
+                    ledger.mark_succeeded(ledger_id, video_url)
+                video_path = _download_to(video_url, os.path.join(output_dir, f"generated_video_{uuid.uuid4()}.mp4"),
+                                          self.name)
+                if ledger:
+                    ledger.mark_downloaded(ledger_id, video_path)
+                return video_path
+
+            if poll_status == "failed":
+                fail_msg = poll_data.get("task_status_msg", "실패 사유 알 수 없음")
+                if ledger:
+                    ledger.mark_failed(ledger_id, fail_msg)
+                raise ProviderError(self.name, f"생성 실패: {fail_msg}")
+
+            _wait_or_cancel(cancel_event, self.interval, self.name)
+
+        # 이 장면에 쓸 시간을 이미 다 썼으므로 다른 공급자로 다시 기다리지 않고 정적 클립으로 대체
+        raise ProviderError(self.name, f"최대 대기 시간({self.max_wait}s) 초과", fatal=True)
+
+    def generate_video(self, image_path: str, prompt: str, output_dir: str = "temp",
+                       on_status: StatusCallback = None, cancel_event: Optional[threading.Event] = None) -> str:
+        # 같은 사진/프롬프트로 이미 제출한 작업이 있으면 다시 제출(과금)하지 않음
+        ledger = get_task_ledger()
+        params_hash = task_key(self.name, image_path, prompt=prompt, **self.video_params) if ledger else None
+        entry = ledger.find(self.name, params_hash) if ledger else None
+        if entry and entry.has_local_result():
+            _notify(on_status, f"이전에 생성한 KlingAI 결과를 재사용합니다 (작업 ID: {entry.remote_id})")
+            return _copy_result(entry.result_path, output_dir, "generated_video")
+
+        # Kling 계정의 동시 작업 한도를 모든 세션/프로세스가 함께 지키도록 슬롯 확보
+        with rate_limiter.slot("kling"):
+            if entry:
+                task_id, ledger_id = entry.remote_id, entry.id
+                _notify(on_status, f"이전에 제출한 KlingAI 작업을 이어서 확인합니다: {task_id}")
+            else:
+                task_id = self.submit(image_path, prompt, on_status)
+                ledger_id = ledger.record_submitted(self.name, params_hash, task_id, photo=image_path) if ledger else None
+                _notify(on_status, f"KlingAI 작업 ID: {task_id}")
+            return self.wait_and_download(task_id, output_dir, on_status, cancel_event, ledger_id)
+
+
+class PoeKlingVideoGenerator(VideoGenerator):
+    """Poe에 호스팅된 KlingAI 봇 (DrRobertKlingVideo)"""
+
+    name = "poe_kling"
+    expected_latency = 300.0
+    max_concurrency = 2
+    cost_per_job = 1.0
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    @property
+    def api(self) -> KlingAI2API:
+        return _shared_client(self, lambda: KlingAI2API(api_key=self.api_key))
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def generate_video(self, image_path: str, prompt: str, output_dir: str = "temp",
+                       on_status: StatusCallback = None, cancel_event: Optional[threading.Event] = None) -> str:
+        # Poe 호출은 응답이 올 때까지 블로킹되므로 취소할 수 없음 (결과는 호출 측에서 무시)
+        klingai2 = self.api
+        result = klingai2.generate_and_download(prompt=prompt, output_dir=output_dir, image_path=image_path)
+        if not result["success"]:
+            raise ProviderError(self.name, result["message"])
+        return result["file_path"]
+
+
+class VeoVideoGenerator(VideoGenerator):
+    """Google Veo (google-genai generate_videos)"""
+
+    name = "veo"
+    expected_latency = 360.0
+    max_concurrency = 2
+    cost_per_job = 3.2  # 8초 x $0.40
+
+    def __init__(self, api_key: str, model: str = "veo-3.0-generate-preview", max_wait: int = 600, interval: int = 10,
+                 fallback_only: Optional[bool] = None):
+        self.api_key = api_key
+        self.model = model
+        self.max_wait = max_wait
+        self.interval = interval
+        # Kling보다 3배 이상 비싸므로 기본은 폴백 전용, VEO_PRIMARY=1이면 지연시간 경쟁에 참여
+        if fallback_only is None:
+            fallback_only = os.getenv("VEO_PRIMARY", "").lower() not in ("1", "true", "yes")
+        self.fallback_only = fallback_only
+
+    @property
+    def api(self) -> VeoAPI:
+        return _shared_client(self, lambda: VeoAPI(self.api_key, model=self.model))
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def generate_video(self, image_path: str, prompt: str, output_dir: str = "temp",
+                       on_status: StatusCallback = None, cancel_event: Optional[threading.Event] = None) -> str:
+        # 제출 후 상태 폴링과 다운로드는 apiGemini의 공용 폴러가 처리하고, 여기서는 완료만 기다림
+        veo = self.api
+        video_path = os.path.join(output_dir, f"veo_video_{uuid.uuid4()}.mp4")
+        with rate_limiter.slot("google"):
+            with tracing.span("provider.submit", provider=self.name):
+                future = veo.submit(prompt, image_bytes=compress_image_for_api(image_path), output_path=video_path,
+                                    max_wait=self.max_wait)
+            start_time = time.time()
+            while not wait_futures([future], timeout=self.interval).done:
+                if cancel_event is not None and cancel_event.is_set():
+                    if not future.cancel():
+                        # 이미 다운로드가 시작되어 취소되지 않으면, 저장이 끝난 뒤 아무도 쓰지 않을 파일 삭제
+                        future.add_done_callback(lambda _: _remove_file(video_path))
+                    raise ProviderCancelled(self.name, "다른 공급자가 먼저 완료되어 작업을 중단합니다.")
+                _notify(on_status, f"Veo 상태: processing ({time.time() - start_time:.0f}s)")
+            return future.result()
+
+
+# --- 이미지 보정 어댑터 ---
+
+class HeygenImageEnhancer(ImageEnhancer):
+    """HeyGen photo avatar 생성"""
+
+    name = "heygen"
+    expected_latency = 60.0
+    max_concurrency = 2
+
+    avatar_params = {
+        "age": "Late Middle Age",
+        "gender": "Person",
+        "ethnicity": "East Asian",
+        "orientation": "horizontal",
+        "pose": "half_body",
+        "style": "Realistic",
+    }
+
+    def __init__(self, api_key: str, max_wait: int = 300, interval: int = 5):
+        self.api_key = api_key
+        self.max_wait = max_wait
+        self.interval = interval
+
+    @property
+    def api(self) -> HeygenAPI:
+        return _shared_client(self, lambda: HeygenAPI(self.api_key))
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def enhance_image(self, image_path: str, prompt: str, output_dir: str = "temp",
+                      on_status: StatusCallback = None) -> str:
+        # 같은 사진/프롬프트로 이미 제출한 작업이 있으면 결과를 재사용하거나 폴링만 이어서 함
+        ledger = get_task_ledger()
+        params_hash = task_key(self.name, image_path, appearance=prompt, **self.avatar_params) if ledger else None
+        entry = ledger.find(self.name, params_hash) if ledger else None
+        if entry and entry.has_local_result():
+            _notify(on_status, f"이전에 보정한 HeyGen 결과를 재사용합니다 (생성 ID: {entry.remote_id})")
+            return _copy_result(entry.result_path, output_dir, "enhanced_image")
+
+        with rate_limiter.slot("heygen"):
+            heygen = self.api
+            if entry:
+                generation_id, ledger_id = entry.remote_id, entry.id
+                _notify(on_status, f"이전에 제출한 HeyGen 작업을 이어서 확인합니다: {generation_id}")
+            else:
+                generation_id = self._submit(heygen, image_path, prompt)
+                ledger_id = ledger.record_submitted(self.name, params_hash, generation_id, photo=image_path) if ledger else None
+            return self._wait_and_download(heygen, generation_id, output_dir, ledger_id)
+
+    def _submit(self, heygen: HeygenAPI, image_path: str, prompt: str) -> str:
+        with tracing.span("provider.submit", provider=self.name):
+            heygen_result = heygen.generate_avatar_photo(
+                image_path=image_path,
+                name=f"Person_{uuid.uuid4().hex[:8]}",
+                appearance=prompt,
+                **self.avatar_params
+            )
+
+        generation_id = (heygen_result.get("data") or {}).get("generation_id")
+        if not generation_id:
+            raise ProviderError(self.name, f"생성 요청 실패: {heygen_result.get('error') or heygen_result}")
+        return generation_id
+
+    def _wait_and_download(self, heygen: HeygenAPI, generation_id: str, output_dir: str, ledger_id: str = None) -> str:
+        ledger = get_task_ledger() if ledger_id else None
+        wait_time = 0
+        while wait_time < self.max_wait:
+            with tracing.span("provider.poll", provider=self.name):
+                status = heygen.check_generation_status(generation_id)
+            data = status.get("data") or {}
+            if data.get("status") == "success":
+                image_urls = data.get("image_url_list", [])
+                if not image_urls:
+                    raise ProviderError(self.name, "이미지 URL이 응답에 없습니다.")
+                if ledger:
+                    ledger.mark_succeeded(ledger_id, image_urls[0])
+                enhanced_image_path = _download_to(image_urls[0], os.path.join(output_dir, f"enhanced_image_{uuid.uuid4()}.jpg"),
+                                                   self.name)
+                if ledger:
+                    ledger.mark_downloaded(ledger_id, enhanced_image_path)
+                return enhanced_image_path
+            if data.get("status") == "failed":
+                if ledger:
+                    ledger.mark_failed(ledger_id, data.get("msg") or status)
+                raise ProviderError(self.name, f"생성 실패: {data.get('msg') or status}")
+            time.sleep(self.interval)
+            wait_time += self.interval
+
+        raise ProviderError(self.name, "생성 시간 초과")
+
+
+class BananaImageEnhancer(ImageEnhancer):
+    """Poe Gemini-2.5-Flash-Image (BananaAPI)"""
+
+    name = "banana"
+    expected_latency = 90.0
+    max_concurrency = 2
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    @property
+    def api(self) -> BananaAPI:
+        return _shared_client(self, lambda: BananaAPI(api_key=self.api_key))
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def enhance_image(self, image_path: str, prompt: str, output_dir: str = "temp",
+                      on_status: StatusCallback = None) -> str:
+        banana = self.api
+        result = banana.generate_and_download(prompt=EDIT_PROMPT.format(prompt=prompt), output_dir=output_dir, image_path=image_path)
+        if not result["success"]:
+            raise ProviderError(self.name, result["message"])
+        return result["file_path"]
+
+
+class OpenRouterImageEnhancer(ImageEnhancer):
+    """OpenRouter google/gemini-2.5-flash-image-preview"""
+
+    name = "openrouter_image"
+    expected_latency = 120.0
+    max_concurrency = 4
+
+    def __init__(self, api_key: str, model: str = "google/gemini-2.5-flash-image-preview"):
+        self.api_key = api_key
+        self.model = model
+
+    @property
+    def api(self) -> OpenRouterAPI:
+        return _shared_client(self, lambda: OpenRouterAPI(self.api_key, model=self.model))
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def enhance_image(self, image_path: str, prompt: str, output_dir: str = "temp",
+                      on_status: StatusCallback = None) -> str:
+        openrouter = self.api
+        paths = openrouter.generate_image_files(EDIT_PROMPT.format(prompt=prompt), image_path, output_dir,
+                                                filename_prefix="openrouter_image")
+        if not paths:
+            raise ProviderError(self.name, "응답에서 이미지를 찾을 수 없습니다.")
+        # 여러 장이 오면 첫 번째만 사용
+        for extra_path in paths[1:]:
+            os.remove(extra_path)
+        return paths[0]
+
+
+# --- 지연시간 기반 라우팅 ---
+
+class ProviderStats:
+    """공급자별 최근 지연시간, 오류율, 처리 중 작업 수 (스레드 안전)"""
+
+    def __init__(self, window: int = 50):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def cancel(self):
+        """취소된 작업은 지연시간/오류율에 반영하지 않음"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def finish(self, latency: float, success: bool):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._outcomes.append(success)
+            if success:
+                self._latencies.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))
+        return latencies[index]
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes)
+        if not outcomes:
+            return 0.0
+        return 1 - sum(outcomes) / len(outcomes)
+
+    def snapshot(self) -> dict:
+        return {
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "error_rate": self.error_rate,
+            "in_flight": self.in_flight,
+            "samples": self.samples,
+        }
+
+
+class ProviderRouter:
+    """
+    요청마다 예상 완료 시간이 가장 짧은 공급자를 선택
+
+    예상 시간 = (p50과 p95의 평균) x (1 + 처리 중 작업 수 / 동시 처리량) / (1 - 오류율)
+    통계가 min_samples개 미만이면 공급자의 expected_latency를 사용하고,
+    explore_rate 확률로 차순위 공급자를 골라 통계가 오래되지 않도록 합니다.
+    expected_latency 사전값은 기존 순서(비디오: Kling → Poe-Kling, 이미지: HeyGen → Banana → OpenRouter)가
+    처음에 그대로 유지되도록 정하며, fallback_only 공급자(기본 Veo)는 항상 나머지 공급자 뒤에 둡니다.
+    """
+
+    def __init__(self, providers: List, min_samples: int = 3, explore_rate: float = 0.05):
+        self.providers = [provider for provider in providers if provider.is_available()]
+        self.stats: Dict[str, ProviderStats] = {provider.name: ProviderStats() for provider in self.providers}
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+
+    def __bool__(self):
+        return bool(self.providers)
+
+    def expected_time(self, provider) -> float:
+        stats = self.stats[provider.name]
+        if stats.samples >= self.min_samples:
+            latency = (stats.percentile(0.5) + stats.percentile(0.95)) / 2
+        else:
+            latency = provider.expected_latency
+        queue_factor = 1 + stats.in_flight / max(1, provider.max_concurrency)
+        reliability = max(0.05, 1 - stats.error_rate)
+        return latency * queue_factor / reliability
+
+    def available(self, exclude=()) -> List:
+        """서킷 브레이커가 열려 있지 않은 공급자 목록"""
+        return [
+            provider for provider in self.providers
+            if provider.name not in exclude and not circuit_breaker.is_open(provider.name)
+        ]
+
+    def ranked(self, exclude=()) -> List:
+        """예상 완료 시간 순으로 정렬된 공급자 목록 (차단된 공급자 제외, 폴백 전용 공급자는 맨 뒤)"""
+        candidates = sorted(self.available(exclude), key=self.expected_time)
+        primary = [provider for provider in candidates if not provider.fallback_only]
+        fallback = [provider for provider in candidates if provider.fallback_only]
+        if len(primary) > 1 and random.random() < self.explore_rate:
+            primary[0], primary[1] = primary[1], primary[0]
+        # 차단 시간이 지난 공급자는 실제 요청으로 한 번 시험해 브레이커를 닫을 기회를 줌
+        ordered = []
+        for group in (primary, fallback):
+            probes = [provider for provider in group if circuit_breaker.is_probe_ready(provider.name)]
+            ordered += probes + [provider for provider in group if provider not in probes]
+        return ordered
+
+    def call(self, provider, method: str, *args, **kwargs):
+        """단일 공급자 호출 (통계 및 서킷 브레이커 기록 포함)"""
+        # 브레이커가 열려 있으면 네트워크 요청 없이 즉시 CircuitOpenError
+        circuit_breaker.before_call(provider.name)
+        stats = self.stats[provider.name]
+        stats.start()
+        start_time = time.time()
+        try:
+            # 공급자 호출 전체 (제출/폴링/다운로드 구간은 어댑터 안에서 따로 기록)
+            with tracing.span("provider.call", provider=provider.name, kind=method):
+                result = getattr(provider, method)(*args, **kwargs)
+        except ProviderCancelled:
+            stats.cancel()
+            circuit_breaker.release(provider.name)
+            raise
+        except Exception as e:
+            stats.finish(time.time() - start_time, success=False)
+            circuit_breaker.record_failure(provider.name, e)
+            raise
+        stats.finish(time.time() - start_time, success=True)
+        circuit_breaker.record_success(provider.name)
+        return result
+
+    def run(self, method: str, *args, on_status: StatusCallback = None, exclude=(), budget: Optional[float] = None,
+            **kwargs):
+        """
+        빠른 순서대로 공급자를 시도하고 첫 성공 결과 반환 (모두 실패 시 ProviderError)
+
+        콘텐츠 정책, risk control, 인증 오류처럼 다른 공급자로 보내도 결과가 같을 치명적 실패는
+        다음 공급자로 넘기지 않고 그대로 발생시킵니다. (호출 측이 정적 클립 등으로 대체)
+        budget을 주면 시도한 공급자의 cost_per_job 합계가 budget을 넘지 않는 공급자만 시도합니다.
+        """
+        errors = []
+        for provider in self.ranked(exclude):
+            if budget is not None:
+                if provider.cost_per_job > budget:
+                    errors.append(f"{provider.name}: 남은 비용 한도 ${budget:.2f} 초과 (${provider.cost_per_job:.2f})")
+                    continue
+                budget -= provider.cost_per_job
+            _notify(on_status, f"공급자 선택: {provider.name} (예상 {self.expected_time(provider):.0f}초)")
+            try:
+                return self.call(provider, method, *args, on_status=on_status, **kwargs)
+            except ProviderCancelled:
+                raise
+            except Exception as e:
+                if is_fatal(e):
+                    raise
+                errors.append(f"{provider.name}: {e}")
+                _notify(on_status, f"{provider.name} 실패, 다음 공급자를 시도합니다: {e}")
+        raise ProviderError("router", "; ".join(errors) or "사용 가능한 공급자가 없습니다.")
+
+    def snapshot(self) -> dict:
+        return {
+            name: {**stats.snapshot(), "circuit_open": circuit_breaker.is_open(name)}
+            for name, stats in self.stats.items()
+        }
+
+
+def is_fatal(error) -> bool:
+    """다음 공급자로 넘기지 말아야 할 실패인지 (차단된 공급자는 건너뛰기만 함)"""
+    if isinstance(error, circuit_breaker.CircuitOpenError):
+        return False
+    return getattr(error, "fatal", False) or classify_failure(error) == FATAL
+
+
+_routers: Dict[str, ProviderRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_video_router() -> ProviderRouter:
+    """환경 변수의 API 키로 구성한 프로세스 공용 비디오 라우터 (Veo는 VEO_ENABLED=1일 때만)"""
+    with _routers_lock:
+        if "video" not in _routers:
+            providers = [
+                KlingVideoGenerator(os.getenv("AK"), os.getenv("SK")),
+                PoeKlingVideoGenerator(os.getenv("POE_API_KEY")),
+            ]
+            # 작업당 비용이 Kling의 3배가 넘으므로 키가 있어도 명시적으로 켠 경우에만 사용
+            if os.getenv("VEO_ENABLED", "").lower() in ("1", "true", "yes"):
+                providers.append(VeoVideoGenerator(os.getenv("GOOGLE_API_KEY")))
+            _routers["video"] = ProviderRouter(providers)
+        return _routers["video"]
+
+
+def get_image_router() -> ProviderRouter:
+    """환경 변수의 API 키로 구성한 프로세스 공용 이미지 보정 라우터"""
+    with _routers_lock:
+        if "image" not in _routers:
+            _routers["image"] = ProviderRouter([
+                HeygenImageEnhancer(os.getenv("HEYGEN_API_KEY")),
+                BananaImageEnhancer(os.getenv("POE_API_KEY")),
+                OpenRouterImageEnhancer(os.getenv("OPENROUTER_API_KEY")),
+            ])
+        return _routers["image"]
@@ -0,0 +1,223 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# 공급자/엔드포인트별 토큰 버킷 레이트 리미터 (스레드, 프로세스 간 공유)
+#
+# 모든 클라이언트는 요청 직전에 wait(provider, endpoint)를 호출합니다.
+# 상태는 로컬 SQLite 파일에 저장되므로 여러 Streamlit 세션과 워커 프로세스가
+# 같은 버킷을 공유하며, 공급자 한도를 넘는 순간적인 몰림(burst)을 막습니다.
+# slot(provider, name)은 동시에 진행 중인 작업 수(예: Kling 동시 작업 한도)를 제한합니다.
+
+# (초당 요청 수, 버스트 크기)
+DEFAULT_RATES = {
+    ("heygen", "generate"): (0.5, 2),
+    ("heygen", "status"): (2.0, 4),
+    ("kling", "submit"): (1.0, 2),
+    ("kling", "status"): (4.0, 8),
+    ("poe", "chat"): (2.0, 4),
+    ("openrouter", "chat"): (5.0, 10),
+    ("google", "generate_videos"): (0.5, 2),
+    ("google", "operations"): (2.0, 4),
+}
+
+# 동시 진행 작업 수
+DEFAULT_CONCURRENCY = {
+    ("kling", "tasks"): 5,
+    ("heygen", "tasks"): 3,
+    ("google", "tasks"): 2,
+}
+
+# 슬롯을 쥔 프로세스는 LEASE_RENEW_INTERVAL마다 만료 시각을 연장하므로 작업이 아무리 길어도 슬롯이 유지되고,
+# 비정상 종료한 프로세스의 슬롯은 마지막 연장 후 LEASE_TTL이 지나면 풀림
+LEASE_TTL = 5 * 60
+LEASE_RENEW_INTERVAL = 60
+
+
+def _env_key(provider: str, endpoint: str) -> str:
+    return f"{provider}_{endpoint}".upper()
+
+
+class RateLimiter:
+    """SQLite에 상태를 두는 토큰 버킷 + 동시 작업 슬롯"""
+
+    def __init__(self, db_path: str = "temp/ratelimit.sqlite3", rates: Optional[Dict] = None,
+                 concurrency: Optional[Dict] = None):
+        self.db_path = db_path
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.concurrency = dict(DEFAULT_CONCURRENCY if concurrency is None else concurrency)
+        self._local = threading.local()
+        self._held = set()  # 이 프로세스가 쥐고 있는 슬롯 lease id (하트비트로 연장)
+        self._held_lock = threading.Lock()
+        self._heartbeat = None
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (id TEXT PRIMARY KEY, key TEXT, expires REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _rate(self, provider: str, endpoint: str):
+        # RATE_LIMIT_KLING_SUBMIT=0.5,1 형식으로 초당 요청 수와 버스트 크기 재정의
+        override = os.getenv(f"RATE_LIMIT_{_env_key(provider, endpoint)}")
+        if override:
+            rps, _, burst = override.partition(",")
+            return float(rps), float(burst or 1)
+        return self.rates.get((provider, endpoint))
+
+    def _max_concurrency(self, provider: str, name: str) -> Optional[int]:
+        override = os.getenv(f"CONCURRENCY_LIMIT_{_env_key(provider, name)}")
+        if override:
+            return int(override)
+        return self.concurrency.get((provider, name))
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def try_acquire(self, provider: str, endpoint: str) -> float:
+        """토큰을 하나 가져오면 0, 아니면 다음 토큰까지 기다려야 할 시간(초) 반환"""
+        rate = self._rate(provider, endpoint)
+        if not rate:
+            return 0.0
+        rps, burst = rate
+        key = f"{provider}:{endpoint}"
+
+        def take(conn):
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rps)
+            if tokens >= 1:
+                conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens - 1, now))
+                return 0.0
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens, now))
+            return (1 - tokens) / rps
+
+        return self._transaction(take)
+
+    def wait(self, provider: str, endpoint: str, timeout: Optional[float] = None):
+        """토큰을 얻을 때까지 대기 (timeout 초과 시 TimeoutError)"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            delay = self.try_acquire(provider, endpoint)
+            if delay <= 0:
+                return
+            if deadline is not None and time.time() + delay > deadline:
+                raise TimeoutError(f"{provider}:{endpoint} 요청 한도 대기 시간 초과")
+            time.sleep(delay)
+
+    def _try_lease(self, key: str, limit: int) -> Optional[str]:
+        def take(conn):
+            now = time.time()
+            conn.execute("DELETE FROM leases WHERE expires < ?", (now,))
+            (active,) = conn.execute("SELECT COUNT(*) FROM leases WHERE key = ?", (key,)).fetchone()
+            if active >= limit:
+                return None
+            lease_id = uuid.uuid4().hex
+            conn.execute("INSERT INTO leases VALUES (?, ?, ?)", (lease_id, key, now + LEASE_TTL))
+            return lease_id
+
+        return self._transaction(take)
+
+    def _release(self, lease_id: str):
+        with self._held_lock:
+            self._held.discard(lease_id)
+        self._transaction(lambda conn: conn.execute("DELETE FROM leases WHERE id = ?", (lease_id,)))
+
+    def _hold(self, lease_id: str):
+        """슬롯을 쥐고 있는 동안 하트비트 스레드가 만료 시각을 연장하도록 등록"""
+        with self._held_lock:
+            self._held.add(lease_id)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_leases, name="lease-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(LEASE_RENEW_INTERVAL)
+            with self._held_lock:
+                lease_ids = list(self._held)
+            if not lease_ids:
+                continue
+            expires = time.time() + LEASE_TTL
+            try:
+                self._transaction(lambda conn: conn.executemany(
+                    "UPDATE leases SET expires = ? WHERE id = ?", [(expires, lease_id) for lease_id in lease_ids]
+                ))
+            except sqlite3.Error as e:
+                print(f"슬롯 연장 실패 (다음 주기에 다시 시도): {e}")
+
+    @contextmanager
+    def slot(self, provider: str, name: str = "tasks", poll_interval: float = 1.0):
+        """동시 작업 수 한도 안에서 작업 하나를 수행하는 구간"""
+        limit = self._max_concurrency(provider, name)
+        if not limit:
+            yield
+            return
+        key = f"{provider}:{name}"
+        while (lease_id := self._try_lease(key, limit)) is None:
+            time.sleep(poll_interval)
+        self._hold(lease_id)
+        try:
+            yield
+        finally:
+            self._release(lease_id)
+
+    def snapshot(self) -> dict:
+        """현재 버킷 토큰 수와 사용 중인 슬롯 수"""
+        conn = self._connect()
+        now = time.time()
+        buckets = {key: round(tokens, 2) for key, tokens, _ in conn.execute("SELECT key, tokens, updated FROM buckets")}
+        leases = dict(conn.execute("SELECT key, COUNT(*) FROM leases WHERE expires >= ? GROUP BY key", (now,)).fetchall())
+        return {"buckets": buckets, "slots": leases}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """프로세스 공용 레이트 리미터 (RATE_LIMIT_ENABLED=0이면 None)"""
+    global _limiter
+    if os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(os.getenv("RATE_LIMIT_DB", "temp/ratelimit.sqlite3"))
+        return _limiter
+
+
+def wait(provider: str, endpoint: str):
+    """요청 직전에 호출: 공급자/엔드포인트 한도 안에서 차례가 올 때까지 대기"""
+    limiter = get_rate_limiter()
+    if limiter:
+        limiter.wait(provider, endpoint)
+
+
+@contextmanager
+def slot(provider: str, name: str = "tasks"):
+    """공급자의 동시 작업 수 한도를 지키는 구간"""
+    limiter = get_rate_limiter()
+    if not limiter:
+        yield
+        return
+    with limiter.slot(provider, name):
+        yield
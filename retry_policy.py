@@ -0,0 +1,178 @@
+import email.utils
+import random
+import re
+import time
+from typing import Callable, Optional
+
+# 공급자 클라이언트 공용 재시도 정책
+#
+# 실패를 재시도 가능(타임아웃, 429, 5xx), 치명적(인증, 콘텐츠 정책, risk control 등),
+# 요청 크기 초과(413)로 분류하고, 재시도 가능한 경우에만 지수 백오프 + 지터로 다시 시도합니다.
+# 서버가 Retry-After를 주면 그 시간을 따르며, 호출 하나에 전체 마감 시간(deadline)을 둡니다.
+
+RETRYABLE = "retryable"
+FATAL = "fatal"
+PAYLOAD_TOO_LARGE = "payload_too_large"
+
+_FATAL_PATTERN = re.compile(
+    r"risk control|content policy|safety|invalid.api.key|unauthori[sz]ed|forbidden|insufficient_quota|payment required",
+    re.IGNORECASE,
+)
+_PAYLOAD_PATTERN = re.compile(r"\b413\b|request entity too large|payload too large", re.IGNORECASE)
+
+# 연결/타임아웃 계열 예외 (requests / openai / httpx / 내장 예외, 클래스 이름으로 판별)
+_NETWORK_ERRORS = {"ConnectTimeout", "ConnectionError", "APIConnectionError", "ConnectError",
+                   "ReadTimeout", "Timeout", "APITimeoutError", "TimeoutException", "TimeoutError"}
+# 요청을 보내기 전, 연결 단계에서 난 실패 (서버가 요청을 받지 못했으므로 비멱등 호출도 재시도 가능)
+_CONNECT_PHASE_ERRORS = {"ConnectTimeout", "ConnectError", "ConnectTimeoutError", "NewConnectionError",
+                         "NameResolutionError", "ConnectionRefusedError", "gaierror"}
+
+
+class RetryableError(Exception):
+    """응답은 받았지만 결과가 불완전해 다시 시도할 만한 경우 (예: 응답에 미디어 URL 없음)"""
+
+    def __init__(self, message: str, content=None):
+        super().__init__(message)
+        self.content = content
+
+
+def _status_code(error) -> Optional[int]:
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if status_code is None:
+        # google-genai APIError는 HTTP 상태를 code에 담음
+        status_code = getattr(error, "code", None)
+    return status_code if isinstance(status_code, int) and 100 <= status_code < 600 else None
+
+
+def _is_connect_phase(error) -> bool:
+    """예외 체인(원인, requests가 감싼 urllib3 예외의 reason 포함)에 연결 단계 실패가 있는지"""
+    seen = set()
+    pending = [error]
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if {cls.__name__ for cls in type(current).__mro__} & _CONNECT_PHASE_ERRORS:
+            return True
+        pending += [current.__cause__, current.__context__, getattr(current, "reason", None)]
+        pending += [arg for arg in getattr(current, "args", ()) if isinstance(arg, BaseException)]
+    return False
+
+
+def classify_failure(error, idempotent: bool = True) -> str:
+    """
+    예외를 RETRYABLE / FATAL / PAYLOAD_TOO_LARGE로 분류
+
+    idempotent=False(작업 제출 등)이면 요청이 이미 서버에 도달했을 수 있는 실패(연결 끊김, 응답 대기 중
+    타임아웃, 408/500/502/504 등 5xx, 알 수 없는 오류)는 중복 제출과 이중 과금을 막기 위해 재시도하지 않고,
+    처리되지 않았음이 분명한 실패(연결 단계 실패, 429, Retry-After가 있는 503)만 재시도합니다.
+    """
+    if isinstance(error, RetryableError):
+        return RETRYABLE
+
+    status_code = _status_code(error)
+    if status_code is not None:
+        if status_code == 413:
+            return PAYLOAD_TOO_LARGE
+        if not idempotent:
+            # 서버가 요청을 거절했다고 명시한 경우만 다시 보냄 (그 외 5xx는 작업이 이미 만들어졌을 수 있음)
+            if status_code == 429 or (status_code == 503 and retry_after_seconds(error) is not None):
+                return RETRYABLE
+            if status_code >= 500 or status_code == 408:
+                return FATAL
+        if status_code in (408, 425, 429) or status_code >= 500:
+            return RETRYABLE
+        if 400 <= status_code < 500:
+            return FATAL
+
+    # 서킷 브레이커 차단, 취소 등 의도적인 실패는 재시도하지 않음
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & {"CircuitOpenError", "ProviderCancelled"}:
+        return FATAL
+
+    # requests / openai / httpx 예외는 클래스 이름으로 판별 (라이브러리 의존성 없이)
+    if names & _NETWORK_ERRORS:
+        return RETRYABLE if idempotent or _is_connect_phase(error) else FATAL
+
+    message = str(error)
+    if _PAYLOAD_PATTERN.search(message):
+        return PAYLOAD_TOO_LARGE
+    if _FATAL_PATTERN.search(message):
+        return FATAL
+    # 그 외 알 수 없는 오류는 재시도 (시도 횟수와 마감 시간으로 제한), 비멱등 호출은 중복 제출 위험이 있어 중단
+    return RETRYABLE if idempotent else FATAL
+
+
+def raise_for_retryable_status(response):
+    """본문에 오류를 담아 돌려주는 API용: 429/5xx만 예외로 바꿔 재시도 대상이 되게 함"""
+    if response.status_code in (408, 425, 429) or response.status_code >= 500:
+        response.raise_for_status()
+
+
+def retry_after_seconds(error) -> Optional[float]:
+    """응답의 Retry-After 헤더(초 또는 HTTP 날짜)를 초 단위로 변환"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """지수 백오프(full jitter) + Retry-After + 전체 마감 시간"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 deadline: Optional[float] = 120.0, idempotent: bool = True):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.idempotent = idempotent
+
+    def backoff(self, attempt: int, error=None) -> float:
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable, *args, description: str = "", **kwargs):
+        """fn을 정책에 따라 실행하고 결과 반환 (재시도 불가 또는 한도 초과 시 마지막 예외 발생)"""
+        start_time = time.time()
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_failure(e, self.idempotent)
+                attempt += 1
+                if kind != RETRYABLE or attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt - 1, e)
+                if self.deadline is not None and time.time() - start_time + delay > self.deadline:
+                    raise
+                print(f"{description or getattr(fn, '__name__', '요청')} 재시도 {attempt}/{self.max_attempts - 1} "
+                      f"({delay:.1f}초 후): {e}")
+                time.sleep(delay)
+
+
+# 용도별 기본 정책
+SUBMIT_POLICY = RetryPolicy(max_attempts=3, base_delay=2.0, deadline=60.0, idempotent=False)
+POLL_POLICY = RetryPolicy(max_attempts=5, base_delay=1.0, deadline=60.0)
+DOWNLOAD_POLICY = RetryPolicy(max_attempts=4, base_delay=1.0, deadline=300.0)
+# 생성 요청은 과금되므로 응답 대기 중 타임아웃은 재시도하지 않음
+GENERATE_POLICY = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=20.0, deadline=900.0, idempotent=False)
+
+# requests 호출 기본 타임아웃 (연결, 읽기)
+REQUEST_TIMEOUT = (10, 120)
+# 응답이 생성 완료 후에 오는 chat completions 호출용 (비디오는 수 분 걸림)
+GENERATE_TIMEOUT = (10, 600)
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import List, Optional
+
+import tracing
+
+# 장면 기술자(scene descriptor)
+#
+# 그래프 상태에는 moviepy 클립 대신 장면마다 아래와 같은 작은 dict만 저장합니다.
+#   {"index": 2, "image_index": 2, "duration": 9,
+#    "source": {"kind": "video", "path": "temp/....mp4", "fallback": False},
+#    "subtitle": {"text": "...", "style": "default", "position": ["center", 810], "hash": "..."}}
+# JSON으로 직렬화되므로 체크포인트에 저장하거나 다른 프로세스(렌더링 작업자)로 넘길 수 있고,
+# 실제 클립은 렌더링 단계에서 build_scene_clip()으로 장면마다 필요할 때 만듭니다.
+# 자막 이미지는 내용 해시로 temp/subtitle_cache에 캐시되어 다시 렌더링해도 새로 그리지 않습니다.
+
+FRAME_SIZE = (1920, 1080)
+SUBTITLE_CACHE_DIR = "temp/subtitle_cache"
+
+SUBTITLE_STYLES = {
+    "default": {
+        "font": "resources/font/movie-font.ttf",
+        "font_size": 40,
+        "color": "white",
+        "shadow_color": "black",
+        "shadow_offset": 5,
+    },
+}
+DEFAULT_SUBTITLE_POSITION = ("center", 810)
+
+# 스토리보드 image_index별 배경 영상
+THEME_CLIPS = {1: "resources/theme/t01.mp4", 4: "resources/theme/t04.mp4", 7: "resources/theme/ending.mp4"}
+FALLBACK_CLIP = "resources/theme/t01.mp4"
+# image_index -> 사용자 사진(생성 비디오) 순번
+PHOTO_SCENES = {2: 0, 3: 1, 5: 2, 6: 3}
+# 자막을 넣지 않는 장면 순서 (1부터)
+NO_SUBTITLE_SCENES = (1, 4, 7)
+
+
+def resolve_source(image_index: int, image_paths: List[str], generated_video_paths: List[str]) -> dict:
+    """장면의 배경 소스 결정: 테마 영상, 생성 비디오, 원본 사진 순 (없으면 기본 영상, fallback=True)"""
+    if image_index in THEME_CLIPS:
+        return {"kind": "video", "path": THEME_CLIPS[image_index], "fallback": False}
+    photo = PHOTO_SCENES.get(image_index)
+    if photo is not None:
+        if len(generated_video_paths) > photo and os.path.exists(generated_video_paths[photo]):
+            return {"kind": "video", "path": generated_video_paths[photo], "fallback": False}
+        if len(image_paths) > photo:
+            # 백업: 원본 이미지 사용
+            return {"kind": "image", "path": image_paths[photo], "fallback": False}
+    return {"kind": "video", "path": FALLBACK_CLIP, "fallback": True}
+
+
+def subtitle_hash(text: str, style: str, position) -> str:
+    """자막 이미지 캐시 키 (스타일 설정이 바뀌면 키도 바뀜)"""
+    material = json.dumps({"text": text, "style": SUBTITLE_STYLES[style], "position": list(position),
+                           "size": FRAME_SIZE}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+def make_subtitle(text: str, style: str = "default", position=DEFAULT_SUBTITLE_POSITION) -> dict:
+    if style not in SUBTITLE_STYLES:
+        raise ValueError(f"알 수 없는 자막 스타일: {style}")
+    return {"text": text, "style": style, "position": list(position),
+            "hash": subtitle_hash(text, style, position)}
+
+
+def make_scene(index: int, image_index: int, duration: float, source: dict,
+               subtitle: Optional[dict] = None) -> dict:
+    return {"index": index, "image_index": image_index, "duration": duration,
+            "source": source, "subtitle": subtitle}
+
+
+def render_subtitle_image(subtitle: dict, cache_dir: str = SUBTITLE_CACHE_DIR) -> str:
+    """자막을 투명 PNG로 그려 캐시 경로 반환 (이미 있으면 그대로 반환)"""
+    path = os.path.join(cache_dir, f"{subtitle['hash']}.png")
+    if os.path.exists(path):
+        return path
+
+    with tracing.span("subtitle.render", style=subtitle["style"]):
+        return _draw_subtitle(subtitle, cache_dir, path)
+
+
+def _draw_subtitle(subtitle: dict, cache_dir: str, path: str) -> str:
+    from moviepy import CompositeVideoClip, TextClip
+
+    style = SUBTITLE_STYLES[subtitle["style"]]
+    x, y = subtitle["position"]
+    text_clips = [
+        # 그림자 효과를 위해 같은 글자를 아래로 조금 밀어서 먼저 배치
+        TextClip(text=subtitle["text"], font_size=style["font_size"], color=color, font=style["font"],
+                 transparent=True).with_duration(1).with_position((x, y + offset), relative=False)
+        for color, offset in ((style["shadow_color"], style["shadow_offset"]), (style["color"], 0))
+    ]
+    composite = CompositeVideoClip(text_clips, size=FRAME_SIZE)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # 동시에 같은 자막을 그리는 작업이 있어도 완성된 파일만 보이도록 임시 파일에 쓰고 이름 변경
+    temp_path = os.path.join(cache_dir, f"{subtitle['hash']}.{uuid.uuid4().hex}.png")
+    try:
+        composite.save_frame(temp_path, t=0, with_mask=True)
+        os.replace(temp_path, path)
+    finally:
+        composite.close()
+        for clip in text_clips:
+            clip.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path
+
+
+def build_scene_clip(scene: dict):
+    """장면 기술자로 moviepy 클립 생성 (렌더링 단계에서만 호출)"""
+    from moviepy import CompositeVideoClip, ImageClip, VideoFileClip
+
+    source = scene["source"]
+    duration = scene["duration"]
+    if source["kind"] == "video":
+        clip = VideoFileClip(source["path"]).with_duration(duration)
+    else:
+        clip = ImageClip(source["path"]).with_duration(duration)
+    clip = clip.resized(height=FRAME_SIZE[1])
+
+    if scene.get("subtitle"):
+        overlay = ImageClip(render_subtitle_image(scene["subtitle"])).with_duration(duration)
+        clip = CompositeVideoClip([clip, overlay])
+    return clip
@@ -0,0 +1,122 @@
+import base64
+import io
+import json
+import os
+import uuid
+from typing import BinaryIO, Iterator, List, Union
+
+# 대용량 이미지를 포함한 JSON 요청 본문을 스트리밍으로 생성
+#
+# 파일 전체를 읽어 base64 문자열을 만들고 dict에 넣은 뒤 requests가 다시 직렬화하면
+# 이미지 한 장당 3~4개의 사본이 메모리에 동시에 존재하게 됩니다.
+# StreamingJSONBody는 JSON 골격만 미리 직렬화하고, 이미지 부분은 전송 시점에
+# 청크 단위로 읽어 base64 인코딩하므로 업로드당 최대 메모리가 청크 하나 수준으로 유지됩니다.
+
+# base64는 3바이트 단위로 패딩 없이 인코딩되므로 청크 크기는 3의 배수여야 합니다.
+CHUNK_SIZE = 3 * 64 * 1024
+
+
+class Base64Source:
+    """파일 경로, 바이트 또는 파일 객체를 base64 문자열 값으로 스트리밍하는 JSON 필드"""
+
+    def __init__(self, source: Union[str, bytes, bytearray, memoryview, BinaryIO], prefix: str = ""):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        self.source = source
+        self.prefix = prefix
+
+    def _open(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            return open(self.source, "rb"), True
+        # 재전송(리다이렉트, 재시도) 시에도 처음부터 읽을 수 있도록 되감기
+        self.source.seek(0)
+        return self.source, False
+
+    def raw_size(self) -> int:
+        """원본 데이터의 바이트 크기"""
+        if isinstance(self.source, (str, os.PathLike)):
+            return os.path.getsize(self.source)
+        position = self.source.tell()
+        self.source.seek(0, os.SEEK_END)
+        size = self.source.tell()
+        self.source.seek(position)
+        return size
+
+    def encoded_size(self) -> int:
+        """base64 인코딩 후의 길이 (prefix 제외)"""
+        return 4 * ((self.raw_size() + 2) // 3)
+
+    def iter_encoded(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """base64로 인코딩된 청크를 순서대로 반환"""
+        handle, should_close = self._open()
+        try:
+            while True:
+                chunk = handle.read(chunk_size)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk)
+        finally:
+            if should_close:
+                handle.close()
+
+
+class StreamingJSONBody:
+    """
+    Base64Source 필드를 포함한 dict를 JSON 바이트 스트림으로 직렬화
+
+    requests.post(url, data=StreamingJSONBody(payload)) 형태로 사용합니다.
+    __len__을 제공하므로 requests가 chunked 전송 대신 Content-Length를 설정합니다.
+    """
+
+    def __init__(self, payload: dict, chunk_size: int = CHUNK_SIZE):
+        if chunk_size % 3:
+            raise ValueError("chunk_size는 3의 배수여야 합니다.")
+        self.chunk_size = chunk_size
+        self._parts: List[Union[bytes, Base64Source]] = []
+        self._compile(payload)
+
+    def _compile(self, payload: dict):
+        # Base64Source를 고유한 자리표시자로 바꿔 골격만 직렬화한 뒤, 자리표시자 위치에서 분할
+        token = uuid.uuid4().hex
+        sources = []
+
+        def replace(value):
+            if isinstance(value, Base64Source):
+                sources.append(value)
+                return f"@@b64_{token}_{len(sources) - 1}@@"
+            if isinstance(value, dict):
+                return {key: replace(item) for key, item in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [replace(item) for item in value]
+            return value
+
+        skeleton = json.dumps(replace(payload), ensure_ascii=False)
+        for index, source in enumerate(sources):
+            placeholder = f"@@b64_{token}_{index}@@"
+            head, skeleton = skeleton.split(placeholder, 1)
+            self._parts.append((head + source.prefix).encode("utf-8"))
+            self._parts.append(source)
+        self._parts.append(skeleton.encode("utf-8"))
+
+    def __len__(self) -> int:
+        return sum(len(part) if isinstance(part, bytes) else part.encoded_size() for part in self._parts)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for part in self._parts:
+            if isinstance(part, bytes):
+                if part:
+                    yield part
+            else:
+                yield from part.iter_encoded(self.chunk_size)
+
+    def headers(self) -> dict:
+        return {"Content-Type": "application/json", "Content-Length": str(len(self))}
+
+    def to_bytes(self) -> bytes:
+        """디버깅 및 테스트용: 전체 본문을 한 번에 생성"""
+        return b"".join(self)
+
+
+def image_data_url_source(source: Union[str, bytes, BinaryIO], mime_type: str = "image/jpeg") -> Base64Source:
+    """OpenAI 호환 image_url 필드용 data URL 소스 생성"""
+    return Base64Source(source, prefix=f"data:{mime_type};base64,")
@@ -0,0 +1,387 @@
+import argparse
+import base64
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+# 공급자 대역 서버 (벤치마크/부하 테스트용, 실제 크레딧을 쓰지 않음)
+#
+#   uv run python stub_server.py --port 8700 --seed 42 --time-scale 0.1
+#
+# 클라이언트가 호출하는 엔드포인트를 흉내 냅니다.
+#   HeyGen      POST /v2/photo_avatar/photo/generate, GET /v2/photo_avatar/generation/{id}
+#   Kling       POST /v1/videos/image2video, GET /v1/videos/image2video/{task_id}
+#   OpenRouter  POST /api/v1/chat/completions (스토리보드 JSON, modalities에 image가 있으면 data URL 이미지)
+#   Poe         POST /v1/chat/completions (Gemini-2.5-Flash-Image는 이미지 URL, DrRobertKlingVideo는 영상 URL, stream 지원)
+#   결과 파일    GET /media/image.png, /media/video.mp4
+#   통계        GET /_stub/stats (경로별 요청 수, 실패 수)
+#
+# 클라이언트는 아래 환경 변수로 이 서버를 가리킵니다.
+#   HEYGEN_BASE_URL=http://127.0.0.1:8700/v2/photo_avatar
+#   KLING_BASE_URL=http://127.0.0.1:8700/v1
+#   OPENROUTER_BASE_URL=http://127.0.0.1:8700/api/v1
+#   POE_BASE_URL=http://127.0.0.1:8700/v1
+#   GOOGLE_API_KEY=            (Veo는 google-genai 클라이언트라 대역이 없으므로 키를 비워 사용하지 않음)
+#
+# 경로별 지연 분포와 실패율은 --profile JSON으로 바꿀 수 있습니다. (DEFAULT_PROFILE 참고)
+# 지연은 경로별 n번째 요청마다 (seed, 경로, n)으로 정해지므로 같은 설정이면 실행마다 같은 분포가 나옵니다.
+# "*.processing"은 제출 후 작업이 끝날 때까지의 시간이며, 실패율만큼 작업이 failed로 끝납니다.
+
+DEFAULT_PROFILE = {
+    "heygen.submit": {"latency": "lognormal:1.0,0.3"},
+    "heygen.poll": {"latency": "lognormal:0.2,0.3"},
+    "heygen.processing": {"latency": "lognormal:40,0.3"},
+    "kling.submit": {"latency": "lognormal:1.5,0.3"},
+    "kling.poll": {"latency": "lognormal:0.3,0.3"},
+    "kling.processing": {"latency": "lognormal:120,0.4"},
+    "openrouter.chat": {"latency": "lognormal:6,0.4"},
+    "openrouter.image": {"latency": "lognormal:15,0.4"},
+    "poe.image": {"latency": "lognormal:25,0.4"},
+    "poe.video": {"latency": "lognormal:180,0.4"},
+    "media": {"latency": "fixed:0.05"},
+}
+
+DEFAULT_VIDEO = "resources/theme/t04.mp4"
+STREAM_CHUNK_CHARS = 16
+
+
+def parse_latency(spec: str):
+    """지연 분포 문자열을 (rng -> 초) 함수로: fixed:s, uniform:a,b, normal:mean,sd, lognormal:median,sigma, exp:mean"""
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"알 수 없는 지연 분포: {spec}")
+
+
+class StubProfile:
+    """경로별 지연 분포와 실패율 (경로별 n번째 요청의 값은 seed로 고정)"""
+
+    def __init__(self, routes: dict, seed: int = 0, time_scale: float = 1.0):
+        self.seed = seed
+        self.time_scale = time_scale
+        self.routes = {}
+        for name, config in {**DEFAULT_PROFILE, **routes}.items():
+            self.routes[name] = {
+                "latency": parse_latency(config.get("latency", "fixed:0")),
+                "failure_rate": float(config.get("failure_rate", 0.0)),
+                "failure_status": int(config.get("failure_status", 500)),
+            }
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def draw(self, route: str):
+        """(지연 초, 실패 여부, 실패 시 HTTP 상태) 반환"""
+        with self._lock:
+            self._counters[route] += 1
+            count = self._counters[route]
+        rng = random.Random(f"{self.seed}:{route}:{count}")
+        config = self.routes[route]
+        return config["latency"](rng) * self.time_scale, rng.random() < config["failure_rate"], config["failure_status"]
+
+
+def _default_image() -> bytes:
+    from PIL import Image
+
+    image = Image.new("RGB", (1024, 1024), (214, 196, 176))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _script_lines(messages: List[dict]) -> List[str]:
+    """스토리보드 요청의 사용자 메시지에서 스크립트 줄 추출"""
+    for message in reversed(messages):
+        content = message.get("content")
+        if message.get("role") == "user" and isinstance(content, str):
+            return [line.strip() for line in content.split("사용자 스크립트:", 1)[-1].splitlines() if line.strip()]
+    return []
+
+
+class StubState:
+    def __init__(self, profile: StubProfile, image: bytes, video: bytes):
+        self.profile = profile
+        self.image = image
+        self.video = video
+        self.tasks = {}
+        self.stats = defaultdict(lambda: {"requests": 0, "failures": 0})
+        self._lock = threading.Lock()
+
+    def count(self, route: str, failed: bool = False):
+        with self._lock:
+            self.stats[route]["requests"] += 1
+            if failed:
+                self.stats[route]["failures"] += 1
+
+    def create_task(self, kind: str) -> str:
+        """제출된 작업: processing 분포만큼 지난 뒤 완료(또는 실패)"""
+        seconds, failed, _ = self.profile.draw(f"{kind}.processing")
+        task_id = uuid.uuid4().hex
+        with self._lock:
+            self.tasks[task_id] = {"ready_at": time.time() + seconds, "failed": failed}
+        return task_id
+
+    def task_status(self, task_id: str) -> Optional[str]:
+        with self._lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if time.time() < task["ready_at"]:
+            return "processing"
+        return "failed" if task["failed"] else "succeed"
+
+
+_HEYGEN_STATUS = re.compile(r"^/v2/photo_avatar/generation/([0-9a-f]+)$")
+_KLING_STATUS = re.compile(r"^/v1/videos/image2video/([0-9a-f]+)$")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubState = None
+
+    def _base_url(self) -> str:
+        return f"http://{self.headers.get('Host') or '%s:%s' % self.server.server_address}"
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload: dict, status: int = 200):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    def _simulate(self, route: str) -> bool:
+        """경로의 지연만큼 기다리고, 실패로 정해졌으면 오류 응답 후 False"""
+        seconds, failed, status = self.state.profile.draw(route)
+        time.sleep(seconds)
+        self.state.count(route, failed)
+        if failed:
+            self._send_json({"error": {"message": f"stub failure ({route})", "code": status}}, status)
+        return not failed
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/_stub/stats":
+            return self._send_json(dict(self.state.stats))
+        if path in ("/media/image.png", "/media/video.mp4"):
+            if not self._simulate("media"):
+                return
+            if path.endswith(".png"):
+                return self._send(200, self.state.image, "image/png")
+            return self._send(200, self.state.video, "video/mp4")
+
+        match = _HEYGEN_STATUS.match(path)
+        if match:
+            if not self._simulate("heygen.poll"):
+                return
+            status = self.state.task_status(match.group(1))
+            if status is None:
+                return self._send_json({"error": "generation not found"}, 404)
+            data = {"id": match.group(1), "status": {"succeed": "success"}.get(status, status)}
+            if status == "succeed":
+                data["image_url_list"] = [f"{self._base_url()}/media/image.png"]
+            if status == "failed":
+                data["msg"] = "stub generation failed"
+            return self._send_json({"error": None, "data": data})
+
+        match = _KLING_STATUS.match(path)
+        if match:
+            if not self._simulate("kling.poll"):
+                return
+            status = self.state.task_status(match.group(1))
+            if status is None:
+                return self._send_json({"code": 1201, "message": "task not found"}, 404)
+            data = {"task_id": match.group(1), "task_status": status}
+            if status == "succeed":
+                data["task_result"] = {"videos": [{"id": uuid.uuid4().hex, "url": f"{self._base_url()}/media/video.mp4",
+                                                   "duration": "5"}]}
+            if status == "failed":
+                data["task_status_msg"] = "stub task failed"
+            return self._send_json({"code": 0, "message": "SUCCEED", "data": data})
+
+        self._send_json({"error": f"unknown path: {path}"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        payload = self._read_json()
+        if path == "/v2/photo_avatar/photo/generate":
+            if self._simulate("heygen.submit"):
+                self._send_json({"error": None, "data": {"generation_id": self.state.create_task("heygen")}})
+        elif path == "/v1/videos/image2video":
+            if self._simulate("kling.submit"):
+                task_id = self.state.create_task("kling")
+                self._send_json({"code": 0, "message": "SUCCEED",
+                                 "data": {"task_id": task_id, "task_status": "submitted"}})
+        elif path == "/api/v1/chat/completions":
+            self._openrouter_chat(payload)
+        elif path == "/v1/chat/completions":
+            self._poe_chat(payload)
+        else:
+            self._send_json({"error": f"unknown path: {path}"}, 404)
+
+    def _openrouter_chat(self, payload: dict):
+        if "image" in (payload.get("modalities") or []):
+            if not self._simulate("openrouter.image"):
+                return
+            data_url = "data:image/png;base64," + base64.b64encode(self.state.image).decode("ascii")
+            message = {"role": "assistant", "content": "",
+                       "images": [{"type": "image_url", "image_url": {"url": data_url}}]}
+        else:
+            if not self._simulate("openrouter.chat"):
+                return
+            lines = _script_lines(payload.get("messages") or []) or [""] * 7
+            storyboard = [{"image_index": index + 1, "duration": 0, "subtitle": line}
+                          for index, line in enumerate(lines[:7])]
+            message = {"role": "assistant", "content": json.dumps({"storyboard": storyboard}, ensure_ascii=False)}
+        self._send_completion(payload, message)
+
+    def _poe_chat(self, payload: dict):
+        if "Video" in (payload.get("model") or ""):
+            route, media_path = "poe.video", "/media/video.mp4"
+        else:
+            route, media_path = "poe.image", "/media/image.png"
+        if not self._simulate(route):
+            return
+        content = f"완성되었습니다.\n\n![result]({self._base_url()}{media_path})"
+        if payload.get("stream"):
+            return self._send_stream(payload, content)
+        self._send_completion(payload, {"role": "assistant", "content": content})
+
+    def _send_completion(self, payload: dict, message: dict):
+        self._send_json({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model") or "stub",
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _send_stream(self, payload: dict, content: str):
+        """SSE chat.completion.chunk 스트림 (연결 종료로 끝을 알림)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": payload.get("model") or "stub",
+                     "choices": [{"index": 0, "delta": {"content": content[start:start + STREAM_CHUNK_CHARS]},
+                                  "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8700, profile: Optional[StubProfile] = None,
+                image_path: Optional[str] = None, video_path: Optional[str] = None) -> ThreadingHTTPServer:
+    """대역 서버 생성 (port=0이면 빈 포트, 벤치마크에서 같은 프로세스로 띄울 때 사용)"""
+    if image_path:
+        with open(image_path, "rb") as f:
+            image = f.read()
+    else:
+        image = _default_image()
+    with open(video_path or DEFAULT_VIDEO, "rb") as f:
+        video = f.read()
+
+    state = StubState(profile or StubProfile({}), image, video)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# 대역 서버로 돌릴 클라이언트의 주소 환경 변수와 경로
+STUB_BASE_URLS = {
+    "HEYGEN_BASE_URL": "/v2/photo_avatar",
+    "KLING_BASE_URL": "/v1",
+    "OPENROUTER_BASE_URL": "/api/v1",
+    "POE_BASE_URL": "/v1",
+}
+STUB_API_KEYS = ("AK", "SK", "HEYGEN_API_KEY", "POE_API_KEY", "OPENROUTER_API_KEY")
+# 대역이 없는 공급자의 키 (비워 두면 라우터에서 빠짐)
+UNSTUBBED_API_KEYS = ("GOOGLE_API_KEY",)
+
+
+def stub_env(base_url: str) -> dict:
+    """
+    클라이언트를 대역 서버로 향하게 하는 환경 변수 (API 키는 비어 있으면 임의 값)
+
+    대역이 없는 공급자의 키는 빈 문자열로 덮어씁니다. 작업자의 load_dotenv()는 이미 있는 환경 변수를
+    바꾸지 않으므로 .env의 실제 키가 다시 들어오지 않습니다.
+    """
+    return {
+        **{key: f"{base_url}{path}" for key, path in STUB_BASE_URLS.items()},
+        **{key: os.getenv(key) or "stub" for key in STUB_API_KEYS},
+        **{key: "" for key in UNSTUBBED_API_KEYS},
+    }
+
+
+def real_providers(base_url: str, env: dict) -> List[str]:
+    """env로 실행한 프로세스가 대역 서버 대신 실제 공급자에 요청할 수 있게 만드는 설정 목록 (비어 있으면 안전)"""
+    leaks = [f"{key}={env.get(key) or '(기본 주소)'}" for key in STUB_BASE_URLS
+             if not (env.get(key) or "").startswith(base_url)]
+    leaks += [key for key in UNSTUBBED_API_KEYS if env.get(key)]
+    return leaks
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="공급자 대역 서버 (벤치마크/부하 테스트용)")
+    parser.add_argument("--host", default="127.0.0.1", help="바인딩 주소")
+    parser.add_argument("--port", type=int, default=8700, help="포트")
+    parser.add_argument("--profile", help="경로별 지연 분포/실패율 JSON 파일 (DEFAULT_PROFILE을 덮어씀)")
+    parser.add_argument("--seed", type=int, default=0, help="지연/실패 난수 시드")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="모든 지연에 곱할 배율 (0.1이면 10배 빠르게)")
+    parser.add_argument("--image", help="보정 결과로 돌려줄 이미지 (기본값: 단색 PNG)")
+    parser.add_argument("--video", default=DEFAULT_VIDEO, help="영상 생성 결과로 돌려줄 mp4")
+    args = parser.parse_args(argv)
+
+    routes = {}
+    if args.profile:
+        with open(args.profile, "r", encoding="utf-8") as f:
+            routes = json.load(f)
+    server = make_server(args.host, args.port, StubProfile(routes, args.seed, args.time_scale), args.image, args.video)
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"공급자 대역 서버 시작: {base_url}")
+    for key, value in stub_env(base_url).items():
+        if key in STUB_BASE_URLS or key in UNSTUBBED_API_KEYS:
+            print(f"  export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
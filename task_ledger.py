@@ -0,0 +1,180 @@
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+# 공급자에 제출한 유료 작업 기록 (SQLite)
+#
+# Kling task_id, HeyGen generation_id 등을 제출 즉시 디스크에 기록합니다.
+# Streamlit 재시작, 브라우저 연결 끊김, 프로세스 비정상 종료 후 같은 사진과 같은 파라미터로
+# 다시 요청하면 새로 제출하지 않고 기존 작업의 폴링을 이어 가거나, 이미 받은 결과를 재사용합니다.
+# 작업 키(params_hash)는 사진 파일 내용의 해시와 요청 파라미터로 만들므로 임시 파일 이름이 달라도 같습니다.
+
+SUBMITTED = "submitted"
+SUCCEEDED = "succeeded"
+DOWNLOADED = "downloaded"
+FAILED = "failed"
+
+# 이보다 오래된 미완료 작업은 이어 받지 않고 새로 제출 (공급자 쪽 작업/URL 만료 대비)
+RESUME_WINDOW = 24 * 60 * 60
+
+_current_job = contextvars.ContextVar("task_ledger_job", default=None)
+
+
+@contextmanager
+def job_context(job_id: str):
+    """이 구간에서 제출되는 작업을 job_id로 기록"""
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def file_digest(path: str) -> str:
+    """파일 내용의 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def task_key(provider: str, image_path: str, **params) -> str:
+    """공급자 + 사진 내용 + 파라미터로 작업 키 생성"""
+    material = json.dumps({"provider": provider, "photo": file_digest(image_path), "params": params},
+                          sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LedgerEntry:
+    def __init__(self, row: sqlite3.Row):
+        self.id = row["id"]
+        self.job_id = row["job_id"]
+        self.provider = row["provider"]
+        self.photo = row["photo"]
+        self.params_hash = row["params_hash"]
+        self.remote_id = row["remote_id"]
+        self.status = row["status"]
+        self.result_url = row["result_url"]
+        self.result_path = row["result_path"]
+        self.error = row["error"]
+        self.created = row["created"]
+        self.updated = row["updated"]
+
+    def has_local_result(self) -> bool:
+        return self.status == DOWNLOADED and bool(self.result_path) and os.path.exists(self.result_path)
+
+    def is_resumable(self) -> bool:
+        return self.status in (SUBMITTED, SUCCEEDED) and time.time() - self.created < RESUME_WINDOW
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class TaskLedger:
+    """제출한 공급자 작업의 상태와 결과 위치를 SQLite에 보관"""
+
+    def __init__(self, db_path: str = "temp/task_ledger.sqlite3"):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                job_id TEXT,
+                provider TEXT NOT NULL,
+                photo TEXT,
+                params_hash TEXT NOT NULL,
+                remote_id TEXT,
+                status TEXT NOT NULL,
+                result_url TEXT,
+                result_path TEXT,
+                error TEXT,
+                created REAL,
+                updated REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS tasks_lookup ON tasks (provider, params_hash, created)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def find(self, provider: str, params_hash: str) -> Optional[LedgerEntry]:
+        """같은 작업 키의 가장 최근 작업 중 재사용 또는 이어 받기 가능한 것"""
+        rows = self._connect().execute(
+            "SELECT * FROM tasks WHERE provider = ? AND params_hash = ? AND status != ? ORDER BY created DESC",
+            (provider, params_hash, FAILED)
+        ).fetchall()
+        for row in rows:
+            entry = LedgerEntry(row)
+            if entry.has_local_result() or entry.is_resumable():
+                return entry
+        return None
+
+    def record_submitted(self, provider: str, params_hash: str, remote_id: str, photo: str = None,
+                         job_id: str = None) -> str:
+        """제출 직후 호출: 공급자 작업 ID 기록 후 원장 항목 ID 반환"""
+        entry_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO tasks (id, job_id, provider, photo, params_hash, remote_id, status, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry_id, job_id or _current_job.get(), provider, photo, params_hash, remote_id, SUBMITTED, now, now)
+        )
+        return entry_id
+
+    def _update(self, entry_id: str, **fields):
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(f"UPDATE tasks SET {assignments} WHERE id = ?", (*fields.values(), entry_id))
+
+    def mark_succeeded(self, entry_id: str, result_url: str):
+        self._update(entry_id, status=SUCCEEDED, result_url=result_url)
+
+    def mark_downloaded(self, entry_id: str, result_path: str):
+        self._update(entry_id, status=DOWNLOADED, result_path=os.path.abspath(result_path))
+
+    def mark_failed(self, entry_id: str, error: str):
+        self._update(entry_id, status=FAILED, error=str(error)[:500])
+
+    def pending(self) -> List[LedgerEntry]:
+        """아직 결과를 받지 못한 작업 목록 (재시작 후 확인용)"""
+        rows = self._connect().execute(
+            "SELECT * FROM tasks WHERE status IN (?, ?) AND created > ? ORDER BY created",
+            (SUBMITTED, SUCCEEDED, time.time() - RESUME_WINDOW)
+        ).fetchall()
+        return [LedgerEntry(row) for row in rows]
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        rows = self._connect().execute("SELECT * FROM tasks ORDER BY updated DESC LIMIT ?", (limit,)).fetchall()
+        return [LedgerEntry(row).to_dict() for row in rows]
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_task_ledger() -> Optional[TaskLedger]:
+    """프로세스 공용 작업 원장 (TASK_LEDGER_ENABLED=0이면 None)"""
+    global _ledger
+    if os.getenv("TASK_LEDGER_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TaskLedger(os.getenv("TASK_LEDGER_DB", "temp/task_ledger.sqlite3"))
+        return _ledger
@@ -0,0 +1,389 @@
+import argparse
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import circuit_breaker
+
+# 구간(span) 계측: 작업 시간이 어디에 쓰이는지 기록
+#
+#   with tracing.trace(job_id):                      # 작업 하나 (끝나면 temp/traces/<job_id>_<시각>.json)
+#       with tracing.span("provider.poll", provider="kling"):
+#           ...
+#
+# 그래프 노드, 공급자 제출/폴링/다운로드, 이미지 압축, 자막 그리기, 장면 클립 구성, 인코딩을 계측합니다.
+# TRACING_ENABLED=1일 때만 기록하며, 꺼져 있으면 span()은 미리 만든 빈 구간을 돌려주므로 비용이 거의 없습니다.
+# 구간 이름과 레이블별 소요 시간 히스토그램은 작업이 끝날 때 SQLite(TRACING_DB)에 합산되어
+# 여러 작업자 프로세스의 값을 http_api의 /metrics(또는 python tracing.py --port)에서 Prometheus 형식으로 내보냅니다.
+
+# 히스토그램 구간 경계(초): 이미지 압축(ms 단위)부터 공급자 폴링/인코딩(분 단위)까지
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# 히스토그램 레이블로 쓰는 속성 (그 외 속성은 JSON 추적에만 남김)
+LABEL_KEYS = ("stage", "provider", "kind")
+METRIC_NAME = "nowagift_span_seconds"
+CIRCUIT_STATE_METRIC = "nowagift_circuit_state"
+CIRCUIT_FAILURES_METRIC = "nowagift_circuit_failures"
+# 브레이커 상태 게이지 값 (0=닫힘, 1=시험 호출, 2=열림)
+CIRCUIT_STATE_VALUES = {circuit_breaker.CLOSED: 0, circuit_breaker.HALF_OPEN: 1, circuit_breaker.OPEN: 2}
+
+_enabled = os.getenv("TRACING_ENABLED", "0").lower() in ("1", "true", "yes")
+_span_ids = itertools.count(1)
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True):
+    """환경 변수 대신 코드에서 계측 켜기/끄기 (벤치마크 등)"""
+    global _enabled
+    _enabled = on
+
+
+class _NoopSpan:
+    """계측이 꺼져 있을 때 쓰는 빈 구간 (모든 호출이 공유)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def fail(self, message: str):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Histogram:
+    """구간 소요 시간 히스토그램 (누적 전 구간별 개수)"""
+
+    def __init__(self, counts: Optional[List[int]] = None, total: float = 0.0, count: int = 0):
+        self.counts = counts or [0] * (len(BUCKETS) + 1)
+        self.total = total
+        self.count = count
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.id = next(_span_ids)
+        self.parent = None
+        self.start = 0.0
+        self.seconds = 0.0
+        self.error = None
+        self._started = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, message: str):
+        """예외 없이 실패로 끝난 구간 표시 (오류 메시지를 상태로 돌려주는 에이전트 등)"""
+        self.error = message
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self.id)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _record(self)
+        return False
+
+    def labels(self) -> Tuple[Tuple[str, str], ...]:
+        labels = [("span", self.name)]
+        labels += [(key, str(self.attrs[key])) for key in LABEL_KEYS if self.attrs.get(key) is not None]
+        labels.append(("outcome", "error" if self.error else "ok"))
+        return tuple(labels)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "parent": self.parent, "name": self.name, "start": round(self.start, 6),
+                "seconds": round(self.seconds, 6), "error": self.error, **({"attrs": self.attrs} if self.attrs else {})}
+
+
+class Trace:
+    """작업 하나의 구간 목록"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.start = time.time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {"job_id": self.job_id, "start": self.start, "seconds": round(time.time() - self.start, 3),
+                "spans": [span.to_dict() for span in spans]}
+
+
+# 이 프로세스에서 아직 저장소에 합산하지 않은 히스토그램
+_pending: Dict[Tuple, Histogram] = {}
+_pending_lock = threading.Lock()
+
+
+def _record(span: Span):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(span)
+    with _pending_lock:
+        _pending.setdefault(span.labels(), Histogram()).observe(span.seconds)
+
+
+def span(name: str, **attrs):
+    """계측 구간 (꺼져 있으면 빈 구간)"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+class _TraceContext:
+    def __init__(self, job_id: str, trace_dir: Optional[str]):
+        self.job_id = job_id
+        self.trace_dir = trace_dir
+        self.trace = None
+        self._token = None
+
+    def __enter__(self):
+        if _enabled:
+            self.trace = Trace(self.job_id)
+            self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        _current_trace.reset(self._token)
+        try:
+            save_trace(self.trace, self.trace_dir)
+            flush()
+        except Exception as e:
+            # 계측 실패가 작업 결과를 바꾸지 않도록
+            print(f"추적 기록 저장 실패: {e}")
+        return False
+
+
+def trace(job_id: str, trace_dir: Optional[str] = None):
+    """작업 하나의 구간을 모아 끝날 때 JSON으로 저장하고 히스토그램을 합산"""
+    return _TraceContext(job_id, trace_dir)
+
+
+def _trace_dir(trace_dir: Optional[str] = None) -> str:
+    return trace_dir or os.getenv("TRACE_DIR", "temp/traces")
+
+
+def save_trace(trace: Trace, trace_dir: Optional[str] = None) -> str:
+    directory = _trace_dir(trace_dir)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{trace.job_id}_{int(trace.start)}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+    return path
+
+
+def load_traces(job_id: str, trace_dir: Optional[str] = None) -> List[dict]:
+    """작업의 추적 기록 (이어하기로 여러 번 실행되었으면 실행 순서대로)"""
+    directory = _trace_dir(trace_dir)
+    if not os.path.isdir(directory):
+        return []
+    prefix = f"{job_id}_"
+    traces = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(prefix) and name[len(prefix):-len(".json")].isdigit():
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                traces.append(json.load(f))
+    return sorted(traces, key=lambda trace: trace["start"])
+
+
+class MetricsStore:
+    """프로세스별 히스토그램을 합산해 보관 (여러 작업자 프로세스가 공유)"""
+
+    def __init__(self, db_path: str = "temp/metrics.sqlite3"):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS histograms (
+                labels TEXT PRIMARY KEY,
+                counts TEXT NOT NULL,
+                total REAL NOT NULL,
+                count INTEGER NOT NULL
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add(self, histograms: Dict[Tuple, Histogram]):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for labels, histogram in histograms.items():
+                key = json.dumps(labels)
+                row = conn.execute("SELECT * FROM histograms WHERE labels = ?", (key,)).fetchone()
+                if row is not None:
+                    stored = Histogram(json.loads(row["counts"]), row["total"], row["count"])
+                    stored.merge(histogram)
+                    histogram = stored
+                conn.execute("INSERT OR REPLACE INTO histograms VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(histogram.counts), histogram.total, histogram.count))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def histograms(self) -> Dict[Tuple, Histogram]:
+        rows = self._connect().execute("SELECT * FROM histograms").fetchall()
+        return {tuple(tuple(pair) for pair in json.loads(row["labels"])):
+                Histogram(json.loads(row["counts"]), row["total"], row["count"]) for row in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_metrics_store() -> MetricsStore:
+    """프로세스 공용 히스토그램 저장소"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore(os.getenv("TRACING_DB", "temp/metrics.sqlite3"))
+        return _store
+
+
+def flush():
+    """이 프로세스의 히스토그램을 저장소에 합산"""
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if pending:
+        get_metrics_store().add(pending)
+
+
+# 작업(trace) 밖에서 기록된 구간도 프로세스가 끝날 때 합산
+atexit.register(lambda: _pending and flush())
+
+
+def mean(name: str, default: float, **labels) -> float:
+    """구간의 평균 소요 시간 (기록이 없거나 계측이 꺼져 있으면 default)"""
+    if not _enabled:
+        return default
+    total, count = 0.0, 0
+    with _pending_lock:
+        histograms = list(_pending.items())
+    histograms += list(get_metrics_store().histograms().items())
+    for key, histogram in histograms:
+        values = dict(key)
+        if values["span"] == name and values["outcome"] == "ok" and \
+                all(values.get(label) == str(value) for label, value in labels.items()):
+            total += histogram.total
+            count += histogram.count
+    return total / count if count else default
+
+
+def prometheus_text() -> str:
+    """합산된 히스토그램과 서킷 브레이커 상태를 Prometheus 텍스트 형식으로"""
+    flush()
+    lines = [f"# HELP {METRIC_NAME} Time spent in instrumented spans.", f"# TYPE {METRIC_NAME} histogram"]
+    for labels, histogram in sorted(get_metrics_store().histograms().items()):
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+        lines.append(f"{METRIC_NAME}_sum{{{label_text}}} {histogram.total:.6f}")
+        lines.append(f"{METRIC_NAME}_count{{{label_text}}} {histogram.count}")
+
+    # 브레이커는 계측이 꺼져 있어도 모든 작업자가 공유 DB에 기록하므로 항상 노출
+    breakers = circuit_breaker.snapshot()
+    lines += [f"# HELP {CIRCUIT_STATE_METRIC} Circuit breaker state (0=closed, 1=half-open, 2=open).",
+              f"# TYPE {CIRCUIT_STATE_METRIC} gauge"]
+    for state in breakers:
+        label_text = f'provider="{state["provider"]}",error_class="{state["error_class"]}"'
+        lines.append(f"{CIRCUIT_STATE_METRIC}{{{label_text}}} {CIRCUIT_STATE_VALUES[state['state']]}")
+    lines += [f"# HELP {CIRCUIT_FAILURES_METRIC} Consecutive failures recorded by the circuit breaker.",
+              f"# TYPE {CIRCUIT_FAILURES_METRIC} gauge"]
+    for state in breakers:
+        label_text = f'provider="{state["provider"]}",error_class="{state["error_class"]}"'
+        lines.append(f"{CIRCUIT_FAILURES_METRIC}{{{label_text}}} {state['failures']}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="계측 히스토그램 Prometheus 엔드포인트 (/metrics)")
+    parser.add_argument("--host", default="127.0.0.1", help="바인딩 주소")
+    parser.add_argument("--port", type=int, default=9464, help="포트")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), MetricsHandler)
+    print(f"지표 엔드포인트 시작: http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+import admission
+import events
+import task_ledger
+import tracing
+from job_queue import Job, JobEventSink, JobQueue, get_job_queue, worker_name
+
+# 영상 제작 작업자 (job_queue에서 작업을 가져와 LangGraph 워크플로우 실행)
+#
+#   uv run python worker.py --workers 2
+#
+# 프로세스마다 작업을 하나씩 실행하므로 --workers 수만큼 작업이 동시에 진행되며,
+# 그중 인코딩은 admission이 정한 한도만큼만 동시에 실행됩니다.
+# 작업 입력의 파일 경로(사진, 음성)는 UI와 같은 파일 시스템에 있어야 합니다.
+
+HEARTBEAT_INTERVAL = 15
+
+
+def _provider_status() -> dict:
+    """이 작업자 프로세스의 공급자 상태 (UI 사이드바 표시용)"""
+    import circuit_breaker
+    from providers import get_image_router, get_video_router
+
+    return {
+        "breakers": [state for state in circuit_breaker.snapshot() if state["state"] != circuit_breaker.CLOSED],
+        "video": get_video_router().snapshot(),
+        "image": get_image_router().snapshot(),
+    }
+
+
+def run_job(queue: JobQueue, job: Job, worker_id: str):
+    """작업 하나 실행: 단계가 끝날 때마다 진행 단계를 기록하고 결과 상태를 큐에 저장"""
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            queue.touch(job.id)
+            queue.report_worker(worker_id, job.id, _provider_status())
+
+    threading.Thread(target=heartbeat, name="job-heartbeat", daemon=True).start()
+    try:
+        # 설정 누락(OPENROUTER_API_KEY 등)으로 import나 체크포인터 준비가 실패해도
+        # 작업자가 죽어 작업이 실행 중으로 남지 않고 작업 실패로 기록되도록 try 안에서 준비
+        from checkpointing import prepare_resume, thread_config
+        from pipeline import STAGES, get_graph
+
+        graph = get_graph()
+        config = thread_config(job.id)
+        graph_input = job.input
+        if job.resume:
+            # 실패한 단계부터, 또는 작업자가 중간에 죽었다면 마지막으로 끝난 단계 다음부터 실행
+            # (체크포인트가 없으면 저장된 입력으로 처음부터)
+            if prepare_resume(graph, config, STAGES) or graph.get_state(config).next:
+                graph_input = None
+
+        # 진행 이벤트는 큐(UI 표시용)와 콘솔에 기록하고, 진행률/폴링 상태는 1초에 한 번만 기록
+        sink = events.ThrottledSink(events.FanoutSink(JobEventSink(queue, job.id), events.PrintSink()))
+        with task_ledger.job_context(job.id), events.use_sink(sink), tracing.trace(job.id):
+            next_stages = graph.get_state(config).next if graph_input is None else (STAGES[0],)
+            queue.set_stage(job.id, next_stages[0] if next_stages else None)
+            for _ in graph.stream(graph_input, config, stream_mode="updates"):
+                next_stages = graph.get_state(config).next
+                queue.set_stage(job.id, next_stages[0] if next_stages else None)
+
+        final_state = graph.get_state(config).values
+    except Exception as e:
+        queue.fail(job.id, f"작업 실행 중 오류 발생: {e}")
+        return
+    finally:
+        stop.set()
+
+    if final_state.get("error_message"):
+        queue.fail(job.id, final_state["error_message"], final_state.get("failed_stage"), final_state)
+    elif not final_state.get("final_video_path"):
+        queue.fail(job.id, "알 수 없는 오류로 영상 파일을 찾을 수 없습니다.", result=final_state)
+    else:
+        queue.complete(job.id, final_state)
+
+
+def worker_loop(poll_interval: float = 2.0, max_jobs: Optional[int] = None):
+    """큐에서 작업을 하나씩 가져와 실행 (max_jobs개를 처리하면 종료)"""
+    load_dotenv()
+    queue = get_job_queue()
+    worker_id = worker_name()
+    print(f"작업자 시작: {worker_id}")
+
+    processed = 0
+    last_report = 0.0
+    while max_jobs is None or processed < max_jobs:
+        requeued = queue.requeue_stale()
+        if requeued:
+            print(f"응답이 끊긴 작업 {requeued}개를 다시 대기열에 넣었습니다.")
+
+        job = queue.claim(worker_id)
+        if job is None:
+            if time.time() - last_report > HEARTBEAT_INTERVAL:
+                queue.report_worker(worker_id, None, _provider_status())
+                last_report = time.time()
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[{worker_id}] 작업 시작: {job.id} (시도 {job.attempts}{', 이어하기' if job.resume else ''})")
+        start_time = time.time()
+        run_job(queue, job, worker_id)
+        processed += 1
+        finished = queue.get(job.id)
+        print(f"[{worker_id}] 작업 종료: {job.id} {finished.status} ({time.time() - start_time:.0f}초)")
+        queue.report_worker(worker_id, None, _provider_status())
+        last_report = time.time()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="영상 제작 작업자")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WORKER_PROCESSES", admission.detect_capacity().worker_processes)),
+                        help="작업자 프로세스 수 (동시에 실행할 작업 수, 기본값은 CPU/메모리로 계산)")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="대기 작업 확인 주기(초)")
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        worker_loop(args.poll_interval)
+        return 0
+
+    # moviepy/ffmpeg, google-genai 등의 상태를 공유하지 않도록 spawn으로 새 프로세스 시작
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker_loop, args=(args.poll_interval,), name=f"worker-{index}")
+                 for index in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())